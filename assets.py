@@ -0,0 +1,189 @@
+import errno
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+PLACEMENT_STRATEGIES = ('copy', 'hardlink', 'reflink', 'symlink')
+
+# Linux FICLONE ioctl: share the source's extents (btrfs, XFS, bcachefs, ...)
+_FICLONE = 0x40049409
+
+# Errors meaning the filesystem can't hard link at all (cross-device, not allowed,
+# not supported), as opposed to a problem with one particular file
+_NO_HARDLINKS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+# Per-run placement state (see reset). Once an asset target is known to be in
+# place it is never stat'ed again. Identical content is found through the
+# content store on disk, so it is shared across worker processes and runs.
+_placed = set()
+_made_dirs = set()
+_source_hashes = {}
+_unsupported = set()
+
+def reset():
+    """Forget what this process placed, hashed and found unsupported (call at the start of each run)."""
+    _placed.clear()
+    _made_dirs.clear()
+    _source_hashes.clear()
+    _unsupported.clear()
+
+def is_archive_member(src_path):
+    """True for attachments read straight out of an export ZIP (extract_zip.ZipMember)."""
+    return src_path is not None and not isinstance(src_path, (str, os.PathLike))
+
+def _source_exists(src_path):
+    if is_archive_member(src_path):
+        return src_path.exists()
+    return os.path.exists(src_path)
+
+def _tmp_path(target_path):
+    return target_path.with_name(f".{target_path.name}.{os.getpid()}.tmp")
+
+def _install(target_path, make_tmp):
+    """
+    Create the asset at a temporary name and rename it into place, so concurrent
+    workers placing the same asset never expose or interleave a partial file.
+    """
+    tmp_path = _tmp_path(target_path)
+    try:
+        make_tmp(tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+
+def _copy(src_path, tmp_path):
+    if is_archive_member(src_path):
+        # Stream the member out of the ZIP without extracting anything else
+        with src_path.open() as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    else:
+        shutil.copy2(src_path, tmp_path)
+
+def _reflink(src_path, tmp_path):
+    """Clone with FICLONE, else let the kernel copy via copy_file_range."""
+    import fcntl
+
+    with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            if not hasattr(os, 'copy_file_range'):
+                raise
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    shutil.copystat(src_path, tmp_path)
+
+def _place_with(strategy, src_path, tmp_path):
+    if strategy == 'hardlink':
+        os.link(src_path, tmp_path)
+    elif strategy == 'symlink':
+        os.symlink(os.path.abspath(src_path), tmp_path)
+    elif strategy == 'reflink':
+        _reflink(src_path, tmp_path)
+    else:
+        _copy(src_path, tmp_path)
+
+def _content_hash(src_path):
+    """SHA-256 of an attachment, computed at most once per source per run."""
+    key = str(src_path)
+    digest = _source_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        opener = src_path.open if is_archive_member(src_path) else lambda: open(src_path, 'rb')
+        with opener() as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _source_hashes[key] = digest
+    return digest
+
+def _mkdir(directory):
+    if directory not in _made_dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+        _made_dirs.add(directory)
+
+def _link_blob(blob, target_path):
+    """
+    Hard link target_path to a stored blob. Returns False if that is not
+    possible, and stops trying hard links for the run if the filesystem can't do them.
+    """
+    try:
+        _install(target_path, lambda tmp: os.link(blob, tmp))
+    except OSError as e:
+        if e.errno in _NO_HARDLINKS:
+            _unsupported.add('hardlink')
+        return False
+    return True
+
+def place_asset(src_path, target_path, strategy='copy', dedupe=None):
+    """
+    Put an attachment at target_path unless it is already there.
+
+    Args:
+        src_path: Source file path (or extract_zip.ZipMember)
+        target_path: Destination Path inside the Assets directory
+        strategy: 'copy', 'hardlink', 'reflink' or 'symlink'. Strategies the
+            filesystem can't honour (cross-device links, no reflink support,
+            archive sources) fall back to a plain copy.
+        dedupe: Folder of a content store (see organize.get_blob_store_path), or
+            None. Content is hashed and kept there once as <sha256>, and every
+            target with the same bytes becomes a hard link to it, across worker
+            processes and runs.
+
+    Returns:
+        True if the asset is in place, False if the source does not exist
+    """
+    target_key = str(target_path)
+    if target_key in _placed:
+        return True
+    if not _source_exists(src_path):
+        return False
+
+    _mkdir(target_path.parent)
+
+    if target_path.exists():
+        _placed.add(target_key)
+        return True
+
+    if is_archive_member(src_path) or strategy not in PLACEMENT_STRATEGIES:
+        strategy = 'copy'
+
+    # Only strategies that duplicate data benefit from content addressing
+    blob = None
+    if dedupe and strategy in ('copy', 'reflink') and 'hardlink' not in _unsupported:
+        store = Path(dedupe)
+        blob = store / _content_hash(src_path)
+        if os.path.exists(blob) and _link_blob(blob, target_path):
+            _placed.add(target_key)
+            return True
+
+    if strategy in _unsupported:
+        strategy = 'copy'
+    try:
+        _install(target_path, lambda tmp: _place_with(strategy, src_path, tmp))
+    except (OSError, ImportError):
+        if strategy == 'copy':
+            raise
+        # Remember the failure so later assets don't retry a doomed syscall
+        _unsupported.add(strategy)
+        _install(target_path, lambda tmp: _copy(src_path, tmp))
+
+    if blob is not None and 'hardlink' not in _unsupported:
+        # Store this copy for the next target with the same bytes. A blob that
+        # appeared meanwhile (another worker) is left alone; its bytes are the same.
+        _mkdir(blob.parent)
+        try:
+            os.link(target_path, blob)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            if e.errno in _NO_HARDLINKS:
+                _unsupported.add('hardlink')
+    _placed.add(target_key)
+    return True
@@ -0,0 +1,239 @@
+import json
+import os
+import re
+from pathlib import Path
+
+INDEX_FILENAME = '.attachment_index.json'
+INDEX_VERSION = 1
+
+# Lookup precedence mirrors the order of the original glob patterns:
+#   0: {base}/{file_id}-*                  (images in root)
+#   1: {base}/dalle-generations/{file_id}-*
+#   2: {base}/user-*/{file_id}*            (user files)
+#   3: {base}/**/audio/{file_id}-*         (audio in UUID/audio/)
+_RANK_ROOT, _RANK_DALLE, _RANK_USER, _RANK_AUDIO = range(4)
+
+# A file id ends where a character outside [\w-] would appear in an asset pointer,
+# so candidate ids are the prefixes of a filename that end before a non-word char.
+_ID_BOUNDARY = re.compile(r'[^\w]')
+
+# In-memory indexes keyed by resolved input path, shared by every lookup in a run
+_indexes = {}
+
+def attachment_file_type(file_path):
+    """Return 'dalle', 'audio' or 'image' for an attachment path."""
+    file_path = str(file_path)
+    if "dalle-generations" in file_path:
+        return "dalle"
+    elif "/audio/" in file_path or "\\audio\\" in file_path:
+        return "audio"
+    return "image"
+
+def _candidate_ids(filename, dash_only):
+    """
+    Yield every prefix of filename that could be a file id.
+    With dash_only, the id must be followed by '-' (the "{file_id}-*" patterns);
+    otherwise any non-word character or the end of the name may follow it.
+    """
+    if not filename.startswith('file'):
+        return
+    for m in _ID_BOUNDARY.finditer(filename):
+        if m.start() <= len('file-'):
+            continue
+        if not dash_only or m.group() == '-':
+            yield filename[:m.start()]
+    if not dash_only:
+        yield filename
+
+def _add(entries, file_id, rank, rel_path):
+    current = entries.get(file_id)
+    if current is None or rank < current[0]:
+        entries[file_id] = (rank, rel_path)
+
+def _index_relative_paths(rel_paths):
+    """
+    Classify export-relative file paths (forward slashes) by the lookup patterns.
+    Returns: dict mapping file_id -> relative path of the winning match
+    """
+    entries = {}
+    for rel_path in rel_paths:
+        parts = rel_path.split('/')
+        filename = parts.pop()
+        # Hidden files and folders never match the original glob patterns
+        if filename.startswith('.') or any(p.startswith('.') for p in parts):
+            continue
+
+        if not parts:
+            for file_id in _candidate_ids(filename, dash_only=True):
+                _add(entries, file_id, _RANK_ROOT, rel_path)
+        if parts == ['dalle-generations']:
+            for file_id in _candidate_ids(filename, dash_only=True):
+                _add(entries, file_id, _RANK_DALLE, rel_path)
+        if len(parts) == 1 and parts[0].startswith('user-'):
+            for file_id in _candidate_ids(filename, dash_only=False):
+                _add(entries, file_id, _RANK_USER, rel_path)
+        if parts and parts[-1] == 'audio':
+            for file_id in _candidate_ids(filename, dash_only=True):
+                _add(entries, file_id, _RANK_AUDIO, rel_path)
+
+    return {file_id: rel_path for file_id, (rank, rel_path) in entries.items()}
+
+def build_attachment_index(input_base_path):
+    """
+    Walk the export directory once and map every file id to its attachment.
+
+    Returns:
+        (index, dir_mtimes) where index maps file_id -> (file_path, file_type)
+        and dir_mtimes records each walked directory's mtime for cache validation.
+    """
+    base = str(input_base_path)
+    rel_paths = []
+    dir_mtimes = {}
+
+    for dirpath, dirnames, filenames in os.walk(base):
+        # Hidden directories are skipped by glob's "**" as well
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        rel_dir = os.path.relpath(dirpath, base).replace('\\', '/')
+        if rel_dir == '.':
+            rel_dir = ''
+        try:
+            dir_mtimes[rel_dir] = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            pass
+        for filename in sorted(filenames):
+            rel_paths.append(f"{rel_dir}/{filename}" if rel_dir else filename)
+
+    index = {}
+    for file_id, rel_path in _index_relative_paths(rel_paths).items():
+        full_path = os.path.join(base, rel_path)
+        index[file_id] = (full_path, attachment_file_type(full_path))
+    return index, dir_mtimes
+
+def build_zip_attachment_index(zip_path):
+    """
+    Map every file id to a member of an export ZIP without extracting it.
+    Only the archive's central directory is read.
+
+    Returns:
+        dict mapping file_id -> (ZipMember, file_type)
+    """
+    import zipfile
+    from extract_zip import ZipMember, find_zip_conversations
+
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        prefix, _ = find_zip_conversations(zip_ref)
+        rel_paths = sorted(
+            name[len(prefix):] for name in zip_ref.namelist()
+            if name.startswith(prefix) and not name.endswith('/')
+        )
+
+    index = {}
+    for file_id, rel_path in _index_relative_paths(rel_paths).items():
+        member = ZipMember(zip_path, prefix + rel_path)
+        index[file_id] = (member, attachment_file_type('/' + rel_path))
+    return index
+
+def _cache_is_fresh(base, dir_mtimes):
+    """A cached index is valid while every directory it walked is unchanged."""
+    for rel_dir, mtime in dir_mtimes.items():
+        try:
+            if os.stat(os.path.join(base, rel_dir)).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+def load_attachment_index(input_base_path):
+    """Load a persisted index from the export directory, or None if missing or stale."""
+    base = str(input_base_path)
+    cache_path = Path(base) / INDEX_FILENAME
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('version') != INDEX_VERSION:
+        return None
+    dir_mtimes = cached.get('directories', {})
+    if not dir_mtimes or not _cache_is_fresh(base, dir_mtimes):
+        return None
+
+    return {
+        file_id: (os.path.join(base, rel_path), file_type)
+        for file_id, (rel_path, file_type) in cached.get('files', {}).items()
+    }
+
+def save_attachment_index(input_base_path, index, dir_mtimes):
+    """Persist the index next to the export so later runs can skip the walk."""
+    base = str(input_base_path)
+    files = {
+        file_id: [os.path.relpath(path, base).replace('\\', '/'), file_type]
+        for file_id, (path, file_type) in index.items()
+    }
+    cache_path = Path(base) / INDEX_FILENAME
+    dir_mtimes = dict(dir_mtimes)
+    try:
+        created = not cache_path.exists()
+        for _ in range(2 if created else 1):
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'directories': dir_mtimes, 'files': files}, f)
+            # Creating the cache file bumps the export folder's own mtime;
+            # record the new value so the cache isn't immediately stale.
+            dir_mtimes[''] = os.stat(base).st_mtime_ns
+    except OSError:
+        # Read-only exports still work, they just pay for the walk every run
+        return False
+    return True
+
+def get_attachment_index(input_base_path, persist=False):
+    """
+    Return the file-id index for an export directory, building it at most once per run.
+
+    Args:
+        input_base_path: Export directory (or export ZIP) containing the attachments
+        persist: Reuse/write the index file stored in the export directory
+
+    Returns:
+        dict mapping file_id -> (file_path, file_type)
+    """
+    key = os.path.abspath(str(input_base_path))
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+
+    if os.path.isfile(key):
+        # Zip-native input: the "base path" is the export archive itself
+        index = build_zip_attachment_index(key)
+        _indexes[key] = index
+        return index
+
+    index = load_attachment_index(input_base_path) if persist else None
+    if index is None:
+        index, dir_mtimes = build_attachment_index(input_base_path)
+        if persist:
+            save_attachment_index(input_base_path, index, dir_mtimes)
+
+    _indexes[key] = index
+    return index
+
+def register_attachment_index(input_base_path, index):
+    """Install a prebuilt index (e.g. one handed to a worker process)."""
+    _indexes[os.path.abspath(str(input_base_path))] = index
+
+def clear_attachment_indexes():
+    """Forget all in-memory indexes (e.g. after an export directory changed)."""
+    _indexes.clear()
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python attachment_index.py <export_directory>")
+        sys.exit(1)
+
+    export_dir = sys.argv[1].strip('"')
+    index, dir_mtimes = build_attachment_index(export_dir)
+    save_attachment_index(export_dir, index, dir_mtimes)
+    print(f"📇 Indexed {len(index)} file ids across {len(dir_mtimes)} folders")
+    print(f"   Saved to: {Path(export_dir) / INDEX_FILENAME}")
@@ -0,0 +1,368 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import synthetic_export
+from json_backend import available_backends, resolve_backend
+from profiling import STAGES, _peak_rss_mb
+
+RESULTS_VERSION = 1
+
+# Optional or rarely needed modules that importing the converter must not load;
+# they are imported on the code paths that use them
+LAZY_MODULES = ('requests', 'urllib3', 'tqdm', 'msgspec', 'orjson', 'sqlite3', 'tarfile', 'concurrent.futures')
+IMPORT_BUDGET_MS = 50
+
+def _run_once(config_path, result_path, jobs):
+    """
+    Child-process entry point: convert once with --profile and write the
+    profile report to result_path. Running each measurement in a fresh process
+    keeps peak RSS and per-process caches (attachment index, placed assets) honest.
+    """
+    import chatgpt_json_to_markdown as converter
+
+    os.chdir(Path(config_path).parent)
+    argv = ['--full', '--profile', str(result_path)] + (['--jobs', str(jobs)] if jobs is not None else [])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        converter.main(argv)
+
+def _decode_once(export_dir, backend, max_document_bytes, result_path):
+    """
+    Child-process entry point: load every conversation of the export with one
+    JSON backend and write the decode time and peak RSS to result_path.
+    """
+    from chatgpt_json_to_markdown import iter_conversations
+    from json_backend import get_decoder
+
+    files = sorted(str(f) for f in Path(export_dir).glob('conversations*.json'))
+    decoder = get_decoder(backend)
+    start = time.perf_counter()
+    conversations = sum(1 for _ in iter_conversations(files, decoder, max_document_bytes))
+    seconds = time.perf_counter() - start
+    Path(result_path).write_text(json.dumps({
+        'seconds': seconds,
+        'conversations': conversations,
+        'fallbacks': decoder.fallbacks if decoder is not None else 0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }), encoding='utf-8')
+
+def run_decode_benchmark(export_dir, export_stats, max_document_mb=256, repeat=3, work_dir=None):
+    """
+    Time decoding the export with every installed JSON backend, each run in a
+    fresh process so peak RSS reflects that backend alone.
+
+    Returns:
+        dict mapping backend name -> fastest run's seconds, MB/s and peak RSS
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='chatgpt-md-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    max_document_bytes = int(max_document_mb * 1024 * 1024)
+    results = {}
+    for backend in available_backends():
+        runs = []
+        for i in range(repeat):
+            result_path = work_dir / f'decode-{backend}-{i}.json'
+            subprocess.run([sys.executable, str(Path(__file__).resolve()), '--child-decode',
+                            str(export_dir), backend, str(max_document_bytes), str(result_path)], check=True)
+            runs.append(json.loads(result_path.read_text(encoding='utf-8')))
+        best = min(runs, key=lambda r: r['seconds'])
+        results[backend] = {
+            'seconds': round(best['seconds'], 4),
+            'mb_per_second': round(export_stats['json_bytes'] / 1e6 / best['seconds'], 2),
+            'peak_rss_mb': max((r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None), default=None),
+            'fallbacks': best['fallbacks'],
+        }
+        print(f"   {backend}: {best['seconds']:.2f}s")
+    return results
+
+def _benchmark_config(export_dir, output_dir, overrides):
+    example = Path(__file__).with_name('config.json.example')
+    with open(example, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.update(input_mode='directory', input_path=str(export_dir), output_directory=str(output_dir))
+    config.update(overrides)
+    return config
+
+def _git_revision():
+    here = Path(__file__).parent
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def _best_run(runs):
+    return min(runs, key=lambda r: r['total_seconds'])
+
+def run_benchmark(export_dir, export_stats, overrides=None, repeat=3, jobs=None, work_dir=None):
+    """
+    Convert export_dir `repeat` times, each in a fresh process and output folder.
+
+    Returns:
+        dict with every run's measurements and a summary of the fastest run
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='chatgpt-md-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    output_dir = work_dir / 'output'
+    config = _benchmark_config(export_dir, output_dir, overrides or {})
+    config_path = work_dir / 'config.json'
+    config_path.write_text(json.dumps(config, indent=2), encoding='utf-8')
+
+    runs = []
+    for i in range(repeat):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        result_path = work_dir / f'run-{i}.json'
+        command = [sys.executable, str(Path(__file__).resolve()), '--child',
+                   str(config_path), str(result_path), '-' if jobs is None else str(jobs)]
+        subprocess.run(command, check=True)
+        report = json.loads(result_path.read_text(encoding='utf-8'))
+        runs.append({
+            'total_seconds': report['wall_seconds'],
+            'stages': report['stages'],
+            'stage_calls': report['calls'],
+            'counters': report['counters'],
+            'peak_rss_mb': report['peak_rss_mb'],
+            'peak_worker_rss_mb': report['peak_worker_rss_mb'],
+        })
+        print(f"   run {i + 1}/{repeat}: {runs[-1]['total_seconds']:.2f}s")
+
+    best = _best_run(runs)
+    megabytes = export_stats['json_bytes'] / 1e6
+    summary = {
+        'total_seconds': round(best['total_seconds'], 4),
+        'conversations_per_second': round(export_stats['conversations'] / best['total_seconds'], 1),
+        'messages_per_second': round(export_stats['messages'] / best['total_seconds'], 1),
+        'mb_per_second': round(megabytes / best['total_seconds'], 2),
+        'stages': best['stages'],
+        'peak_rss_mb': max((r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None), default=None),
+        'peak_worker_rss_mb': best['peak_worker_rss_mb'],
+    }
+    return {'runs': runs, 'best': summary, 'config_overrides': overrides or {}, 'jobs': jobs}
+
+def measure_import_time(module='chatgpt_json_to_markdown', repeat=5):
+    """
+    Import module in fresh interpreters with -X importtime (after compiling the
+    repo's bytecode, so compilation is not counted) and report the fastest run.
+
+    Returns:
+        dict with 'milliseconds' (cumulative import time of module), 'heaviest'
+        ([name, ms] of the imports with the most self time) and 'eager' (the
+        LAZY_MODULES that importing it loaded)
+    """
+    import compileall
+
+    compileall.compile_dir(str(Path(__file__).resolve().parent), maxlevels=0, quiet=1)
+    # Only what the import adds counts: site hooks may load some of these at startup
+    code = (f"import sys; before = set(sys.modules); import {module}; "
+            f"print(' '.join(m for m in {LAZY_MODULES!r} if m in set(sys.modules) - before))")
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=Path(__file__).resolve().parent,
+                              capture_output=True, text=True, check=True)
+        # Lines read "import time: <self us> | <cumulative us> | <indented name>", each
+        # import listed after everything it imported; nesting is two spaces per level
+        nested, children, total = [], [], None
+        for line in proc.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) != 3 or not line.startswith('import time:') or 'self' in fields[0]:
+                continue
+            name = fields[2].strip()
+            self_us = int(fields[0].split(':')[1])
+            if fields[2][1:].startswith(' '):
+                nested.append((name, self_us))
+                continue
+            if name == module:
+                children, total = nested + [(name, self_us)], int(fields[1])
+            nested = []
+        milliseconds = total / 1000
+        if best is None or milliseconds < best['milliseconds']:
+            heaviest = sorted(children, key=lambda item: item[1], reverse=True)[:5]
+            best = {
+                'milliseconds': round(milliseconds, 2),
+                'heaviest': [[name, round(us / 1000, 2)] for name, us in heaviest],
+                'eager': proc.stdout.split(),
+            }
+    return best
+
+def check_import_time(budget_ms=IMPORT_BUDGET_MS, repeat=5):
+    """Print the converter's import time and return True if it is within budget_ms and imports nothing lazy."""
+    result = measure_import_time(repeat=repeat)
+    within = result['milliseconds'] <= budget_ms
+    print(f"{'✅' if within else '❌'} Importing chatgpt_json_to_markdown takes {result['milliseconds']:.1f} ms "
+          f"(budget {budget_ms} ms)")
+    print("   Slowest imports: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in result['heaviest']))
+    if result['eager']:
+        print(f"❌ Imported at startup but only needed on some code paths: {', '.join(result['eager'])}")
+    return within and not result['eager']
+
+def print_report(results, baseline=None):
+    best = results['best']
+    base_best = baseline['best'] if baseline else None
+    print()
+    print(f"{'stage':<10} {'seconds':>9} {'share':>7}" + (f" {'baseline':>9} {'change':>8}" if base_best else ""))
+    total = best['total_seconds']
+    stage_total = sum(best['stages'].values()) or total
+    for stage in STAGES:
+        seconds = best['stages'].get(stage, 0.0)
+        line = f"{stage:<10} {seconds:>9.3f} {seconds / stage_total:>6.1%}"
+        if base_best:
+            before = base_best['stages'].get(stage, 0.0)
+            change = f"{(seconds - before) / before:+.1%}" if before else "n/a"
+            line += f" {before:>9.3f} {change:>8}"
+        print(line)
+    print(f"{'total':<10} {total:>9.3f}" + (f" {'':>7} {base_best['total_seconds']:>9.3f} "
+          f"{(total - base_best['total_seconds']) / base_best['total_seconds']:+8.1%}" if base_best else ""))
+    print()
+    print(f"⚡ {best['conversations_per_second']} conversations/s, {best['messages_per_second']} messages/s, "
+          f"{best['mb_per_second']} MB/s")
+    if best['peak_rss_mb'] is not None:
+        workers = f" (largest worker {best['peak_worker_rss_mb']} MB)" if best['peak_worker_rss_mb'] else ""
+        print(f"🧠 Peak RSS {best['peak_rss_mb']} MB{workers}")
+    if results['jobs'] is not None and results['jobs'] != 1:
+        print("ℹ️  With --jobs, stage times are summed over all worker processes.")
+
+def print_decode_report(decode_results):
+    baseline = decode_results.get('json')
+    print()
+    print(f"{'backend':<10} {'seconds':>9} {'MB/s':>8} {'peak rss':>10} {'speedup':>8}")
+    for backend, result in decode_results.items():
+        rss = f"{result['peak_rss_mb']} MB" if result['peak_rss_mb'] is not None else "n/a"
+        speedup = f"{baseline['seconds'] / result['seconds']:.2f}x" if baseline else ""
+        print(f"{backend:<10} {result['seconds']:>9.3f} {result['mb_per_second']:>8} {rss:>10} {speedup:>8}")
+    fallbacks = {b: r['fallbacks'] for b, r in decode_results.items() if r['fallbacks']}
+    if fallbacks:
+        print("ℹ️  Files re-decoded with the standard library: "
+              + ", ".join(f"{b} {n}" for b, n in fallbacks.items()))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the converter end to end on a synthetic (or existing) export."
+    )
+    parser.add_argument('--export', metavar='DIR',
+                        help="benchmark an existing export folder instead of generating one")
+    parser.add_argument('--keep', metavar='DIR',
+                        help="generate the synthetic export into DIR and keep it (reused if it exists)")
+    parser.add_argument('--repeat', type=int, default=3, help="conversions to run; the fastest is reported (default: 3)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes for the conversion")
+    parser.add_argument('--config-json', default='{}', metavar='JSON',
+                        help="config.json overrides, e.g. '{\"organization_mode\": \"flat\"}'")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="results file (default: benchmark-<commit>.json)")
+    parser.add_argument('--compare', metavar='FILE', help="previous results file to compare against")
+    parser.add_argument('--json-backends', action='store_true',
+                        help="also time loading the export with every installed JSON backend")
+    parser.add_argument('--import-time', action='store_true',
+                        help="only check the converter's startup (import) time against --import-budget; "
+                             "exits with status 1 if it is over budget or loads optional modules eagerly")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, metavar='MS',
+                        help=f"import time budget in milliseconds (default: {IMPORT_BUDGET_MS})")
+
+    generator = parser.add_argument_group('synthetic export (see synthetic_export.py)')
+    generator.add_argument('-n', '--conversations', type=int, default=1000)
+    generator.add_argument('-m', '--messages', type=int, default=20)
+    generator.add_argument('--branching', type=float, default=0.1)
+    generator.add_argument('--reasoning', type=float, default=0.2)
+    generator.add_argument('--image-groups', type=float, default=0.05)
+    generator.add_argument('--images', type=float, default=0.05)
+    generator.add_argument('--audio', type=float, default=0.02)
+    generator.add_argument('--words', type=int, default=120)
+    generator.add_argument('--asset-size', type=int, default=32 * 1024)
+    generator.add_argument('--layout', choices=['sharded', 'legacy'], default='sharded')
+    generator.add_argument('--shard-size', type=int, default=100)
+    generator.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+def _describe_existing_export(export_dir):
+    """Counts for an export that was not generated here (messages are counted by loading it)."""
+    from chatgpt_json_to_markdown import iter_conversations
+
+    files = sorted(Path(export_dir).glob('conversations*.json'))
+    stats = {'conversations': 0, 'messages': 0, 'json_files': len(files),
+             'json_bytes': sum(f.stat().st_size for f in files)}
+    for conversation in iter_conversations([str(f) for f in files]):
+        stats['conversations'] += 1
+        stats['messages'] += sum(1 for node in conversation.get('mapping', {}).values() if node.get('message'))
+    return stats
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.import_time:
+        sys.exit(0 if check_import_time(args.import_budget, args.repeat) else 1)
+    overrides = json.loads(args.config_json)
+    scratch = Path(tempfile.mkdtemp(prefix='chatgpt-md-bench-'))
+    try:
+        if args.export:
+            export_dir = Path(args.export)
+            export = {'source': str(export_dir)}
+            export['stats'] = _describe_existing_export(export_dir)
+        else:
+            options = synthetic_export.export_options(args)
+            export_dir = Path(args.keep) if args.keep else scratch / 'export'
+            stats_path = export_dir / '.synthetic_export.json'
+            cached = json.loads(stats_path.read_text(encoding='utf-8')) if stats_path.exists() else None
+            if cached and cached.get('options') == options:
+                print(f"🧪 Reusing synthetic export in {export_dir}")
+                stats = cached['stats']
+            else:
+                print(f"🧪 Generating {args.conversations} synthetic conversations...")
+                shutil.rmtree(export_dir, ignore_errors=True)
+                stats = synthetic_export.generate_export(export_dir, **options)
+                stats_path.write_text(json.dumps({'options': options, 'stats': stats}), encoding='utf-8')
+            export = {'source': 'synthetic', 'options': options, 'stats': stats}
+
+        print(f"⏱️  Converting {export['stats']['conversations']} conversations "
+              f"({export['stats']['json_bytes'] / 1e6:.1f} MB of JSON)...")
+        results = run_benchmark(export_dir, export['stats'], overrides, args.repeat, args.jobs, scratch / 'work')
+        if args.json_backends:
+            print(f"⏱️  Decoding with {', '.join(available_backends())}...")
+            results['json_backends'] = run_decode_benchmark(
+                export_dir, export['stats'], overrides.get('json_max_document_mb', 32), args.repeat, scratch / 'work'
+            )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    commit, dirty = _git_revision()
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'json_backend': resolve_backend(overrides.get('json_backend', 'auto')),
+        'export': export,
+        **results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if 'json_backends' in results:
+        print_decode_report(results['json_backends'])
+
+    output = Path(args.output or f"benchmark-{(commit or 'unknown')[:8]}{'-dirty' if dirty else ''}.json")
+    output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"💾 Results saved to: {output}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        _run_once(sys.argv[2], sys.argv[3], None if sys.argv[4] == '-' else int(sys.argv[4]))
+    elif len(sys.argv) == 6 and sys.argv[1] == '--child-decode':
+        _decode_once(sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5])
+    else:
+        main()
@@ -1,32 +1,171 @@
+import io
 import json
 import os
 import sys
 import glob
 import shutil
 import re
+import time
+import zipfile
+from collections import deque, namedtuple
+from collections.abc import Iterator
 from datetime import datetime
-try:
-    from tqdm import tqdm
-    _tqdm_available = True
-    _tqdm_write = tqdm.write
-except ImportError:
-    _tqdm_available = False
-    def tqdm(iterable, **kwargs):
-        return iterable
-    _tqdm_write = print
-try:
-    import requests as _requests
-    _requests_available = True
-except ImportError:
-    _requests_available = False
+from functools import partial
+from importlib.util import find_spec
+from downloader import ImageDownloader, _requests_available
 from pathlib import Path
-from organize import get_conversation_path, get_asset_path, get_relative_asset_path
+from organize import create_organization_summary, get_conversation_category, get_conversation_path, get_asset_path, get_blob_store_path, get_relative_asset_path
+from assets import is_archive_member, reset as reset_asset_state
+from conversation_filter import ConversationFilter
+from output_sink import DeferredSink, DirectorySink, archive_format, open_output_sink, replay
+from attachment_index import get_attachment_index, register_attachment_index
+from extract_zip import find_zip_conversations
+from json_backend import get_decoder, resolve_backend, is_available
+from manifest import (
+    config_fingerprint, conversation_key, is_unchanged, load_manifest,
+    prune_manifest, record_conversation, save_manifest,
+)
+
+# tqdm is only imported once a progress bar is shown, so importing this module
+# (and runs that never show one) does not pay for it
+_tqdm_available = find_spec('tqdm') is not None
+
+def tqdm(iterable=None, **kwargs):
+    if not _tqdm_available:
+        return iterable
+    from tqdm import tqdm as _tqdm
+    return _tqdm(iterable, **kwargs)
+
+def _tqdm_write(message):
+    if not _tqdm_available:
+        print(message)
+        return
+    from tqdm import tqdm as _tqdm
+    _tqdm.write(message)
 
 def read_json_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
         data = json.load(file)
     return data
 
+_JSON_WHITESPACE = ' \t\n\r'
+_JSON_WHITESPACE_OR_COMMA = _JSON_WHITESPACE + ','
+_JSON_ELEMENT_END = _JSON_WHITESPACE + ',]'
+
+def iter_json_array(source, chunk_size=1 << 20):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    source is a file path or an already-open text file (e.g. a ZIP member wrapped
+    in io.TextIOWrapper). Only the element currently being decoded is held in
+    memory, so peak usage is bounded by the largest single conversation rather
+    than the whole file. Files whose top-level value is not an array are decoded
+    in full and yielded as-is (a list is still yielded element by element).
+    """
+    if hasattr(source, 'read'):
+        yield from _iter_json_array_stream(source, chunk_size)
+        return
+    with open(source, 'r', encoding='utf-8') as file:
+        yield from _iter_json_array_stream(file, chunk_size)
+
+def _iter_json_array_stream(file, chunk_size):
+    decoder = json.JSONDecoder()
+    buf = file.read(chunk_size)
+    eof = not buf
+    pos = 0
+
+    # Skip leading whitespace to find the opening bracket
+    while True:
+        while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+            pos += 1
+        if pos < len(buf) or eof:
+            break
+        buf, pos = file.read(chunk_size), 0
+        eof = not buf
+
+    if pos >= len(buf) or buf[pos] != '[':
+        # Not an array — fall back to decoding the whole document
+        data = json.loads(buf[pos:] + file.read())
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+        return
+    pos += 1
+
+    read_size = chunk_size
+    while True:
+        # Skip whitespace and element separators
+        while pos < len(buf) and buf[pos] in _JSON_WHITESPACE_OR_COMMA:
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            return
+
+        if pos >= len(buf):
+            if eof:
+                raise json.JSONDecodeError("Unterminated array", buf, pos)
+            buf, pos = file.read(chunk_size), 0
+            eof = not buf
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element spans the chunk boundary. Grow the read size
+            # geometrically so a huge element is re-scanned O(log n) times.
+            more = file.read(read_size)
+            read_size *= 2
+            buf, pos = buf[pos:] + more, 0
+            eof = not more
+            continue
+
+        if not eof and (end == len(buf) or buf[end] not in _JSON_ELEMENT_END):
+            # A number could have been cut short at the boundary — re-read
+            more = file.read(chunk_size)
+            if more:
+                buf, pos = buf[pos:] + more, 0
+                continue
+            eof = True
+
+        yield value
+        read_size = chunk_size
+        pos = end
+
+def _iter_document(data):
+    """Yield the conversations of a fully decoded document, like iter_json_array does."""
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+
+def iter_conversations(file_paths, decoder=None, max_document_bytes=0):
+    """
+    Stream conversation objects from one or more conversations*.json files in order.
+
+    With a json_backend.JsonDecoder, files up to max_document_bytes are read and
+    decoded whole by the fast backend; larger files (and every file without a
+    decoder) are streamed element by element with the standard library.
+    """
+    for path in file_paths:
+        if decoder is not None and os.path.getsize(path) <= max_document_bytes:
+            with open(path, 'rb') as f:
+                yield from _iter_document(decoder.decode(f.read()))
+        else:
+            yield from iter_json_array(path)
+
+def iter_zip_conversations(zip_path, decoder=None, max_document_bytes=0):
+    """Stream conversation objects straight out of an export ZIP, without extracting it."""
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        _, members = find_zip_conversations(zip_ref)
+        for name in members:
+            if decoder is not None and zip_ref.getinfo(name).file_size <= max_document_bytes:
+                yield from _iter_document(decoder.decode(zip_ref.read(name)))
+                continue
+            with zip_ref.open(name) as raw:
+                yield from iter_json_array(io.TextIOWrapper(raw, encoding='utf-8'))
+
 def normalize_timestamp(value):
     """
     Normalize timestamps that may arrive either in seconds or milliseconds.
@@ -73,44 +212,40 @@ def find_attachment_file(file_id, input_base_path):
     """
     Find the actual file matching the file_id in the JsonFiles directory.
     Searches in root, dalle-generations, user-*, and UUID/audio/ subdirectories.
+    Lookups go through a file-id index built with a single walk of the export
+    (see attachment_index.py), so missing files cost nothing extra.
     Returns: (file_path, file_type) or (None, None)
     file_type can be: 'image', 'dalle', 'audio'
     """
     if not file_id:
         return None, None
 
-    # Normalize path for glob (forward slashes work on all platforms)
-    base_path = str(Path(input_base_path)).replace('\\', '/')
+    return get_attachment_index(input_base_path).get(file_id, (None, None))
 
-    # Search patterns - use forward slashes for glob compatibility
-    patterns = [
-        f"{base_path}/{file_id}-*",                      # Images in root
-        f"{base_path}/dalle-generations/{file_id}-*",    # DALL-E images
-        f"{base_path}/user-*/{file_id}*",                # User files
-        f"{base_path}/**/audio/{file_id}-*",             # Audio files in UUID/audio/
-    ]
+# Where notes and assets go (output_sink). process_conversations installs the
+# run's sink; pool workers use their own. Without one, files go to disk directly.
+_sink = None
 
-    for pattern in patterns:
-        matches = glob.glob(pattern, recursive=True)
-        if matches:
-            file_path = matches[0]
-            # Determine file type
-            if "dalle-generations" in file_path:
-                file_type = "dalle"
-            elif "/audio/" in file_path or "\\audio\\" in file_path:
-                file_type = "audio"
-            else:
-                file_type = "image"
-            return file_path, file_type
+def _get_sink():
+    global _sink
+    if _sink is None:
+        _sink = DirectorySink()
+    return _sink
 
-    return None, None
+def _attachment_name(src_path):
+    """Return the file name of an attachment on disk or inside an export ZIP."""
+    return src_path.basename if is_archive_member(src_path) else Path(src_path).name
 
 def copy_attachment(src_path, output_base, file_type, filename, config, conversation_path):
     """
     Copy attachment file to organized Assets directory.
 
+    How the file is placed (copy, hardlink, reflink or symlink) and whether
+    identical content is stored once is decided by assets.place_asset; with an
+    archive output sink the file is streamed into the archive instead.
+
     Args:
-        src_path: Source file path
+        src_path: Source file path (or extract_zip.ZipMember for zip input)
         output_base: Base output directory
         file_type: 'image', 'audio', or 'dalle'
         filename: Filename to use
@@ -119,20 +254,25 @@ def copy_attachment(src_path, output_base, file_type, filename, config, conversa
 
     Returns: relative path for markdown embedding
     """
-    if not src_path or not Path(src_path).exists():
+    if not src_path:
         return None
 
     # Get organized asset path
     asset_dir = get_asset_path(output_base, file_type, config)
-    asset_dir.mkdir(parents=True, exist_ok=True)
 
     # Use the original filename (already includes file-ID)
-    safe_filename = filename if filename else Path(src_path).name
+    safe_filename = filename if filename else _attachment_name(src_path)
     target_path = asset_dir / safe_filename
 
-    # Copy file if it doesn't exist (avoids duplicates)
-    if not target_path.exists():
-        shutil.copy2(src_path, target_path)
+    # Place the file if it isn't there yet (avoids duplicates)
+    placed = _get_sink().add_asset(
+        src_path,
+        target_path,
+        config.get('asset_placement', 'copy'),
+        get_blob_store_path(output_base) if config.get('dedupe_assets', False) else None,
+    )
+    if not placed:
+        return None
 
     # Return relative path for markdown (from conversation file to asset)
     rel_path = get_relative_asset_path(conversation_path, target_path)
@@ -164,11 +304,54 @@ def _sanitize_image_title(title, max_len=60):
     slug = re.sub(r'[\s-]+', '_', slug)
     return slug[:max_len] or 'image'
 
+# Per-process web image download state. Downloads are queued while a conversation
+# renders (its markdown gets a placeholder token) and resolved once it is complete,
+# or later when the caller takes them with _take_pending_downloads.
+_downloader = None
+_pending_downloads = {}
+_existing_web_images = {}
+_WEB_IMAGE_TOKEN = re.compile('\x00web-image-\\d+\x00')
+
+def _get_downloader(config):
+    """Create the shared ImageDownloader on first use."""
+    global _downloader
+    if _downloader is None:
+        _downloader = ImageDownloader(
+            max_workers=config.get('download_workers', 8),
+            per_host=config.get('download_per_host', 4),
+            retries=config.get('download_retries', 3),
+            timeout=config.get('download_timeout', 20),
+            budget=config.get('download_budget', 0) or None,
+        )
+    return _downloader
+
+def _close_downloader():
+    global _downloader
+    if _downloader is not None:
+        _downloader.close()
+        _downloader = None
+
+def _find_existing_web_image(asset_dir, stem):
+    """Return an already-downloaded file for stem (any extension), listing asset_dir once."""
+    existing = _existing_web_images.get(asset_dir)
+    if existing is None:
+        existing = {}
+        # An archive starts out empty; only this run's downloads can be reused
+        if not _get_sink().is_archive:
+            with os.scandir(asset_dir) as it:
+                for entry in it:
+                    existing.setdefault(entry.name.partition('.')[0], entry.name)
+        _existing_web_images[asset_dir] = existing
+    name = existing.get(stem)
+    return asset_dir / name if name else None
+
 def _download_web_image(url, title, image_index, conv_id, output_base, conversation_path, config):
     """
-    Download a single web image to the images asset directory and return its relative path.
-    Returns None if download is disabled, requests is unavailable, or the fetch fails.
-    Falls back to the remote URL on any failure so the markdown remains usable.
+    Queue a single web image for download to the images asset directory.
+    Returns None if download is disabled or requests is unavailable. Otherwise
+    returns the relative path of an existing copy, or a placeholder token that
+    _resolve_web_image_downloads replaces with the local path — or with the
+    remote URL if the fetch fails, so the markdown remains usable.
     """
     if not config.get('download_web_images', False):
         return None
@@ -177,42 +360,76 @@ def _download_web_image(url, title, image_index, conv_id, output_base, conversat
 
     sanitized = _sanitize_image_title(title)
     asset_dir = get_asset_path(output_base, 'image', config)
-    asset_dir.mkdir(parents=True, exist_ok=True)
+    if not _get_sink().is_archive:
+        asset_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{conv_id}_{image_index:02d}_{sanitized}"
 
     # Skip the network request entirely if already downloaded (any extension)
-    existing = list(asset_dir.glob(f"{conv_id}_{image_index:02d}_{sanitized}.*"))
+    existing = _find_existing_web_image(asset_dir, stem)
     if existing:
-        _record_image_download(existing[0].name)
-        return get_relative_asset_path(conversation_path, existing[0])
+        _record_image_download(existing.name)
+        return get_relative_asset_path(conversation_path, existing)
 
-    try:
-        response = _requests.get(url, timeout=20)
-        response.raise_for_status()
-        ext = _ext_from_content_type(response.headers.get('Content-Type', ''))
-        image_data = response.content
-    except Exception as e:
-        _tqdm_write(f"  ❌ Failed to download '{title}': {e}")
-        return None
+    token = f"\x00web-image-{len(_pending_downloads)}\x00"
+    future = _get_downloader(config).submit(url)
+    _pending_downloads[token] = (future, url, title, asset_dir, stem)
+    return token
+
+def _take_pending_downloads():
+    """Detach the downloads queued so far (one conversation's) to resolve them later."""
+    global _pending_downloads
+    pending, _pending_downloads = _pending_downloads, {}
+    return pending
+
+def _downloads_done(downloads):
+    return all(future.done() for future, _, _, _, _ in downloads.values())
+
+def _resolve_web_image_downloads(chunks, conversation_path, search_messages=None, downloads=None):
+    """
+    Wait for a conversation's queued downloads (default: the pending ones) and
+    fill in their placeholders in chunks, and in the message text of
+    search_messages (updated in place).
+    """
+    if downloads is None:
+        downloads = _take_pending_downloads()
+    if not downloads:
+        return chunks
+
+    replacements = {}
+    for token, (future, url, title, asset_dir, stem) in downloads.items():
+        try:
+            image_data, content_type = future.result()
+        except Exception as e:
+            _tqdm_write(f"  ❌ Failed to download '{title}': {e}")
+            replacements[token] = url
+            continue
 
-    if not ext:
-        ext = _ext_from_url(url) or 'jpg'
+        ext = _ext_from_content_type(content_type) or _ext_from_url(url) or 'jpg'
+        filename = f"{stem}.{ext}"
+        target_path = asset_dir / filename
+        _get_sink().add_asset_bytes(target_path, image_data)
+        _existing_web_images.setdefault(asset_dir, {})[stem] = filename
 
-    filename = f"{conv_id}_{image_index:02d}_{sanitized}.{ext}"
-    target_path = asset_dir / filename
-    with open(target_path, 'wb') as f:
-        f.write(image_data)
+        _record_image_download(filename)
+        replacements[token] = get_relative_asset_path(conversation_path, target_path)
 
-    _record_image_download(filename)
-    return get_relative_asset_path(conversation_path, target_path)
+    # Placeholders contain no line break, so none is split across two chunks
+    replace = lambda m: replacements.get(m.group(0), '')
+    if search_messages:
+        search_messages[:] = [(role, create_time, _WEB_IMAGE_TOKEN.sub(replace, text) if '\x00' in text else text)
+                              for role, create_time, text in search_messages]
+    return [_WEB_IMAGE_TOKEN.sub(replace, chunk) if '\x00' in chunk else chunk for chunk in chunks]
 
 
 _image_pbar = None
+# Disabled in pool workers, where only the parent process draws progress
+_nested_progress = True
 
 
 def _record_image_download(filename):
     """Create or update the nested image-download progress bar (one per conversation)."""
     global _image_pbar
-    if not _tqdm_available:
+    if not _tqdm_available or not _nested_progress:
         return
     cols = shutil.get_terminal_size().columns
     # prefix "  🖼️ " ≈ 6 visual cols; suffix ": NNN img [HH:MM, NN.NN img/s]" ≈ 35 cols
@@ -239,6 +456,7 @@ def _find_content_reference_for_queries(queries, content_references):
     Locate the content_reference whose images match the given query list.
     Tests queries in order, returning as soon as one narrows candidates to one.
     Falls back to the first remaining match.
+    (Linear scan; _ImageGroups.find makes the same choice through an index.)
     """
     if not queries or not content_references:
         return None
@@ -255,7 +473,60 @@ def _find_content_reference_for_queries(queries, content_references):
     return remaining[0] if remaining else None
 
 
-def _render_image_group(content_reference, config=None, conv_id=None, output_base=None, conversation_path=None, image_counter=None):
+class _ImageGroups:
+    """
+    A message's image_group content references, indexed by the
+    image_search_query of their images. Built once per message, so resolving
+    its markers no longer rescans every reference and image for every query.
+    """
+    __slots__ = ('refs', 'by_query')
+
+    def __init__(self, refs):
+        self.refs = refs
+        # query -> positions in refs (ascending, as dict keys for membership tests);
+        # None if some query can't be hashed, and lookups fall back to a linear scan
+        by_query = {}
+        try:
+            for position, cr in enumerate(refs):
+                images = cr.get('images', [])
+                for img in images if isinstance(images, list) else ():
+                    if isinstance(img, dict):
+                        by_query.setdefault(img.get('image_search_query'), {})[position] = None
+        except TypeError:
+            by_query = None
+        self.by_query = by_query
+
+    @classmethod
+    def build(cls, content_references):
+        """Index the image_group references of content_references, or None if there are none."""
+        if not content_references:
+            return None
+        refs = [cr for cr in content_references if cr.get('type') == 'image_group']
+        return cls(refs) if refs else None
+
+    def find(self, queries):
+        """The reference _find_content_reference_for_queries(queries, self.refs) selects."""
+        if self.by_query is None:
+            return _find_content_reference_for_queries(queries, self.refs)
+        if not queries:
+            return None
+        remaining = None  # positions still in the running; None = all of them
+        for query in queries:
+            try:
+                positions = self.by_query.get(query)
+            except TypeError:
+                # Unhashable, so it equals none of the indexed (hashable) queries
+                positions = None
+            if not positions:
+                continue
+            matches = list(positions) if remaining is None else [i for i in remaining if i in positions]
+            if len(matches) == 1:
+                return self.refs[matches[0]]
+            if matches:
+                remaining = matches
+        return self.refs[remaining[0] if remaining else 0]
+
+def _render_image_group(content_reference, plan, conv_id=None, output_base=None, conversation_path=None, image_counter=None):
     """Return markdown image lines for all images in a content_reference."""
     parts = []
     for img in content_reference.get('images', []):
@@ -268,32 +539,25 @@ def _render_image_group(content_reference, config=None, conv_id=None, output_bas
         if image_counter is not None:
             image_index = image_counter[0]
             image_counter[0] += 1
-        local_path = _download_web_image(url, title, image_index, conv_id, output_base, conversation_path, config)
+        local_path = _download_web_image(url, title, image_index, conv_id, output_base, conversation_path, plan.config)
         embed_url = local_path if local_path else url
         parts.append(f"![{title.replace(']', chr(92) + ']')}]({embed_url})")
 
-    if config and config.get('use_obsidian_callouts') and config.get('image_group_callout_type'):
-        callout_type = config['image_group_callout_type']
-        collapse = _callout_collapse_marker(config.get('image_group_callout_state', 'static'))
-        header = f"> [!{callout_type}]{collapse} Image Group"
+    if plan.image_group_header:
         body = "\n> \n> ".join(parts)
-        return f"{header}\n> {body}"
+        return f"{plan.image_group_header}\n> {body}"
 
     return "\n\n".join(parts)
 
 
-def _resolve_image_groups(text, content_references, config=None, conv_id=None, output_base=None, conversation_path=None, image_counter=None):
+def _resolve_image_groups(text, image_groups, plan, conv_id=None, output_base=None, conversation_path=None, image_counter=None):
     """
     Replace image_group markers in text with markdown images sourced from
-    content_references. Markers have the form:
+    the message's image_groups (an _ImageGroups index). Markers have the form:
         \ue200image_group\ue202{json}\ue201
     """
-    if not content_references:
+    if image_groups is None:
         return text
-    image_group_refs = [cr for cr in content_references if cr.get('type') == 'image_group']
-    if not image_group_refs:
-        return text
-    pattern = re.compile('\ue200image_group\ue202(.*?)\ue201', re.DOTALL)
 
     def replace(m):
         try:
@@ -303,15 +567,16 @@ def _resolve_image_groups(text, content_references, config=None, conv_id=None, o
         queries = data.get('query', [])
         if isinstance(queries, str):
             queries = [queries]
-        cr = _find_content_reference_for_queries(queries, image_group_refs)
-        return _render_image_group(cr, config, conv_id, output_base, conversation_path, image_counter) if cr else m.group(0)
+        cr = image_groups.find(queries)
+        return _render_image_group(cr, plan, conv_id, output_base, conversation_path, image_counter) if cr else m.group(0)
 
-    return pattern.sub(replace, text)
+    return _IMAGE_GROUP_MARKER.sub(replace, text)
 
 
-def _process_message_parts(parts, input_base_path, output_base, config, conversation_path, content_references=None, conv_id=None, image_counter=None):
+def _process_message_parts(parts, input_base_path, output_base, plan, conversation_path, image_groups=None, conv_id=None, image_counter=None):
     """
     Process message parts, handling both text and image_asset_pointer types.
+    image_groups is the message's _ImageGroups index (None when it has none).
     Returns: (formatted_content, list_of_attachment_paths)
     """
     if not parts:
@@ -323,7 +588,7 @@ def _process_message_parts(parts, input_base_path, output_base, config, conversa
     for part in parts:
         if isinstance(part, str):
             # Regular text content — resolve any inline image_group markers first
-            content_pieces.append(_resolve_image_groups(part, content_references, config, conv_id, output_base, conversation_path, image_counter) if content_references else part)
+            content_pieces.append(_resolve_image_groups(part, image_groups, plan, conv_id, output_base, conversation_path, image_counter) if image_groups is not None else part)
         elif isinstance(part, dict):
             content_type = part.get('content_type', '')
 
@@ -335,8 +600,8 @@ def _process_message_parts(parts, input_base_path, output_base, config, conversa
                 if file_id:
                     src_path, file_type = find_attachment_file(file_id, input_base_path)
                     if src_path:
-                        filename = Path(src_path).name
-                        rel_path = copy_attachment(src_path, output_base, file_type, filename, config, conversation_path)
+                        filename = _attachment_name(src_path)
+                        rel_path = copy_attachment(src_path, output_base, file_type, filename, plan.config, conversation_path)
                         if rel_path:
                             attachments.append(rel_path)
                             # Add image embed in markdown
@@ -363,8 +628,8 @@ def _process_message_parts(parts, input_base_path, output_base, config, conversa
                     if file_id:
                         src_path, file_type = find_attachment_file(file_id, input_base_path)
                         if src_path and file_type == 'audio':
-                            filename = Path(src_path).name
-                            rel_path = copy_attachment(src_path, output_base, file_type, filename, config, conversation_path)
+                            filename = _attachment_name(src_path)
+                            rel_path = copy_attachment(src_path, output_base, file_type, filename, plan.config, conversation_path)
                             if rel_path:
                                 attachments.append(rel_path)
                                 # Embed audio with HTML5 audio tag
@@ -389,12 +654,8 @@ def _process_message_parts(parts, input_base_path, output_base, config, conversa
             # Unknown type
             content_pieces.append(str(part))
 
-    # Join content pieces
-    content = "\n".join(filter(None, content_pieces))
-    # Strip Unicode Private Use Area characters used as metadata delimiters (fixes #8)
-    content = re.sub(r'[\ue000-\uf8ff]', '', content)
-    # Normalize line endings — pasted content may carry \r\n or bare \r from external sources
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    # Join content pieces, then strip Private Use Area delimiters and normalize line endings
+    content = _normalize_text("\n".join(filter(None, content_pieces)))
     return content, attachments
 
 def _callout_collapse_marker(state):
@@ -405,115 +666,263 @@ def _callout_collapse_marker(state):
         return '+'
     return ''
 
-def _get_message_content(message, input_base_path, output_base, config, conversation_path, conv_id=None, image_counter=None):
+# Unicode Private Use Area characters are used as metadata delimiters (fixes #8)
+_PRIVATE_USE_CHARS = re.compile('[\ue000-\uf8ff]')
+_IMAGE_GROUP_MARKER = re.compile('\ue200image_group\ue202(.*?)\ue201', re.DOTALL)
+
+def _normalize_newlines(text):
+    """Normalize line endings — pasted content may carry \r\n or bare \r from external sources."""
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _normalize_text(text):
+    """Strip Private Use Area characters, then normalize line endings.
+    Pure-ASCII text (the common case) can't contain PUA characters and skips the regex."""
+    if not text.isascii():
+        text = _PRIVATE_USE_CHARS.sub('', text)
+    return _normalize_newlines(text)
+
+# Rendered notes are lists of pieces, and long message bodies are split into
+# pieces of about this many characters (at line breaks), so a multi-megabyte
+# paste is never copied whole while it is quoted, assembled and written.
+_RENDER_CHUNK_CHARS = 1 << 20
+
+def _iter_chunks(text, start=0, quote=False):
+    """
+    Yield text[start:] in pieces ending at line breaks, with "> " after every
+    line break when quote is set. Short text comes back as a single piece
+    (the string itself, unless it had to be sliced or quoted).
+    """
+    length = len(text)
+    while start < length:
+        end = text.find('\n', start + _RENDER_CHUNK_CHARS) + 1 or length
+        piece = text[start:end] if start or end < length else text
+        yield piece.replace("\n", "\n> ") if quote else piece
+        start = end
+
+RenderPlan = namedtuple('RenderPlan', [
+    'config',                       # the raw config, for non-rendering lookups (assets, downloads)
+    'file_name_format',
+    'date_format',
+    'use_frontmatter',
+    'include_date',
+    'user_name',
+    'assistant_name',
+    'skip_empty_messages',
+    'message_separator',
+    'timestamp_format',             # None when per-message timestamps are off
+    'timestamp_tag',
+    'timestamp_in_header',
+    'timestamp_in_footer',
+    'reasoning_prefix',             # callout header + "\n> " for thoughts, or None
+    'recap_prefix',                 # text wrapped around reasoning recaps
+    'recap_suffix',
+    'suppress_reasoning_header',
+    'suppress_recap_header',
+    'user_context_callout',
+    'prompt_callout',               # "> [!type]collapse" prefixes, '' when not wrapped
+    'response_callout',
+    'tool_callout',
+    'image_group_header',           # full callout header line, or None
+    'download_web_images',
+    'search_index',                 # collect message text for the SQLite search index
+])
+
+def compile_render_plan(config):
     """
-    Extracts the content of a message from the message object,
+    Resolve every rendering option once per run, so the per-message path does no
+    config lookups, callout-header formatting or default handling of its own.
+    """
+    callouts = config.get('use_obsidian_callouts', True)
+
+    def callout_prefix(type_key, state):
+        callout_type = config.get(type_key, '') if callouts else ''
+        return f"> [!{callout_type}]{_callout_collapse_marker(state)}" if callout_type else ''
+
+    reasoning_type = config.get('reasoning_callout_type', 'note')
+    reasoning_prefix = None
+    if callouts and reasoning_type:
+        collapse = _callout_collapse_marker(config.get('reasoning_callout_state', 'static'))
+        reasoning_prefix = f"> [!{reasoning_type}]{collapse} Internal Reasoning\n> "
+
+    recap_type = config.get('reasoning_summary_callout_type', 'info')
+    if not callouts:
+        recap_prefix, recap_suffix = "*", "*"
+    elif recap_type:
+        collapse = _callout_collapse_marker(config.get('reasoning_summary_callout_state', 'static'))
+        recap_prefix, recap_suffix = f"> [!{recap_type}]{collapse} Reasoning Summary\n> ", ""
+    else:
+        recap_prefix, recap_suffix = "", ""
+
+    # Image groups only use a callout when use_obsidian_callouts is set explicitly
+    image_group_header = None
+    if config.get('use_obsidian_callouts') and config.get('image_group_callout_type'):
+        collapse = _callout_collapse_marker(config.get('image_group_callout_state', 'static'))
+        image_group_header = f"> [!{config['image_group_callout_type']}]{collapse} Image Group"
+
+    timestamp_position = config.get('timestamp_position', 'header')
+    tool_state = config.get('tool_callout_state', 'static')
+
+    return RenderPlan(
+        config=config,
+        file_name_format=config["file_name_format"],
+        date_format=config.get('date_format', '%m-%d-%Y'),
+        use_frontmatter=config.get('use_frontmatter', True),
+        include_date=config.get('include_date', True),
+        user_name=config.get('user_name', ''),
+        assistant_name=config.get('assistant_name', 'ChatGPT'),
+        skip_empty_messages=config.get('skip_empty_messages', True),
+        message_separator=config.get('message_separator', '\n\n'),
+        timestamp_format=(config.get('message_timestamp_format', '%m-%d-%Y %H:%M')
+                          if config.get('include_message_timestamps', True) else None),
+        timestamp_tag=config.get('timestamp_tag', 'sub'),
+        timestamp_in_header=timestamp_position == 'header',
+        timestamp_in_footer=timestamp_position == 'footer',
+        reasoning_prefix=reasoning_prefix,
+        recap_prefix=recap_prefix,
+        recap_suffix=recap_suffix,
+        suppress_reasoning_header=bool(callouts and reasoning_type),
+        suppress_recap_header=bool(callouts and recap_type),
+        user_context_callout=bool(callouts),
+        prompt_callout=callout_prefix('prompt_callout_type', 'static'),
+        response_callout=callout_prefix('response_callout_type', 'static'),
+        tool_callout=callout_prefix('tool_callout_type', tool_state),
+        image_group_header=image_group_header,
+        download_web_images=config.get('download_web_images', False),
+        search_index=config.get('search_index', False),
+    )
+
+class _Message:
+    """
+    One message on the rendered path. The nested author/content/metadata dicts
+    are probed once here instead of by every rendering step.
+    """
+    __slots__ = (
+        'role', 'tool_name', 'recipient', 'content', 'content_type',
+        'content_references', 'create_time', 'is_reasoning', 'is_recap',
+    )
+
+    def __init__(self, message, metadata):
+        # A system node may carry "content": null; it is skipped when rendering
+        author = message.get("author") or {}
+        content = message.get("content") or {}
+        self.role = author.get("role", "unknown")
+        self.tool_name = author.get("name", "tool")
+        self.recipient = message.get("recipient", "")
+        self.content = content
+        self.content_type = content.get("content_type", "")
+        self.content_references = metadata.get('content_references') or []
+        self.create_time = normalize_timestamp(message.get("create_time"))
+        self.is_reasoning = "thoughts" in content
+        self.is_recap = self.content_type == "reasoning_recap"
+
+def _message_records(messages):
+    """Build _Message records for the visible messages of a traversed path."""
+    records = []
+    for message in messages:
+        metadata = message.get("metadata") or {}
+        # Skip system messages that are visually hidden
+        if not metadata.get("is_visually_hidden_from_conversation", False):
+            records.append(_Message(message, metadata))
+    return records
+
+def _format_message_timestamp(msg_time, plan):
+    """Return the tagged per-message timestamp, or "" when disabled/unavailable."""
+    if plan.timestamp_format is None or not msg_time:
+        return ""
+    ts_text = datetime.fromtimestamp(msg_time).strftime(plan.timestamp_format)
+    tag = plan.timestamp_tag
+    return f"<{tag}>{ts_text}</{tag}>" if tag else ts_text
+
+def _get_message_content(message, input_base_path, output_base, plan, conversation_path, conv_id=None, image_counter=None):
+    """
+    Extracts the content of a message (a _Message record),
     with handling for various content types including multimodal (images).
     Returns: (content_text, attachment_paths)
     """
-    content_obj = message.get("content", {})
-    content_type = content_obj.get("content_type", "unknown")
+    content_obj = message.content
+    content_type = message.content_type
 
     if "parts" in content_obj:
         parts = content_obj["parts"]
-        content_refs = message.get('metadata', {}).get('content_references') or []
-        return _process_message_parts(parts, input_base_path, output_base, config, conversation_path, content_refs, conv_id, image_counter)
+        # image_group references are indexed once for all of this message's parts
+        image_groups = _ImageGroups.build(message.content_references)
+        return _process_message_parts(parts, input_base_path, output_base, plan, conversation_path, image_groups, conv_id, image_counter)
 
     elif content_type == "reasoning_recap":
         # Handle reasoning recap messages
-        recap_text = content_obj.get('content', 'Reasoning completed')
-        recap_text = recap_text.replace('\r\n', '\n').replace('\r', '\n')
-        if config.get('use_obsidian_callouts', True):
-            callout_type = config.get('reasoning_summary_callout_type', 'info')
-            if callout_type:
-                collapse = _callout_collapse_marker(config.get('reasoning_summary_callout_state', 'static'))
-                content = f"> [!{callout_type}]{collapse} Reasoning Summary\n> {recap_text}"
-            else:
-                content = recap_text
-        else:
-            content = f"*{recap_text}*"
-        return content, []
+        recap_text = _normalize_newlines(content_obj.get('content', 'Reasoning completed'))
+        return f"{plan.recap_prefix}{recap_text}{plan.recap_suffix}", []
 
-    elif "thoughts" in content_obj:
+    elif message.is_reasoning:
         # Handle ChatGPT's internal reasoning/thoughts format
         thoughts = content_obj["thoughts"]
         thought_lines = []
         for thought in thoughts:
             if isinstance(thought, dict):
                 summary = thought.get('summary', 'Thought')
-                thought_content = thought.get('content', '').replace('\r\n', '\n').replace('\r', '\n')
+                thought_content = _normalize_newlines(thought.get('content', ''))
                 thought_lines.append(f"**{summary}**: {thought_content}")
 
         content = "\n".join(thought_lines)
-        if config.get('use_obsidian_callouts', True) and content:
-            callout_type = config.get('reasoning_callout_type', 'note')
-            if callout_type:
-                collapse = _callout_collapse_marker(config.get('reasoning_callout_state', 'static'))
-                content = f"> [!{callout_type}]{collapse} Internal Reasoning\n> " + content.replace("\n", "\n> ")
+        if plan.reasoning_prefix and content:
+            content = plan.reasoning_prefix + content.replace("\n", "\n> ")
         return content, []
 
     elif content_type == "user_editable_context":
         # Handle user context/profile messages
-        profile = content_obj.get("user_profile", "").replace('\r\n', '\n').replace('\r', '\n')
-        instructions = content_obj.get("user_instructions", "").replace('\r\n', '\n').replace('\r', '\n')
+        profile = _normalize_newlines(content_obj.get("user_profile", ""))
+        instructions = _normalize_newlines(content_obj.get("user_instructions", ""))
         content = f"*User Context*:\n{profile}\n{instructions}".strip()
-        if config.get('use_obsidian_callouts', True):
+        if plan.user_context_callout:
             content = f"> [!abstract] User Context\n> " + content.replace("\n", "\n> ")
         return content, []
 
     elif content_type == "code":
         # Handle code content
-        code_text = content_obj.get('text', content_obj.get('content', ''))
-        code_text = code_text.replace('\r\n', '\n').replace('\r', '\n')
+        code_text = _normalize_newlines(content_obj.get('text', content_obj.get('content', '')))
         return f"```\n{code_text}\n```", []
 
     elif "text" in content_obj:
-        text = re.sub(r'[\ue000-\uf8ff]', '', content_obj["text"])
-        return text.replace('\r\n', '\n').replace('\r', '\n'), []
+        return _normalize_text(content_obj["text"]), []
 
     elif "result" in content_obj:
-        text = re.sub(r'[\ue000-\uf8ff]', '', content_obj["result"])
-        return text.replace('\r\n', '\n').replace('\r', '\n'), []
+        return _normalize_text(content_obj["result"]), []
 
     else:
         # Unknown format, try to extract something useful
         if isinstance(content_obj, dict):
-            return str(content_obj.get('content', '')).replace('\r\n', '\n').replace('\r', '\n'), []
+            return _normalize_newlines(str(content_obj.get('content', ''))), []
         return "", []
 
-def _get_author_name(message, config):
+def _get_author_name(message, plan):
     """
     Determines the appropriate author name based on message type and role.
     """
-    author_role = message.get("author", {}).get("role", "unknown")
-    base_name = config.get('user_name', '') if author_role == "user" else config.get('assistant_name', 'ChatGPT')
+    author_role = message.role
 
     # Handle tool messages
     if author_role == "tool":
-        tool_name = message.get("author", {}).get("name", "tool")
-        return f"Tool ({tool_name})"
-
-    # Check for special content types
-    content = message.get("content", {})
-    recipient = message.get("recipient", "")
-    content_type = content.get("content_type", "")
+        return f"Tool ({message.tool_name})"
 
     # Tool call detection
+    content_type = message.content_type
     if content_type == "code":
-        if recipient == "web":
+        if message.recipient == "web":
             return "Tool Call"
-        elif recipient == "web.run":
+        elif message.recipient == "web.run":
             return "Tool Execution"
 
     # Other special content types
-    if "thoughts" in content:
+    if message.is_reasoning:
         return "Internal Reasoning"
-    elif content_type == "reasoning_recap":
+    elif message.is_recap:
         return "Reasoning Summary"
     elif content_type == "user_editable_context":
         return "System (context)"
 
-    return base_name
+    return plan.user_name if author_role == "user" else plan.assistant_name
 
 def _get_title(title, first_message):
     """
@@ -553,6 +962,48 @@ def generate_frontmatter(title, create_time, update_time, config):
 
     return "\n".join(lines)
 
+def _chain_lengths(mapping, start_ids):
+    """
+    Return {node_id: chain length} for start_ids and every ancestor they reach.
+
+    A node's chain length is the number of distinct nodes on its walk back to
+    the root: 1 + its parent's, or 1 when the parent is missing. Depths are
+    memoized, so walks that share ancestors (regenerated replies branching off
+    one conversation) cost O(nodes) in total rather than O(depth) per leaf.
+    A parent cycle stops a walk at the first repeated node, so every node on a
+    cycle counts the whole cycle once.
+    """
+    depths = {}
+    for start_id in start_ids:
+        if start_id in depths or not start_id or start_id not in mapping:
+            continue
+        path = []
+        position = {}
+        current_id = start_id
+        while True:
+            position[current_id] = len(path)
+            path.append(current_id)
+            node = mapping[current_id]
+            parent = node.get("parent") if isinstance(node, dict) else None
+            if not parent or parent not in mapping:
+                depth = 0
+                break
+            if parent in depths:
+                depth = depths[parent]
+                break
+            if parent in position:
+                cycle = path[position[parent]:]
+                for node_id in cycle:
+                    depths[node_id] = len(cycle)
+                del path[position[parent]:]
+                depth = len(cycle)
+                break
+            current_id = parent
+        for node_id in reversed(path):
+            depth += 1
+            depths[node_id] = depth
+    return depths
+
 def _traverse_mapping(mapping, n_candidates=5):
     """
     Traverse the conversation's linked-list structure to extract messages
@@ -567,6 +1018,7 @@ def _traverse_mapping(mapping, n_candidates=5):
       1. Find all leaf nodes (children: []).
       2. Take the top N by update_time (fallback: create_time) — most recent
          activity is most likely to be the live conversation end.
+         n_candidates=None considers every leaf.
       3. Among those, pick the one with the longest backward chain — the live
          path is always deeper than abandoned branches (dead-ends terminate
          early; the real conversation goes further).
@@ -584,8 +1036,6 @@ def _traverse_mapping(mapping, n_candidates=5):
     if not mapping:
         return []
 
-    node_ids = set(mapping.keys())
-
     # Step 1 — find all leaf nodes
     leaves = [
         node for node in mapping.values()
@@ -600,22 +1050,11 @@ def _traverse_mapping(mapping, n_candidates=5):
         return msg.get("update_time") or msg.get("create_time") or 0
 
     leaves.sort(key=_leaf_time, reverse=True)
-    candidates = leaves[:n_candidates]
+    candidates = leaves if n_candidates is None else leaves[:n_candidates]
 
     # Step 3 — compute backward chain length for each candidate
-    def _chain_length(start_node):
-        length = 0
-        current_id = start_node.get("id")
-        visited = set()
-        while current_id and current_id in mapping and current_id not in visited:
-            visited.add(current_id)
-            length += 1
-            current_id = mapping[current_id].get("parent")
-            if current_id not in node_ids:
-                break
-        return length
-
-    best_leaf = max(candidates, key=lambda n: (_chain_length(n), _leaf_time(n)))
+    depths = _chain_lengths(mapping, [node.get("id") for node in candidates])
+    best_leaf = max(candidates, key=lambda n: (depths.get(n.get("id"), 0), _leaf_time(n)))
 
     # Step 4 — paragen_variant_choice tiebreaker
     # Walk backward to the first user node; if it has paragen_variant_choice
@@ -629,7 +1068,7 @@ def _traverse_mapping(mapping, n_candidates=5):
             visited.add(current_id)
             path.append(current_id)
             parent = mapping[current_id].get("parent")
-            if parent not in node_ids:
+            if parent not in mapping:
                 break
             current_id = parent
         path.reverse()
@@ -661,224 +1100,777 @@ def _traverse_mapping(mapping, n_candidates=5):
     return messages
 
 
-def process_conversations(data, output_dir, config, input_base_path):
+def _conversation_file_name(entry, plan):
+    """Render file_name_format for a conversation and return the markdown file name."""
+    title = _get_title(entry.get("title", None), None)
+    create_time = entry.get("create_time", None)
+    conversation_id = entry.get("conversation_id", "")
+
+    # Shared whitelist filter — keeps alphanumeric, spaces, underscores, hyphens
+    _filtered = ''.join(c for c in title if c.isalnum() or c in [' ', '_', '-']).strip()
+    if not _filtered:
+        _filtered = f"conversation_{int(create_time or 0)}"
+
+    # {title}: spaces replaced with underscores — matches upstream behavior exactly
+    safe_title = _filtered.replace(' ', '_')
+
+    # {display_title}: spaces preserved
+    display_title = _filtered
+
+    # {id}: short conversation ID for collision safety
+    id_short = conversation_id[:8] if conversation_id else ""
+
+    # {date}: conversation creation date
+    date_str = ""
+    create_ts = normalize_timestamp(create_time)
+    if create_ts:
+        date_str = datetime.fromtimestamp(create_ts).strftime(plan.date_format)
+
+    file_stem = plan.file_name_format.format(
+        title=safe_title,
+        display_title=display_title,
+        id=id_short,
+        date=date_str,
+    )
+    return f"{file_stem}.md"
+
+def _render_conversation(entry, output_base, input_base, plan, file_path=None, resolve_downloads=True):
     """
-    Process all conversations and generate markdown files.
+    Render a single conversation to markdown.
+    Attachments are copied into Assets/ as they are encountered.
+    file_path comes from the output plan; without it the path is derived from
+    the organization settings and file_name_format.
+    Returns: (file_path, chunks, search_record), or None if the entry is not a
+    conversation. chunks is the markdown as a list of strings to be joined or
+    written in order (see _iter_chunks), so long messages are never copied into
+    one big string. search_record is None unless plan.search_index is set;
+    then it holds the metadata and (role, create_time, text) of every rendered
+    message for search_index.SearchIndex.update().
+    With resolve_downloads=False, web images still downloading are left as
+    placeholders in chunks and in the search text, for the caller to take with
+    _take_pending_downloads and fill in with _resolve_web_image_downloads.
     """
-    output_base = Path(output_dir)
-    input_base = Path(input_base_path)
+    # Ensure each entry is a dictionary
+    if not isinstance(entry, dict):
+        print(f"Skipping entry, expected dict but got {type(entry).__name__}: {entry}")
+        return None
 
-    for entry in tqdm(data, desc="Processing conversations"):
-        # Ensure each entry is a dictionary
-        if not isinstance(entry, dict):
-            print(f"Skipping entry, expected dict but got {type(entry).__name__}: {entry}")
+    # Safely get the title and mapping
+    title = entry.get("title", None)
+    create_time = entry.get("create_time", None)
+    update_time = entry.get("update_time", None)
+    mapping = entry.get("mapping", {})
+
+    # Extract messages in correct conversation order via linked-list traversal.
+    # Sorting by create_time is unreliable — see _traverse_mapping() for details.
+    # Each visible message is parsed once into a compact record, so rendering
+    # never walks the mapping again. (The mapping itself stays alive as long as
+    # the caller holds the entry.)
+    messages = _message_records(_traverse_mapping(mapping))
+
+    # Use the first message to infer the title if it's not available
+    inferred_title = _get_title(title, messages[0] if messages else None)
+
+    if file_path is None:
+        conversation_dir = get_conversation_path(entry, plan.config, output_base)
+        file_path = conversation_dir / _conversation_file_name(entry, plan)
+
+    # Short conversation ID, used to name downloaded web images
+    conversation_id = entry.get("conversation_id", "")
+    id_short = conversation_id[:8] if conversation_id else ""
+
+    # Per-conversation counter for downloaded web images — ensures unique, ordered filenames.
+    # None when download_web_images is disabled so no counter logic runs in the call chain.
+    image_counter = [0] if plan.download_web_images else None
+
+    # Render messages into memory, as a list of pieces; the caller writes the file
+    out = []
+    search_messages = [] if plan.search_index else None
+
+    # Write frontmatter
+    if plan.use_frontmatter:
+        frontmatter = generate_frontmatter(inferred_title, create_time, update_time, plan.config)
+        out.append(frontmatter)
+
+    # Write title
+    out.append(f"# {inferred_title}\n\n")
+
+    # Write date if configured
+    first_message_ts = messages[0].create_time if messages else None
+    if first_message_ts and plan.include_date:
+        date = datetime.fromtimestamp(first_message_ts).strftime(plan.date_format)
+        out.append(f"<sub>{date}</sub>\n\n")
+
+    # Write separator
+    out.append("---\n\n")
+
+    # Write messages
+    for message in messages:
+        # Skip system messages
+        author_role = message.role
+        if author_role == "system":
             continue
 
-        # Safely get the title and mapping
-        title = entry.get("title", None)
-        create_time = entry.get("create_time", None)
-        update_time = entry.get("update_time", None)
-        mapping = entry.get("mapping", {})
+        content, attachments = _get_message_content(
+            message,
+            input_base,
+            output_base,
+            plan,
+            file_path,
+            id_short,
+            image_counter
+        )
+        author_name = _get_author_name(message, plan)
+
+        # Detect reasoning/recap messages — they carry their own callout
+        # headers and must not be wrapped by response_callout_type.
+        msg_content_type = message.content_type
+        msg_recipient = message.recipient
+        is_reasoning = message.is_reasoning
+        is_recap = message.is_recap
+
+        # Suppress the bold header for reasoning/recap when their own
+        # callout is active — the callout title serves as the header.
+        if is_reasoning:
+            suppress_header = plan.suppress_reasoning_header
+        elif is_recap:
+            suppress_header = plan.suppress_recap_header
+        else:
+            suppress_header = False
+
+        # (isspace() instead of strip(), which would copy a long message)
+        if not plan.skip_empty_messages or (content and not content.isspace()):
+            # Build timestamp string if enabled
+            timestamp_str = _format_message_timestamp(message.create_time, plan)
+
+            # Determine the prompt/response/tool callout (already compiled with its
+            # collapse marker, '' when callouts are off).
+            # Reasoning/recap messages are excluded — they manage their own callouts.
+            if author_role == "user":
+                msg_callout = plan.prompt_callout
+            elif author_role == "tool":
+                msg_callout = plan.tool_callout
+            elif author_role == "assistant" and msg_content_type == "code" and msg_recipient in ("web", "web.run"):
+                msg_callout = plan.tool_callout
+            elif author_role == "assistant" and not (is_reasoning or is_recap):
+                msg_callout = plan.response_callout
+            else:
+                msg_callout = ''
+
+            if msg_callout:
+                # Prompt/response/tool callout mode: author name is the callout title.
+                title_part = f" {author_name}" if author_name else ""
+                out.append(f"{msg_callout}{title_part}")
+                if timestamp_str and plan.timestamp_in_header:
+                    out.append(f"\n> {timestamp_str}\n> ")
+                out.append("\n> ")
+                out.extend(_iter_chunks(content, quote=True))
+                if timestamp_str and plan.timestamp_in_footer:
+                    out.append(f"\n> \n> {timestamp_str}")
+
+            elif suppress_header and timestamp_str:
+                # Reasoning/recap with an active callout and a timestamp:
+                # inject timestamp into the callout so it stays attached.
+                # content is guaranteed to be a callout block here.
+                first_nl = content.find('\n')
+                if first_nl != -1 and plan.timestamp_in_header:
+                    out.append(f"{content[:first_nl]}\n> {timestamp_str}\n> ")
+                    out.extend(_iter_chunks(content, first_nl))
+                elif first_nl != -1:  # footer
+                    out.extend(_iter_chunks(content))
+                    out.append(f"\n> \n> {timestamp_str}")
+                else:
+                    out.extend(_iter_chunks(content))
 
-        # Extract messages in correct conversation order via linked-list traversal.
-        # Sorting by create_time is unreliable — see _traverse_mapping() for details.
-        messages = _traverse_mapping(mapping)
+            else:
+                # Standard mode: timestamp inline with the bold header, matching
+                # original output. When the header is suppressed (empty author
+                # name), the timestamp is written on its own line so it remains
+                # visible.
+                if author_name and not suppress_header:
+                    if timestamp_str and plan.timestamp_in_header:
+                        out.append(f"**{author_name}**: {timestamp_str}\n\n")
+                    else:
+                        out.append(f"**{author_name}**:\n\n")
+                elif timestamp_str and plan.timestamp_in_header:
+                    out.append(f"{timestamp_str}\n\n")
+                out.extend(_iter_chunks(content))
+                if timestamp_str and plan.timestamp_in_footer:
+                    out.append(f"\n\n{timestamp_str}")
+
+            out.append(plan.message_separator)
+            if search_messages is not None:
+                search_messages.append((author_role, message.create_time, content))
+
+    chunks = out
+    if resolve_downloads:
+        chunks = _resolve_web_image_downloads(out, file_path, search_messages)
+        _close_image_pbar()
 
-        # Filter out system messages that are visually hidden
-        messages = [
-            msg for msg in messages
-            if not msg.get("metadata", {}).get("is_visually_hidden_from_conversation", False)
-        ]
+    search_record = None
+    if search_messages is not None:
+        search_record = {
+            'title': inferred_title,
+            'category': get_conversation_category(entry, plan.config) or plan.config.get('regular_folder', 'Regular'),
+            'create_time': normalize_timestamp(create_time),
+            'update_time': normalize_timestamp(update_time),
+            'messages': search_messages,
+        }
+    return file_path, chunks, search_record
+
+def _encode_note(text, newline):
+    return (text.replace('\n', newline) if newline != '\n' else text).encode('utf-8')
+
+def _write_markdown(file_path, chunks, config):
+    """
+    Write rendered markdown (a string, or the list of chunks _render_conversation
+    returns) to file_path using the configured line endings, through the run's
+    output sink. The default DirectorySink leaves a file that already holds
+    exactly these bytes untouched and replaces changed ones atomically; archive
+    sinks add the note as a member.
 
-        # Use the first message to infer the title if it's not available
-        inferred_title = _get_title(title, messages[0] if messages else None)
+    Notes longer than _RENDER_CHUNK_CHARS are converted and encoded a batch of
+    chunks at a time and streamed to the sink, so they are never held in memory
+    as one string or one bytes object.
 
-        # Get organized path for this conversation
-        conversation_dir = get_conversation_path(entry, config, output_base)
-        conversation_dir.mkdir(parents=True, exist_ok=True)
+    Returns: (written, size) — whether the file was (re)written, and its size in bytes
+    """
+    newline = {'lf': '\n', 'crlf': '\r\n'}.get(config.get('line_endings', 'native'), os.linesep)
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    if sum(map(len, chunks)) <= _RENDER_CHUNK_CHARS:
+        data = _encode_note("".join(chunks), newline)
+        return _get_sink().write_note(file_path, data), len(data)
+
+    size = 0
+    def _batches():
+        nonlocal size
+        batch, batch_chars = [], 0
+        for chunk in chunks:
+            batch.append(chunk)
+            batch_chars += len(chunk)
+            if batch_chars >= _RENDER_CHUNK_CHARS:
+                data = _encode_note("".join(batch), newline)
+                size += len(data)
+                yield data
+                batch, batch_chars = [], 0
+        if batch:
+            data = _encode_note("".join(batch), newline)
+            size += len(data)
+            yield data
+
+    written = _get_sink().write_note_chunks(file_path, _batches())
+    return written, size
+
+_worker_state = None
+
+# profiling.Profiler while running with --profile (see _start_profiling)
+_profiler = None
+
+def _start_profiling():
+    """Instrument this module's hot paths with a fresh profiler."""
+    global _profiler
+    import profiling
+
+    _profiler = profiling.Profiler()
+    profiling.instrument(sys.modules[__name__], _profiler)
+    return _profiler
+
+def _init_worker(output_base, input_base, config, attachment_index, profile=False, place_assets=True):
+    """Process pool initializer: receive shared run state once per worker."""
+    global _worker_state, _nested_progress, _sink
+    register_attachment_index(input_base, attachment_index)
+    # Nested bars from several processes would garble the main progress bar
+    _nested_progress = False
+    # Assets are recorded and sent back with each conversation. Only into an
+    # output folder can workers place them themselves; anything else (an
+    # archive, the caller's sink) is written by the parent.
+    _sink = DeferredSink(DirectorySink() if place_assets else None)
+    _worker_state = (output_base, input_base, compile_render_plan(config))
+    if profile:
+        _start_profiling()
+
+def _render_in_worker(entry, file_path):
+    """Render one conversation; returns (result, recorded assets, profile snapshot)."""
+    output_base, input_base, plan = _worker_state
+    result = _render_conversation(entry, output_base, input_base, plan, file_path)
+    assets = _sink.take()
+    # Ship this conversation's timings back to the parent with the result
+    snapshot = _profiler.snapshot() if _profiler is not None else None
+    return result, assets, snapshot
+
+def _render_parallel(jobs, output_base, input_base, config, workers, sink=None):
+    """
+    Render (key, entry, file_path) jobs on a process pool, yielding
+    (key, result, assets) in input order. Assets are placed by the workers when
+    sink is a DirectorySink, otherwise replayed into sink (if any) here.
+    At most workers * 4 conversations are in flight so streamed input stays bounded.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    place_in_workers = isinstance(sink, DirectorySink)
+
+    def collect(future):
+        result, assets, snapshot = future.result()
+        if snapshot is not None:
+            _profiler.merge(snapshot)
+        if assets and sink is not None and not place_in_workers:
+            # Into the sink before the note, the same order as a serial run
+            replay(sink, assets)
+        return result, assets
+
+    attachment_index = get_attachment_index(input_base)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(output_base, input_base, config, attachment_index, _profiler is not None, place_in_workers),
+    ) as pool:
+        pending = deque()
+        for key, entry, file_path in jobs:
+            pending.append((key, pool.submit(_render_in_worker, entry, file_path)))
+            if len(pending) >= workers * 4:
+                key, future = pending.popleft()
+                yield (key, *collect(future))
+        while pending:
+            key, future = pending.popleft()
+            yield (key, *collect(future))
+
+def resolve_worker_count(value):
+    """Turn a jobs/workers setting into a process count (0 or less = all CPUs)."""
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        return 1
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
 
-        # Build filename token values
-        conversation_id = entry.get("conversation_id", "")
+class ConversationSource:
+    """
+    Re-iterable stream of conversations. Every iteration calls open_stream(*args)
+    again, so the conversion streams the export without holding all
+    conversations in memory.
+
+    stubs, if given, is called without arguments for the top-level fields
+    (shard_index.STUB_KEYS) of every conversation, read without decoding the
+    export (see shard_index.shard_stubs). The output is then planned from them
+    (see plan_output), so the export is decoded only once, and the stream
+    yields only conversation objects, in step with the stubs.
+    """
 
-        # Shared whitelist filter — keeps alphanumeric, spaces, underscores, hyphens
-        _filtered = ''.join(c for c in inferred_title if c.isalnum() or c in [' ', '_', '-']).strip()
-        if not _filtered:
-            _filtered = f"conversation_{int(create_time or 0)}"
+    def __init__(self, open_stream, *args, stubs=None):
+        self._open_stream = open_stream
+        self._args = args
+        self.stubs = stubs
 
-        # {title}: spaces replaced with underscores — matches upstream behavior exactly
-        safe_title = _filtered.replace(' ', '_')
+    def __iter__(self):
+        stream = iter(self._open_stream(*self._args))
+        if self.stubs is None:
+            return stream
+        return (entry for entry in stream if isinstance(entry, dict))
 
-        # {display_title}: spaces preserved
-        display_title = _filtered
+def _check_reiterable(data):
+    if isinstance(data, Iterator):
+        raise TypeError("conversations must be a list or a re-iterable source such as ConversationSource, "
+                        "not a one-shot iterator: every output path is planned before rendering starts")
 
-        # {id}: short conversation ID for collision safety
-        id_short = conversation_id[:8] if conversation_id else ""
+def plan_output(data, config, output_dir):
+    """
+    Decide every conversation's output file before anything is rendered.
+    data is only read if it has no stubs (see ConversationSource).
+    See organize.create_organization_summary for the returned summary, which
+    includes 'paths' (in input order) and resolved 'collisions'.
+    """
+    stubs = getattr(data, 'stubs', None)
+    plan = compile_render_plan(config)
+    return create_organization_summary(
+        stubs() if stubs is not None else data, config, Path(output_dir),
+        lambda entry: _conversation_file_name(entry, plan)
+    )
+
+# Settings that decide where a conversation's note goes (see organize and _conversation_file_name)
+_LAYOUT_KEYS = ('organization_mode', 'starred_folder', 'archived_folder', 'regular_folder',
+                'date_folder_format', 'file_name_format', 'date_format')
+
+def _layout_key(config, output_dir):
+    """Fingerprint of everything the output paths depend on (dates use the local time zone)."""
+    payload = [os.path.abspath(output_dir), {key: config.get(key) for key in _LAYOUT_KEYS}, time.tzname]
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+
+def _iter_positions(data, positions):
+    """Yield the conversations of data at positions, counting conversation objects only."""
+    wanted = set(positions)
+    position = 0
+    for entry in data:
+        if isinstance(entry, dict):
+            if position in wanted:
+                yield entry
+            position += 1
+
+def select_conversations(data, conversation_filter, config, output_dir, shard_files=None):
+    """
+    Narrow an export down to the conversations conversation_filter accepts
+    (see conversation_filter.ConversationFilter), checking all it can before
+    a conversation is decoded.
+
+    Output paths are still planned against the whole export, so each selected
+    conversation gets the same file name (collision suffix included) as in an
+    unfiltered run. With shard_files (the export's conversations*.json) the
+    export is not decoded: a byte-offset index of the shards (see shard_index)
+    supplies the top-level fields that filtering and planning need, and only
+    the accepted conversations are decoded. With config['cache_conversation_index']
+    the index is saved next to the shards and reused, and keeps the planned
+    paths until a setting that moves notes changes. Otherwise the stubs of
+    data are used (see ConversationSource), or data is streamed once here and
+    once more to convert it if it has none.
+
+    The message count needs the decoded conversation, so pass the same filter
+    on to process_conversations, which checks it before rendering.
+
+    Returns:
+        (conversations, output_plan) — a re-iterable source of the accepted
+        conversations and an output plan covering exactly those
+    """
+    from shard_index import STUB_KEYS, get_shard_index, iter_indexed_conversations, save_shard_index
 
-        # {date}: conversation creation date
-        date_str = ""
-        create_ts = normalize_timestamp(create_time)
-        if create_ts:
-            date_str = datetime.fromtimestamp(create_ts).strftime(config.get('date_format', '%m-%d-%Y'))
+    output_base = Path(output_dir)
+    persist = config.get('cache_conversation_index', False)
+    if shard_files:
+        base_path = Path(shard_files[0]).parent
+        index = get_shard_index(base_path, shard_files, persist=persist)
+        stubs = [entry[3] for entry in index['conversations']]
+    elif getattr(data, 'stubs', None) is not None:
+        index = None
+        stubs = data.stubs()
+    else:
+        index = None
+        stubs = [{key: entry[key] for key in STUB_KEYS if key in entry}
+                 for entry in data if isinstance(entry, dict)]
+    positions = [position for position, stub in enumerate(stubs) if conversation_filter.accepts_stub(stub)]
+
+    layout_key = _layout_key(config, output_base)
+    layout = index.get('layout') if index is not None else None
+    if layout is None or layout.get('key') != layout_key:
+        summary = plan_output(stubs, config, output_base)
+        layout = {
+            'key': layout_key,
+            'paths': [os.path.relpath(path, output_base) for path in summary['paths']],
+            'collisions': {os.path.relpath(resolved, output_base): os.path.relpath(planned, output_base)
+                           for planned, resolved in summary['collisions']},
+        }
+        if index is not None and persist:
+            index['layout'] = layout
+            save_shard_index(base_path, index)
+
+    if index is not None:
+        # Decoded with the configured json_backend, like a full run
+        decoder = get_decoder(config.get('json_backend') or 'auto', conversation=True)
+        conversations = ConversationSource(iter_indexed_conversations, base_path, index, positions, decoder)
+    else:
+        conversations = ConversationSource(_iter_positions, data, positions)
+
+    rel_paths = [layout['paths'][position] for position in positions]
+    paths = [output_base / rel_path for rel_path in rel_paths]
+    output_plan = {
+        'total': len(paths),
+        'paths': paths,
+        'folders': {str(path.parent) for path in paths},
+        'collisions': [(output_base / layout['collisions'][rel_path], output_base / rel_path)
+                       for rel_path in rel_paths if rel_path in layout['collisions']],
+    }
+    return conversations, output_plan
+
+# One conversation yielded by iter_rendered:
+#   path          output file, relative to the output directory ('/'-separated)
+#   chunks        the markdown as a list of strings, with '\n' line endings (line_endings
+#                 applies when it is written); .text joins them into one string
+#   assets        [(path relative to the output directory, source)] for every asset the
+#                 note links to, in order; source is a file path, an extract_zip.ZipMember
+#                 or, for downloaded web images, the image bytes
+#   file_path     the planned output file (output directory / path)
+#   key           (conversation_id, update_time) as tracked by the manifest, or None
+#   search_record message text and metadata for the search index (None unless enabled)
+class RenderedConversation(namedtuple(
+        'RenderedConversation', ['path', 'chunks', 'assets', 'file_path', 'key', 'search_record'])):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+def iter_rendered(conversations, config, input_base_path, output_dir='.', sink=None,
+                  workers=1, output_plan=None, skip=None, conversation_filter=None):
+    """
+    Render conversations lazily, yielding a RenderedConversation for each one
+    in input order. Notes are never written here: callers can keep them in
+    memory, push them to another store or write them (process_conversations
+    is the command line's consumer of this generator).
 
-        file_stem = config["file_name_format"].format(
-            title=safe_title,
-            display_title=display_title,
-            id=id_short,
-            date=date_str,
-        )
-        file_name = f"{file_stem}.md"
-        file_path = conversation_dir / file_name
-
-        # Per-conversation counter for downloaded web images — ensures unique, ordered filenames.
-        # None when download_web_images is disabled so no counter logic runs in the call chain.
-        image_counter = [0] if config.get('download_web_images', False) else None
-
-        # Write messages to file
-        newline = {'lf': '\n', 'crlf': '\r\n'}.get(config.get('line_endings', 'native'))
-        with open(file_path, "w", encoding="utf-8", newline=newline) as f:
-            # Write frontmatter
-            if config.get('use_frontmatter', True):
-                frontmatter = generate_frontmatter(inferred_title, create_time, update_time, config)
-                f.write(frontmatter)
-
-            # Write title
-            f.write(f"# {inferred_title}\n\n")
-
-            # Write date if configured
-            first_message_ts = normalize_timestamp(messages[0].get("create_time")) if messages else None
-            if first_message_ts and config.get('include_date', True):
-                date = datetime.fromtimestamp(first_message_ts).strftime(config['date_format'])
-                f.write(f"<sub>{date}</sub>\n\n")
-
-            # Write separator
-            f.write("---\n\n")
-
-            # Write messages
-            for message in messages:
-                # Skip system messages
-                author_role = message.get("author", {}).get("role", "unknown")
-                if author_role == "system":
-                    continue
-
-                content, attachments = _get_message_content(
-                    message,
-                    input_base,
-                    output_base,
-                    config,
-                    file_path,
-                    id_short,
-                    image_counter
-                )
-                author_name = _get_author_name(message, config)
-
-                # Detect reasoning/recap messages — they carry their own callout
-                # headers and must not be wrapped by response_callout_type.
-                msg_content = message.get("content", {})
-                msg_content_type = msg_content.get("content_type", "")
-                msg_recipient = message.get("recipient", "")
-                is_reasoning = "thoughts" in msg_content
-                is_recap = msg_content_type == "reasoning_recap"
-
-                # Suppress the bold header for reasoning/recap when their own
-                # callout is active — the callout title serves as the header.
-                if is_reasoning:
-                    suppress_header = bool(
-                        config.get('use_obsidian_callouts', True) and
-                        config.get('reasoning_callout_type', 'note')
-                    )
-                elif is_recap:
-                    suppress_header = bool(
-                        config.get('use_obsidian_callouts', True) and
-                        config.get('reasoning_summary_callout_type', 'info')
-                    )
-                else:
-                    suppress_header = False
-
-                if not config.get('skip_empty_messages', True) or content.strip():
-                    # Build timestamp string if enabled
-                    timestamp_str = ""
-                    if config.get('include_message_timestamps', True):
-                        msg_time = normalize_timestamp(message.get("create_time"))
-                        if msg_time:
-                            ts_format = config.get('message_timestamp_format', '%m-%d-%Y %H:%M')
-                            ts_text = datetime.fromtimestamp(msg_time).strftime(ts_format)
-                            tag = config.get('timestamp_tag', 'sub')
-                            timestamp_str = f"<{tag}>{ts_text}</{tag}>" if tag else ts_text
-
-                    timestamp_position = config.get('timestamp_position', 'header')
-
-                    # Determine prompt/response/tool callout type and collapse state.
-                    # Reasoning/recap messages are excluded — they manage their own callouts.
-                    if author_role == "user":
-                        msg_callout_type = config.get('prompt_callout_type', '')
-                        msg_callout_state = 'static'
-                    elif author_role == "tool":
-                        msg_callout_type = config.get('tool_callout_type', '')
-                        msg_callout_state = config.get('tool_callout_state', 'static')
-                    elif author_role == "assistant" and msg_content_type == "code" and msg_recipient == "web":
-                        msg_callout_type = config.get('tool_callout_type', '')
-                        msg_callout_state = config.get('tool_callout_state', 'static')
-                    elif author_role == "assistant" and msg_content_type == "code" and msg_recipient == "web.run":
-                        msg_callout_type = config.get('tool_callout_type', '')
-                        msg_callout_state = config.get('tool_callout_state', 'static')
-                    elif author_role == "assistant" and not (is_reasoning or is_recap):
-                        msg_callout_type = config.get('response_callout_type', '')
-                        msg_callout_state = 'static'
-                    else:
-                        msg_callout_type = ''
-                        msg_callout_state = 'static'
-
-                    if not config.get('use_obsidian_callouts', True):
-                        msg_callout_type = ''
-
-                    if msg_callout_type:
-                        # Prompt/response/tool callout mode: author name is the callout title.
-                        collapse = _callout_collapse_marker(msg_callout_state)
-                        title_part = f" {author_name}" if author_name else ""
-                        callout_header = f"> [!{msg_callout_type}]{collapse}{title_part}"
-                        callout_body = "> " + content.replace("\n", "\n> ")
-                        if timestamp_str and timestamp_position == 'header':
-                            block = f"{callout_header}\n> {timestamp_str}\n> \n{callout_body}"
-                        else:
-                            block = f"{callout_header}\n{callout_body}"
-                        if timestamp_str and timestamp_position == 'footer':
-                            block += f"\n> \n> {timestamp_str}"
-
-                    elif suppress_header and timestamp_str:
-                        # Reasoning/recap with an active callout and a timestamp:
-                        # inject timestamp into the callout so it stays attached.
-                        # content is guaranteed to be a callout block here.
-                        first_nl = content.find('\n')
-                        if first_nl != -1:
-                            cl1 = content[:first_nl]
-                            rest = content[first_nl:]  # starts with \n
-                            if timestamp_position == 'header':
-                                block = f"{cl1}\n> {timestamp_str}\n> {rest}"
-                            else:  # footer
-                                block = f"{content}\n> \n> {timestamp_str}"
-                        else:
-                            block = content
+    Every asset a conversation links to is handed to sink (see output_sink)
+    before the conversation is yielded. With the default sink=None nothing is
+    written or read under output_dir, and the caller decides what to do with
+    each result's assets.
 
-                    else:
-                        # Standard mode: timestamp inline with the bold header, matching
-                        # original output. When the header is suppressed (empty author
-                        # name), the timestamp is written on its own line so it remains
-                        # visible.
-                        if author_name and not suppress_header:
-                            if timestamp_str and timestamp_position == 'header':
-                                header = f"**{author_name}**: {timestamp_str}\n\n"
-                            else:
-                                header = f"**{author_name}**:\n\n"
-                        elif timestamp_str and timestamp_position == 'header':
-                            header = f"{timestamp_str}\n\n"
-                        else:
-                            header = ""
-                        footer = f"\n\n{timestamp_str}" if timestamp_str and timestamp_position == 'footer' else ""
-                        block = f"{header}{content}{footer}"
-
-                    f.write(f"{block}{config['message_separator']}")
+    Args:
+        conversations: list or re-iterable source such as ConversationSource
+            (a one-shot iterator raises TypeError). Unless output_plan is given,
+            it is read once more to plan the output, or its stubs are.
+        config: Configuration dict (the keys of config.json)
+        input_base_path: Export folder (or export ZIP) that attachments are found in
+        output_dir: Root of the output layout; paths and the relative links
+            between notes and assets are laid out under it
+        sink: Receives the assets (e.g. output_sink.DirectorySink to place them on disk)
+        workers: Render on a process pool of this size
+        output_plan: plan_output(conversations, config, output_dir), if already made
+        skip: Called with every conversation's key before it is rendered;
+            conversations it returns True for are left out
+        conversation_filter: A conversation_filter.ConversationFilter; conversations
+            it rejects are left out before anything else is done with them
+    """
+    output_base = Path(output_dir)
+    input_base = Path(input_base_path)
+    if output_plan is None:
+        _check_reiterable(conversations)
+        output_plan = plan_output(conversations, config, output_base)
+
+    def _jobs():
+        for entry, file_path in zip(conversations, output_plan['paths']):
+            if (conversation_filter is not None and isinstance(entry, dict)
+                    and not conversation_filter.accepts(entry)):
+                continue
+            key = conversation_key(entry)
+            if skip is not None and skip(key):
+                continue
+            yield key, entry, file_path
+
+    def _render_serial():
+        global _sink
+        plan = compile_render_plan(config)
+        recorder = DeferredSink(sink)
+        # Conversations whose web images are still downloading wait here while
+        # the next ones render and queue theirs, so downloads overlap across
+        # conversations. Results still leave in input order.
+        window = max(1, int(config.get('download_workers', 8))) * 4 if plan.download_web_images else 0
+        waiting = deque()
+
+        def _finish(key, result, assets, downloads):
+            global _sink
+            if downloads and result is not None:
+                file_path, chunks, search_record = result
+                previous, _sink = _sink, recorder
+                try:
+                    chunks = _resolve_web_image_downloads(
+                        chunks, file_path, search_record['messages'] if search_record else None, downloads)
+                finally:
+                    _sink = previous
+                _close_image_pbar()
+                result = (file_path, chunks, search_record)
+                assets = assets + recorder.take()
+            return key, result, assets
+
+        for key, entry, file_path in _jobs():
+            # Only while rendering, so the caller's own sink is in place between results
+            previous, _sink = _sink, recorder
+            try:
+                result = _render_conversation(entry, output_base, input_base, plan, file_path,
+                                              resolve_downloads=False)
+            finally:
+                _sink = previous
+            waiting.append((key, result, recorder.take(), _take_pending_downloads()))
+            while waiting and (len(waiting) > window or _downloads_done(waiting[0][3])):
+                yield _finish(*waiting.popleft())
+        while waiting:
+            yield _finish(*waiting.popleft())
+
+    if workers > 1:
+        # Each worker compiles its own render plan from the (picklable) config
+        results = _render_parallel(_jobs(), output_base, input_base, config, workers, sink)
+    else:
+        results = _render_serial()
+    try:
+        for key, result, assets in results:
+            if result is None:
+                continue
+            file_path, chunks, search_record = result
+            yield RenderedConversation(
+                os.path.relpath(file_path, output_base).replace('\\', '/'),
+                chunks,
+                [(os.path.relpath(target_path, output_base).replace('\\', '/'), source)
+                 for source, target_path, _ in assets],
+                file_path,
+                key,
+                search_record,
+            )
+    finally:
+        _close_downloader()
+
+def _print_output_plan(summary, output_dir, limit=25):
+    """Print the --plan dry run report: counts, folder layout and renamed files."""
+    output_dir = Path(output_dir)
+    print(f"🗺️  Output plan — {summary['mode'].upper()} mode, nothing was written")
+    print(f"   {summary['total']:,} conversations: {summary['starred']:,} starred, "
+          f"{summary['archived']:,} archived, {summary['regular']:,} regular")
+    print(f"   {summary['folder_count']:,} folders under {output_dir}")
+    folders = sorted(summary['folder_sizes'].items())
+    for folder, count in folders[:limit]:
+        rel = os.path.relpath(folder, output_dir).replace('\\', '/')
+        print(f"     {'(root)' if rel == '.' else rel + '/':<40} {count:>7,}")
+    if len(folders) > limit:
+        print(f"     … {len(folders) - limit:,} more folders")
+
+    collisions = summary['collisions']
+    if collisions:
+        print(f"⚠️  {len(collisions):,} file names were shared by several conversations and will be renamed:")
+        for planned, resolved in collisions[:limit]:
+            print(f"     {os.path.relpath(planned, output_dir)} → {resolved.name}")
+        if len(collisions) > limit:
+            print(f"     … {len(collisions) - limit:,} more")
+    else:
+        print("✅ No file name collisions")
 
-        _close_image_pbar()
+def process_conversations(data, output_dir, config, input_base_path, workers=None, manifest=None,
+                          output_plan=None, conversation_filter=None):
+    """
+    Process all conversations and generate markdown files: the conversations
+    rendered by iter_rendered are written through the run's output sink.
+
+    Every output path is planned before anything is converted (see
+    plan_output), so pass a list or a re-iterable source such as
+    ConversationSource; a one-shot iterator raises TypeError. A source with
+    stubs, or an output_plan made beforehand (e.g. by select_conversations),
+    lets data be decoded only once; otherwise it is read once more to plan.
+
+    Conversations rejected by conversation_filter (default: one built from the
+    config's filter_* settings, see conversation_filter.ConversationFilter) are
+    neither rendered nor pruned.
+
+    With workers > 1 (default: config['workers']) conversations are rendered on a
+    process pool. Files are still written here, in input order, so the output is
+    identical to a serial run.
+
+    Every run records what it wrote in the output directory's manifest. With
+    config['incremental'], conversations whose update_time and rendering config
+    match the manifest are skipped; with config['prune_deleted'], outputs of
+    conversations missing from the export are removed. A caller converting
+    several exports in a row (see watch.py) can pass the manifest dict it
+    keeps in memory; it is updated in place and still saved to disk.
+
+    Rendered files whose content is already on disk are not rewritten.
+
+    With config['search_index'], message text and conversation metadata are also
+    written to a SQLite full-text index in the output directory (see
+    search_index.SearchIndex). Only conversations that changed since the index
+    was last updated are rewritten in it.
+
+    With config['output_archive'] (a file path, or "-" for standard output) the
+    same layout is streamed into one ZIP or tar archive instead of the output
+    directory (see output_sink). An archive is always written in full, so
+    incremental mode, pruning and the search index do not apply.
+
+    Returns: dict of counts — 'written', 'identical' (rendered but already up to
+    date on disk), 'unchanged' (skipped by the manifest), 'pruned', 'collisions'
+    (conversations renamed so they don't overwrite another), the sizes
+    'bytes_written' and 'bytes_identical', 'indexed' (conversations
+    updated in the search index) and 'filtered' (rejected by the filter)
+    """
+    global _sink
+    output_base = Path(output_dir)
+    input_base = Path(input_base_path)
+    # Nothing placed by an earlier run in this process (e.g. watch mode) is taken on trust
+    reset_asset_state()
+    _existing_web_images.clear()
+    if workers is None:
+        workers = resolve_worker_count(config.get('workers', 1))
+    if conversation_filter is None:
+        conversation_filter = ConversationFilter(config)
+    if not conversation_filter.active:
+        conversation_filter = None
+
+    sink = open_output_sink(output_base, config.get('output_archive'), config.get('output_archive_format', 'auto'))
+    archive = sink.is_archive
+    incremental = config.get('incremental', False) and not archive
+    if archive:
+        manifest = {}
+    elif manifest is None:
+        manifest = load_manifest(output_base)
+    fingerprint = config_fingerprint(config)
+    stats = {'written': 0, 'identical': 0, 'unchanged': 0, 'pruned': 0,
+             'bytes_written': 0, 'bytes_identical': 0, 'indexed': 0, 'filtered': 0}
+    seen_ids = set()
+    written_paths = set()
+
+    _sink = sink
+    try:
+        if output_plan is None:
+            _check_reiterable(data)
+            output_plan = plan_output(data, config, output_base)
+        stats['collisions'] = len(output_plan['collisions'])
+        if not archive:
+            # Every output folder is created once here instead of once per file
+            for folder in sorted(output_plan['folders']):
+                Path(folder).mkdir(parents=True, exist_ok=True)
+
+        search_index = None
+        if config.get('search_index', False) and not archive:
+            from search_index import SearchIndex
+            search_index = SearchIndex(output_base)
+
+        def _skip(key):
+            if key is not None:
+                seen_ids.add(key[0])
+            if (incremental and is_unchanged(manifest, key, fingerprint, output_base)
+                    and (search_index is None
+                         or search_index.is_current(key[0], normalize_timestamp(key[1]), fingerprint))):
+                stats['unchanged'] += 1
+                return True
+            return False
+
+        rendered = iter_rendered(data, config, input_base, output_base, sink, workers, output_plan, _skip,
+                                 conversation_filter)
+        # Skipped conversations never reach the bar, so its total is only known for full runs
+        total = output_plan['total'] if not incremental else None
+        for conversation in tqdm(rendered, desc="Processing conversations", total=total, unit=" conv"):
+            file_path = conversation.file_path
+            written, size = _write_markdown(file_path, conversation.chunks, config)
+            written_paths.add(os.path.normcase(os.path.abspath(file_path)))
+            if written:
+                stats['written'] += 1
+                stats['bytes_written'] += size
+            else:
+                stats['identical'] += 1
+                stats['bytes_identical'] += size
+
+            key = conversation.key
+            if key is not None:
+                # A renamed conversation (e.g. new title) leaves its old file behind
+                old_path = record_conversation(manifest, key, fingerprint, output_base, file_path)
+                if (old_path and old_path.is_file()
+                        and os.path.normcase(os.path.abspath(old_path)) not in written_paths):
+                    old_path.unlink()
+                if search_index is not None:
+                    search_index.update(key[0], conversation.search_record, file_path, fingerprint)
+
+        if conversation_filter is not None:
+            stats['filtered'] = conversation_filter.rejected_count
+            # Filtered out is not deleted: those conversations keep their notes
+            seen_ids |= conversation_filter.rejected_ids
+        if config.get('prune_deleted', False) and not archive:
+            stats['pruned'] = prune_manifest(manifest, seen_ids, output_base, written_paths)
+            if search_index is not None:
+                search_index.remove_missing(seen_ids)
+
+        sink.close()
+        if not archive:
+            save_manifest(output_base, manifest)
+        if search_index is not None:
+            search_index.close()
+            stats['indexed'] = search_index.updated
+    except BaseException:
+        sink.abort()
+        raise
+    finally:
+        _sink = None
+    return stats
 
 def migrate_config(config, config_path):
     """Migrate config.json to the latest version, saving changes back to disk."""
@@ -903,17 +1895,151 @@ def migrate_config(config, config_path):
     print(f"  ℹ️  config.json migrated to v2 — file_name_format: '{fmt}' → '{new_fmt}'")
     return config
 
-def main():
-    print()
+def parse_args(argv=None):
+    """Parse command-line options. Settings given here override config.json."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert a ChatGPT export into Markdown files (settings come from config.json)."
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None, metavar='N',
+        help="convert on N worker processes (0 = one per CPU; overrides 'workers')",
+    )
+    parser.add_argument(
+        '--incremental', action='store_true', default=None,
+        help="skip conversations unchanged since the last run (overrides 'incremental')",
+    )
+    parser.add_argument(
+        '--full', dest='incremental', action='store_false',
+        help="re-render every conversation even if incremental is enabled",
+    )
+    parser.add_argument(
+        '--prune', dest='prune_deleted', action='store_true', default=None,
+        help="delete outputs of conversations no longer in the export (overrides 'prune_deleted')",
+    )
+    parser.add_argument(
+        '--archive', metavar='FILE',
+        help="write everything into one .zip/.tar/.tar.gz archive instead of the output folder; "
+             "'-' streams it to standard output (overrides 'output_archive')",
+    )
+    parser.add_argument(
+        '--archive-format', choices=['zip', 'tar', 'tar.gz'], default=None,
+        help="archive format when it can't be told from the file name, e.g. for '-' (default: zip)",
+    )
+    parser.add_argument(
+        '--merge', nargs='+', metavar='EXPORT',
+        help="merge several export ZIPs and/or extracted export folders into one output tree, "
+             "keeping the newest version of each conversation (overrides 'input_mode'/'input_paths')",
+    )
+    parser.add_argument(
+        '--only', action='append', metavar='ID[,ID...]',
+        help="re-render only these conversations (full ids or id prefixes), even if unchanged "
+             "(overrides 'filter_ids'); set 'cache_conversation_index' to skip rescanning "
+             "the export on every run",
+    )
+    parser.add_argument(
+        '--category', action='append', metavar='NAME[,NAME...]',
+        help="convert only starred, archived and/or regular conversations (overrides 'filter_categories')",
+    )
+    parser.add_argument(
+        '--created-after', metavar='DATE',
+        help="convert only conversations created on or after DATE (overrides 'filter_created_after')",
+    )
+    parser.add_argument(
+        '--created-before', metavar='DATE',
+        help="convert only conversations created before DATE (overrides 'filter_created_before')",
+    )
+    parser.add_argument(
+        '--updated-after', metavar='DATE',
+        help="convert only conversations updated on or after DATE (overrides 'filter_updated_after')",
+    )
+    parser.add_argument(
+        '--updated-before', metavar='DATE',
+        help="convert only conversations updated before DATE (overrides 'filter_updated_before')",
+    )
+    parser.add_argument(
+        '--title', metavar='REGEX',
+        help="convert only conversations whose title matches REGEX (overrides 'filter_title')",
+    )
+    parser.add_argument(
+        '--min-messages', type=int, metavar='N',
+        help="convert only conversations with at least N user/assistant messages (overrides 'filter_min_messages')",
+    )
+    parser.add_argument(
+        '--watch', metavar='INBOX',
+        help="keep running and convert every export ZIP dropped into INBOX (incremental unless --full)",
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=2.0, metavar='SECONDS',
+        help="how often --watch checks INBOX where inotify is unavailable (default: 2)",
+    )
+    parser.add_argument(
+        '--plan', action='store_true',
+        help="dry run: show how conversations would be organized and which file names collide, then exit",
+    )
+    parser.add_argument(
+        '--profile', nargs='?', const='profile.json', default=None, metavar='REPORT',
+        help="time each stage, print a breakdown and save it as JSON (default: profile.json)",
+    )
+    parser.add_argument(
+        '--profile-top', type=int, default=10, metavar='N',
+        help="number of slowest conversations listed in the profile (default: 10)",
+    )
+    parser.add_argument(
+        '--cprofile', metavar='FILE',
+        help="dump cProfile stats for the run to FILE (main process only; view with python -m pstats)",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     config_path = Path("config.json")
 
     if not config_path.exists():
+        print()
         print("❌ config.json not found!")
         print("🚀 Run setup wizard first: python setup.py")
         sys.exit(1)
 
     config = read_json_file(config_path)
+    if (args.archive if args.archive is not None else config.get('output_archive')) == '-':
+        # Standard output carries the archive, so every message goes to stderr
+        sys.stdout = sys.stderr
+    print()
     config = migrate_config(config, config_path)
+    if args.jobs is not None:
+        config['workers'] = args.jobs
+    if args.incremental is not None:
+        config['incremental'] = args.incremental
+    if args.prune_deleted is not None:
+        config['prune_deleted'] = args.prune_deleted
+    if args.archive is not None:
+        config['output_archive'] = args.archive
+    if args.archive_format is not None:
+        config['output_archive_format'] = args.archive_format
+    if args.merge is not None:
+        config['input_mode'] = 'merge'
+        config['input_paths'] = args.merge
+    if args.only:
+        config['filter_ids'] = [i.strip() for value in args.only for i in value.split(',') if i.strip()]
+        # Asked for by name, so rendered even when the manifest says they are unchanged
+        config['incremental'] = False
+        # A re-render of a few conversations never deletes the notes of the others
+        config['prune_deleted'] = False
+    if args.category:
+        config['filter_categories'] = [c.strip() for value in args.category for c in value.split(',') if c.strip()]
+    for option in ('created_after', 'created_before', 'updated_after', 'updated_before', 'title', 'min_messages'):
+        if getattr(args, option) is not None:
+            config[f'filter_{option}'] = getattr(args, option)
+
+    profiler = _start_profiling() if args.profile else None
+    cprofiler = None
+    if args.cprofile:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    run_start = time.perf_counter()
 
     if config.get('download_web_images', False) and not _requests_available:
         print("🛠  download_web_images is enabled but the 'requests' package is not installed.")
@@ -921,7 +2047,41 @@ def main():
         print("   Images will be linked from their original URLs instead.")
         print()
     elif config.get('download_web_images', False):
-        print("🐌 Web image downloads are enabled — conversion will be significantly slower.")
+        print(f"🌐 Web image downloads are enabled — fetching up to {config.get('download_workers', 8)} images at a time.")
+        print()
+
+    if config.get('search_index', False):
+        from search_index import fts5_available
+        if not fts5_available():
+            print("🛠  search_index is enabled but this Python's SQLite has no FTS5 support.")
+            print("   The markdown files will be written without a search index.")
+            print()
+            config['search_index'] = False
+
+    json_backend = str(config.get('json_backend') or 'auto').lower()
+    try:
+        decoder = get_decoder(json_backend)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if json_backend not in ('auto', 'json') and not is_available(json_backend):
+        print(f"🛠  json_backend is \"{json_backend}\" but the '{json_backend}' package is not installed.")
+        print(f"   Run: pip install {json_backend}")
+        print(f"   JSON will be decoded with {resolve_backend(json_backend)} instead.")
+        print()
+    load_args = (decoder, int(config.get('json_max_document_mb', 32) * 1024 * 1024))
+
+    archive = config.get('output_archive')
+    if archive:
+        try:
+            fmt = archive_format(archive, config.get('output_archive_format', 'auto'))
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"📦 Writing a {fmt.upper()} archive to {'standard output' if archive == '-' else archive}")
+        ignored = [key for key in ('incremental', 'prune_deleted', 'search_index') if config.get(key)]
+        if ignored:
+            print(f"   An archive is always written in full — ignoring {', '.join(ignored)}.")
         print()
 
     # Validate file_name_format tokens before processing begins
@@ -932,34 +2092,126 @@ def main():
         print(f"   Valid tokens: {{title}}, {{display_title}}, {{id}}, {{date}}")
         sys.exit(1)
 
-    input_path = Path(config['input_path'])
-    output_dir = Path(config['output_directory'])
+    try:
+        conversation_filter = ConversationFilter(config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
 
-    # Create output directory
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.watch:
+        import watch
+        if args.incremental is None:
+            # Each export is a superset of the previous one; only changes need rendering
+            config['incremental'] = True
+        watch.watch_inbox(args.watch, config, load_args, poll_interval=args.poll_interval)
+        return
+
+    input_path = Path(config.get('input_path', ''))
+    output_dir = Path(config['output_directory'])
 
-    # Determine the base path for finding attachments
+    # Determine the conversation source and the base path for finding attachments.
+    # Each source plans the output from stubs scanned out of the export, so the
+    # export itself is decoded once, while converting.
+    from shard_index import shard_stubs, zip_stubs
+    persist_index = config.get('cache_conversation_index', False)
+    shard_files = None
     if config['input_mode'] == 'directory':
         input_base_path = input_path
         conversations_files = sorted(glob.glob(str(input_path / 'conversations*.json')))
-
-        if conversations_files:
-            data = []
-            for path in conversations_files:
-                data.extend(read_json_file(path))
-            process_conversations(data, str(output_dir), config, str(input_base_path))
-        else:
+        if not conversations_files:
             print(f"❌ Error: No conversations*.json files found in {input_path}")
             sys.exit(1)
+        data = ConversationSource(iter_conversations, conversations_files, *load_args,
+                                  stubs=partial(shard_stubs, conversations_files, persist_index))
+        shard_files = conversations_files
+    elif config['input_mode'] == 'zip':
+        # Zip-native mode - read conversations and attachments straight from the export ZIP
+        input_base_path = input_path
+        try:
+            get_attachment_index(input_base_path)
+        except (FileNotFoundError, zipfile.BadZipFile) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        data = ConversationSource(iter_zip_conversations, input_path, *load_args,
+                                  stubs=partial(zip_stubs, input_path))
+    elif config['input_mode'] == 'merge':
+        # Several exports - each conversation once, attachments found in whichever export has them
+        from merge_exports import MergedExports, merge_attachment_indexes
+        export_paths = config.get('input_paths') or []
+        if not export_paths:
+            print("❌ Error: input_mode \"merge\" needs the exports to merge in input_paths")
+            sys.exit(1)
+        try:
+            data = MergedExports(export_paths, load_args)
+            input_base_path = merge_attachment_indexes(
+                export_paths, persist=config.get('cache_attachment_index', False)
+            )
+        except (FileNotFoundError, zipfile.BadZipFile) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print(f"🔀 Merging {len(export_paths)} exports: {data.kept} conversations"
+              f" ({data.duplicates} older copies skipped)")
+        print()
     else:
         # Single file mode - assume input_path is the conversations.json
         input_base_path = input_path.parent
-        data = read_json_file(input_path)
-        process_conversations(data, str(output_dir), config, str(input_base_path))
+        data = ConversationSource(iter_conversations, [input_path], *load_args,
+                                  stubs=partial(shard_stubs, [input_path], persist_index))
+        shard_files = [input_path]
+
+    if args.plan:
+        _print_output_plan(plan_output(data, config, output_dir), output_dir)
+        return
+
+    output_plan = None
+    if conversation_filter.active:
+        data, output_plan = select_conversations(data, conversation_filter, config, output_dir, shard_files)
+        for conversation_id in conversation_filter.missing_ids:
+            print(f"⚠️  No conversation matches id \"{conversation_id}\"")
+        considered = output_plan['total'] + conversation_filter.rejected_count
+        print(f"🔎 {output_plan['total']} of {considered} conversations match the filters")
+        print()
+        if not output_plan['total']:
+            return
+
+    if not archive:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    if config['input_mode'] not in ('zip', 'merge'):
+        get_attachment_index(input_base_path, persist=config.get('cache_attachment_index', False))
+    stats = process_conversations(data, str(output_dir), config, str(input_base_path),
+                                  output_plan=output_plan, conversation_filter=conversation_filter)
+    run_seconds = time.perf_counter() - run_start
 
-    print(f"\n✅ All Done! You can access your files here: {output_dir}")
+    print(f"\n✅ All Done! You can access your files here: {output_dir if not archive else archive}")
     print(f"📁 Created markdown files with embedded images and audio.")
     print(f"🗂️  Organization mode: {config.get('organization_mode', 'flat').upper()}")
+    if stats['identical']:
+        print(f"💾 Wrote {stats['written']} files ({stats['bytes_written'] / 1e6:.1f} MB); "
+              f"{stats['identical']} already up to date ({stats['bytes_identical'] / 1e6:.1f} MB) were left untouched")
+    if config.get('incremental', False) and not archive:
+        print(f"♻️  Incremental: {stats['written'] + stats['identical']} rendered, {stats['unchanged']} unchanged")
+    if stats['collisions']:
+        print(f"🔀 {stats['collisions']} conversations shared a file name with another and were saved with their id appended")
+    if stats['filtered']:
+        print(f"🔎 Filtered out {stats['filtered']} conversations ({conversation_filter.describe_rejections()})")
+    if stats['pruned']:
+        print(f"🧹 Removed {stats['pruned']} conversations no longer in the export")
+    if config.get('search_index', False) and not archive:
+        from search_index import SEARCH_INDEX_FILENAME
+        print(f"🔎 Search index: {stats['indexed']} conversations updated in {output_dir / SEARCH_INDEX_FILENAME}")
+
+    if cprofiler is not None:
+        cprofiler.disable()
+        cprofiler.dump_stats(args.cprofile)
+        print(f"🔬 cProfile stats saved to: {args.cprofile}")
+    if profiler is not None:
+        import profiling
+        workers = resolve_worker_count(config.get('workers', 1))
+        report = profiler.report(run_seconds, args.profile_top, workers)
+        profiling.print_report(report)
+        profiling.save_report(report, args.profile)
+        print(f"💾 Profile saved to: {args.profile}")
 
 if __name__ == "__main__":
     main()
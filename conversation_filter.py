@@ -0,0 +1,172 @@
+import re
+from datetime import datetime
+
+from manifest import conversation_key
+from organize import get_conversation_category
+
+CATEGORIES = ('starred', 'archived', 'regular')
+
+# Why a conversation was left out, in the order the checks run
+REASONS = ('id', 'category', 'created', 'updated', 'title', 'messages')
+
+def _parse_time(value, name):
+    """A filter bound as a timestamp: seconds, or an ISO date/datetime in local time."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(str(value).strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2024-05-31, a date and time or a Unix timestamp, not {value!r}")
+
+def _as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def count_messages(entry):
+    """
+    Count the user and assistant messages in a conversation's mapping (every
+    branch, hidden messages excluded) without traversing it.
+    """
+    mapping = entry.get('mapping')
+    if not isinstance(mapping, dict):
+        return 0
+    count = 0
+    for node in mapping.values():
+        message = node.get('message') if isinstance(node, dict) else None
+        if not isinstance(message, dict):
+            continue
+        if (message.get('author') or {}).get('role') not in ('user', 'assistant'):
+            continue
+        if (message.get('metadata') or {}).get('is_visually_hidden_from_conversation', False):
+            continue
+        count += 1
+    return count
+
+class ConversationFilter:
+    """
+    Decides which conversations a run converts, from the filter_* settings:
+
+    - filter_ids: conversation ids, or the start of them (e.g. the 8 characters in file names)
+    - filter_categories: any of "starred", "archived", "regular" (see organize.get_conversation_category)
+    - filter_created_after / _before, filter_updated_after / _before: dates,
+      date-times (local time) or Unix timestamps; "after" is inclusive, "before" exclusive
+    - filter_title: regular expression searched for in the title
+    - filter_min_messages: fewest user and assistant messages (see count_messages)
+
+    Every check except the message count only needs a conversation's top-level
+    fields, so accepts_stub() can run on the byte-offset index (shard_index)
+    before a conversation is even decoded. Rejections are counted by reason in
+    `rejected`, and the ids of rejected conversations kept in `rejected_ids`
+    so pruning can tell them apart from conversations deleted from the export.
+
+    Raises:
+        ValueError: a setting can't be understood (unknown category, bad date or regex)
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.ids = _as_list(config.get('filter_ids'))
+        categories = [c.lower() for c in _as_list(config.get('filter_categories'))]
+        unknown = [c for c in categories if c not in CATEGORIES]
+        if unknown:
+            raise ValueError(f"unknown filter_categories {', '.join(unknown)} (choose from {', '.join(CATEGORIES)})")
+        folders = {
+            'starred': config.get('starred_folder', 'Starred'),
+            'archived': config.get('archived_folder', 'Archived'),
+            'regular': None,
+        }
+        self.categories = {folders[c] for c in categories} if categories else None
+        self.created_after = _parse_time(config.get('filter_created_after'), 'filter_created_after')
+        self.created_before = _parse_time(config.get('filter_created_before'), 'filter_created_before')
+        self.updated_after = _parse_time(config.get('filter_updated_after'), 'filter_updated_after')
+        self.updated_before = _parse_time(config.get('filter_updated_before'), 'filter_updated_before')
+        title = config.get('filter_title') or ''
+        try:
+            self.title = re.compile(title) if title else None
+        except re.error as e:
+            raise ValueError(f"filter_title is not a valid regular expression: {e}")
+        self.min_messages = int(config.get('filter_min_messages') or 0)
+
+        self.rejected = dict.fromkeys(REASONS, 0)
+        self.rejected_ids = set()
+        self._matched_ids = set()
+
+    @property
+    def active(self):
+        return bool(self.ids or self.categories is not None or self.title is not None or self.min_messages
+                    or any(bound is not None for bound in (self.created_after, self.created_before,
+                                                           self.updated_after, self.updated_before)))
+
+    @property
+    def missing_ids(self):
+        """filter_ids that no conversation seen so far matched."""
+        return [wanted for wanted in self.ids if wanted not in self._matched_ids]
+
+    @property
+    def rejected_count(self):
+        return sum(self.rejected.values())
+
+    def _stub_reason(self, conversation):
+        if self.ids:
+            conversation_id = str(conversation.get('conversation_id') or conversation.get('id') or '')
+            matched = [wanted for wanted in self.ids if conversation_id.startswith(wanted)]
+            if not matched:
+                return 'id'
+            self._matched_ids.update(matched)
+        if self.categories is not None and get_conversation_category(conversation, self.config) not in self.categories:
+            return 'category'
+        if not _in_range(conversation.get('create_time'), self.created_after, self.created_before):
+            return 'created'
+        if not _in_range(conversation.get('update_time'), self.updated_after, self.updated_before):
+            return 'updated'
+        if self.title is not None and not self.title.search(str(conversation.get('title') or '')):
+            return 'title'
+        return None
+
+    def _reject(self, conversation, reason):
+        self.rejected[reason] += 1
+        key = conversation_key(conversation)
+        if key is not None:
+            self.rejected_ids.add(key[0])
+        return False
+
+    def accepts_stub(self, stub):
+        """Check the top-level fields (a shard_index stub or a whole conversation)."""
+        reason = self._stub_reason(stub)
+        return True if reason is None else self._reject(stub, reason)
+
+    def accepts_messages(self, entry):
+        """Check what only a decoded conversation can tell: its message count."""
+        if self.min_messages and count_messages(entry) < self.min_messages:
+            return self._reject(entry, 'messages')
+        return True
+
+    def accepts(self, entry):
+        """Run every check on a decoded conversation."""
+        return self.accepts_stub(entry) and self.accepts_messages(entry)
+
+    def describe_rejections(self):
+        """e.g. "12 by category, 3 by title" — empty if nothing was rejected."""
+        labels = {'id': 'by id', 'category': 'by category', 'created': 'by creation date',
+                  'updated': 'by update date', 'title': 'by title', 'messages': 'with too few messages'}
+        return ', '.join(f"{count} {labels[reason]}" for reason, count in self.rejected.items() if count)
+
+def _in_range(value, after, before):
+    if after is None and before is None:
+        return True
+    try:
+        ts = float(value)
+    except (TypeError, ValueError):
+        return False
+    if ts > 1e12:
+        ts /= 1000.0  # milliseconds, as in normalize_timestamp
+    return (after is None or ts >= after) and (before is None or ts < before)
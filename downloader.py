@@ -0,0 +1,111 @@
+import threading
+import time
+from importlib.util import find_spec
+from urllib.parse import urlsplit
+
+# requests (with urllib3, certifi and charset detection) is the slowest import
+# of a run, so it is only loaded once an ImageDownloader is created, together
+# with concurrent.futures (which pulls in logging)
+_requests_available = find_spec('requests') is not None
+_requests = None
+HTTPAdapter = None
+
+def _import_requests():
+    global _requests, HTTPAdapter
+    if _requests is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _requests = requests
+
+# Responses worth retrying: rate limiting and transient server errors
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class DownloadBudgetExceeded(Exception):
+    """Raised for downloads that could not finish inside the run's time budget."""
+
+class ImageDownloader:
+    """
+    Bounded concurrent HTTP fetcher for web images.
+
+    - max_workers threads share pooled keep-alive connections (one Session per thread)
+    - at most per_host requests run against the same host at once
+    - failed requests are retried with exponential backoff
+    - budget (seconds, None = unlimited) caps the total wall time spent downloading;
+      anything still pending afterwards fails fast so callers fall back to the URL
+    """
+
+    def __init__(self, max_workers=8, per_host=4, retries=3, backoff=0.5, timeout=20, budget=None):
+        if not _requests_available:
+            raise RuntimeError("the 'requests' package is required to download web images")
+        _import_requests()
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.deadline = time.monotonic() + budget if budget else None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='img-download')
+        self._local = threading.local()
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+    def submit(self, url):
+        """Queue url for download. The future resolves to (content_bytes, content_type)."""
+        return self._executor.submit(self._fetch, url)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = _requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.per_host, pool_maxsize=self.per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._host_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.per_host)
+                self._host_limits[host] = limit
+            return limit
+
+    def _remaining(self):
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DownloadBudgetExceeded("download time budget exhausted")
+        return remaining
+
+    def _fetch(self, url):
+        limit = self._host_limit(url)
+        attempt = 0
+        while True:
+            remaining = self._remaining()
+            timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+            try:
+                with limit:
+                    response = self._session().get(url, timeout=timeout)
+                if response.status_code in _RETRY_STATUSES and attempt < self.retries:
+                    raise _requests.HTTPError(f"{response.status_code} for url: {url}", response=response)
+                response.raise_for_status()
+                return response.content, response.headers.get('Content-Type', '')
+            except (_requests.ConnectionError, _requests.Timeout, _requests.HTTPError) as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                retryable = status is None or status in _RETRY_STATUSES
+                if not retryable or attempt >= self.retries:
+                    raise
+            delay = self.backoff * (2 ** attempt)
+            remaining = self._remaining()
+            if remaining is not None and delay >= remaining:
+                raise DownloadBudgetExceeded("download time budget exhausted")
+            time.sleep(delay)
+            attempt += 1
@@ -11,6 +11,108 @@ def _find_shards(directory):
         if re.match(r'conversations-\d+\.json$', f.name)
     )
 
+_CONVERSATIONS_FILE = re.compile(r'conversations.*\.json$')
+
+def find_zip_conversations(zip_ref):
+    """
+    Locate the conversations data inside an open export ZipFile without extracting it.
+    Supports the same legacy and sharded layouts as extract_chatgpt_zip, at the
+    archive root or inside a subdirectory.
+
+    Returns:
+        (prefix, member_names) — the archive folder holding the export ("" for the
+        root, otherwise ending in "/") and the sorted conversations*.json members in it
+    """
+    names = [n for n in zip_ref.namelist() if not n.endswith('/')]
+
+    prefix = None
+    candidates = [n for n in names if n.rsplit('/', 1)[-1] == 'conversations.json']
+    if not candidates:
+        candidates = [n for n in names if re.match(r'conversations-\d+\.json$', n.rsplit('/', 1)[-1])]
+    if candidates:
+        # Prefer the shallowest match, like the root-first search for extracted exports
+        first = min(candidates, key=lambda n: (n.count('/'), n))
+        prefix = first[:first.rfind('/') + 1]
+
+    if prefix is None:
+        raise FileNotFoundError(
+            f"No conversations data found in ZIP. "
+            f"Expected conversations.json or conversations-NNN.json files. "
+            f"Make sure you exported the correct ChatGPT data."
+        )
+
+    members = sorted(
+        n for n in names
+        if n.startswith(prefix) and '/' not in n[len(prefix):]
+        and _CONVERSATIONS_FILE.match(n[len(prefix):])
+    )
+    return prefix, members
+
+# Open archives per (process, path). Forked workers must not share a parent's
+# ZipFile, since its file offset would be shared across processes.
+_open_archives = {}
+
+def _open_archive(zip_path):
+    key = (os.getpid(), str(zip_path))
+    zip_ref = _open_archives.get(key)
+    if zip_ref is None:
+        zip_ref = zipfile.ZipFile(zip_path)
+        _open_archives[key] = zip_ref
+    return zip_ref
+
+def close_open_archives():
+    """Close this process's cached archive handles (e.g. before an export file is replaced)."""
+    for key in [k for k in _open_archives if k[0] == os.getpid()]:
+        _open_archives.pop(key).close()
+
+class ZipMember:
+    """
+    A file inside an export ZIP, used in place of a filesystem path for attachments.
+    Picklable (the archive is reopened lazily), so it can be sent to worker processes.
+    """
+    __slots__ = ('archive', 'name')
+
+    def __init__(self, archive, name):
+        self.archive = str(archive)
+        self.name = name
+
+    def __str__(self):
+        return f"{self.archive}/{self.name}"
+
+    def __repr__(self):
+        return f"ZipMember({self.archive!r}, {self.name!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, ZipMember) and (self.archive, self.name) == (other.archive, other.name)
+
+    def __hash__(self):
+        return hash((self.archive, self.name))
+
+    def __getstate__(self):
+        return (self.archive, self.name)
+
+    def __setstate__(self, state):
+        self.archive, self.name = state
+
+    @property
+    def basename(self):
+        return self.name.rsplit('/', 1)[-1]
+
+    def exists(self):
+        try:
+            _open_archive(self.archive).getinfo(self.name)
+        except (KeyError, OSError, zipfile.BadZipFile):
+            return False
+        return True
+
+    def open(self):
+        """Open the member for binary reading (streams, never extracts to disk)."""
+        return _open_archive(self.archive).open(self.name)
+
+    def size(self):
+        """Uncompressed size in bytes."""
+        return _open_archive(self.archive).getinfo(self.name).file_size
+
 def extract_chatgpt_zip(zip_path, extract_to=None):
     """
     Extract ChatGPT export ZIP file.
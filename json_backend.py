@@ -0,0 +1,130 @@
+import json
+from importlib.util import find_spec
+
+# The backends themselves are imported by JsonDecoder, so code that only asks
+# which ones are installed does not load them
+_msgspec_available = find_spec('msgspec') is not None
+_orjson_available = find_spec('orjson') is not None
+
+# In order of preference for json_backend "auto"
+BACKENDS = ('msgspec', 'orjson', 'json')
+
+def _export_schema(conversation=False):
+    """
+    msgspec type of an export file: an array of conversations (or with
+    conversation=True, a single conversation object), declaring only
+    the fields the converter reads. Everything else in the export (search
+    results, model metadata, ...) is skipped while parsing and never becomes
+    Python objects. Leaves are Any so unexpected value types are passed through
+    exactly as the standard library would decode them. (Built on first use so
+    importing this module does not load typing.)
+    """
+    from typing import Any, Dict, List, Optional, TypedDict
+
+    class _Metadata(TypedDict, total=False):
+        content_references: Any
+        is_visually_hidden_from_conversation: Any
+        paragen_variant_choice: Any
+
+    class _Message(TypedDict, total=False):
+        id: Any
+        author: Any
+        create_time: Any
+        update_time: Any
+        content: Any
+        recipient: Any
+        metadata: Optional[_Metadata]
+
+    class _Node(TypedDict, total=False):
+        id: Any
+        message: Optional[_Message]
+        parent: Any
+        children: Any
+
+    class _Conversation(TypedDict, total=False):
+        title: Any
+        create_time: Any
+        update_time: Any
+        mapping: Optional[Dict[str, _Node]]
+        conversation_id: Any
+        id: Any
+        is_starred: Any
+        is_archived: Any
+
+    return _Conversation if conversation else List[_Conversation]
+
+def is_available(name):
+    """Return True if the named backend can be used in this environment."""
+    return {'msgspec': _msgspec_available, 'orjson': _orjson_available, 'json': True}[name]
+
+def available_backends():
+    return tuple(name for name in BACKENDS if is_available(name))
+
+def resolve_backend(name='auto'):
+    """
+    Map a json_backend setting to the backend that will actually be used.
+    "auto" picks the fastest installed one; an explicit choice that is not
+    installed falls back the same way.
+
+    Raises:
+        ValueError: name is not "auto" or one of BACKENDS
+    """
+    name = (name or 'auto').lower()
+    if name != 'auto' and name not in BACKENDS:
+        raise ValueError(f"unknown json_backend {name!r} (choose from auto, {', '.join(BACKENDS)})")
+    if name != 'auto' and is_available(name):
+        return name
+    return available_backends()[0]
+
+class JsonDecoder:
+    """
+    Decodes whole JSON documents (bytes) with msgspec or orjson.
+
+    A document the fast backend refuses (NaN, integers beyond 64 bits, lone
+    surrogates, or a shape that does not fit the schema) is decoded again with
+    the standard library, so the result never depends on the backend.
+    """
+
+    def __init__(self, backend, typed=True, conversation=False):
+        if backend == 'msgspec':
+            import msgspec as _msgspec
+            if typed:
+                # An export file is an array of conversations; a lone conversation
+                # object is left to the standard library fallback unless the
+                # decoder is made for single conversations.
+                self._decode = _msgspec.json.Decoder(_export_schema(conversation)).decode
+            else:
+                self._decode = _msgspec.json.Decoder().decode
+            self._errors = (_msgspec.DecodeError,)
+            self.typed = typed
+        elif backend == 'orjson':
+            import orjson as _orjson
+            self._decode = _orjson.loads
+            self._errors = (_orjson.JSONDecodeError,)
+            self.typed = False
+        else:
+            raise ValueError(f"JsonDecoder needs msgspec or orjson, not {backend!r}")
+        self.backend = backend
+        self.fallbacks = 0
+
+    def decode(self, data):
+        try:
+            return self._decode(data)
+        except self._errors:
+            self.fallbacks += 1
+            return json.loads(data)
+
+    def __repr__(self):
+        return f"JsonDecoder({self.backend!r}{', typed' if self.typed else ''})"
+
+def get_decoder(name='auto', typed=True, conversation=False):
+    """
+    Return a JsonDecoder for the json_backend setting, or None when only the
+    standard library is available (callers then stream with json.JSONDecoder).
+    With conversation=True it decodes one conversation object rather than an
+    export file (e.g. a conversation read on its own through shard_index).
+    """
+    backend = resolve_backend(name)
+    if backend == 'json':
+        return None
+    return JsonDecoder(backend, typed, conversation)
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_FILENAME = '.conversion_manifest.json'
+MANIFEST_VERSION = 1
+
+# Settings that decide where input comes from or how the run is executed,
+# but never change the markdown that gets written.
+_NON_RENDERING_KEYS = {
+    'version',
+    'input_mode',
+    'input_path',
+    'input_paths',
+    'output_directory',
+    'workers',
+    'cache_attachment_index',
+    'cache_conversation_index',
+    'incremental',
+    'prune_deleted',
+    'search_index',
+    'output_archive',
+    'output_archive_format',
+    'asset_placement',
+    'dedupe_assets',
+    'download_workers',
+    'download_per_host',
+    'download_retries',
+    'download_timeout',
+    'download_budget',
+    'json_backend',
+    'json_max_document_mb',
+    'filter_ids',
+    'filter_categories',
+    'filter_created_after',
+    'filter_created_before',
+    'filter_updated_after',
+    'filter_updated_before',
+    'filter_title',
+    'filter_min_messages',
+}
+
+def config_fingerprint(config):
+    """
+    Hash every rendering-relevant config value.
+    A change in any of them invalidates all previously rendered files.
+    """
+    relevant = {k: v for k, v in config.items() if k not in _NON_RENDERING_KEYS}
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def conversation_key(entry):
+    """Return (conversation_id, update_time) used to track a conversation, or None."""
+    if not isinstance(entry, dict):
+        return None
+    conversation_id = entry.get('conversation_id') or entry.get('id')
+    if not conversation_id:
+        return None
+    return conversation_id, entry.get('update_time')
+
+def load_manifest(output_dir):
+    """
+    Load the run manifest from the output directory.
+
+    Returns:
+        dict mapping conversation_id -> {'update_time', 'path', 'config_hash'};
+        empty when there is no manifest yet or it cannot be read.
+    """
+    manifest_path = Path(output_dir) / MANIFEST_FILENAME
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('conversations', {})
+
+def save_manifest(output_dir, conversations):
+    """Write the manifest atomically so an interrupted run never leaves it truncated."""
+    manifest_path = Path(output_dir) / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'conversations': conversations}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+def is_unchanged(manifest, key, fingerprint, output_base):
+    """
+    True if the conversation was rendered before from the same update_time and
+    config, and its markdown file is still on disk.
+    """
+    if key is None:
+        return False
+    conversation_id, update_time = key
+    record = manifest.get(conversation_id)
+    if not record:
+        return False
+    if record.get('update_time') != update_time or record.get('config_hash') != fingerprint:
+        return False
+    return (Path(output_base) / record.get('path', '')).is_file()
+
+def record_conversation(manifest, key, fingerprint, output_base, file_path):
+    """
+    Store the output of a freshly rendered conversation.
+
+    Returns:
+        The previously recorded Path for this conversation if it differs from
+        file_path (e.g. the title changed), otherwise None.
+    """
+    conversation_id, update_time = key
+    rel_path = os.path.relpath(file_path, output_base).replace('\\', '/')
+    previous = manifest.get(conversation_id)
+    manifest[conversation_id] = {
+        'update_time': update_time,
+        'path': rel_path,
+        'config_hash': fingerprint,
+    }
+    if previous and previous.get('path') and previous['path'] != rel_path:
+        return Path(output_base) / previous['path']
+    return None
+
+def prune_manifest(manifest, seen_ids, output_base, keep_paths=()):
+    """
+    Remove conversations that no longer exist in the export, deleting their files.
+    Files in keep_paths (written during this run) are never deleted.
+
+    Returns:
+        Number of conversations pruned
+    """
+    keep = {os.path.normcase(os.path.abspath(p)) for p in keep_paths}
+    pruned = 0
+    for conversation_id in [cid for cid in manifest if cid not in seen_ids]:
+        record = manifest.pop(conversation_id)
+        stale_path = Path(output_base) / record.get('path', '')
+        if os.path.normcase(os.path.abspath(stale_path)) not in keep and stale_path.is_file():
+            stale_path.unlink()
+        pruned += 1
+    return pruned
@@ -0,0 +1,116 @@
+import glob
+import os
+from functools import partial
+from pathlib import Path
+
+import chatgpt_json_to_markdown as converter
+from attachment_index import get_attachment_index, register_attachment_index
+from extract_zip import is_extracted_directory, is_zip_file
+from manifest import conversation_key
+from shard_index import shard_stubs, zip_stubs
+
+def merged_base_path(export_paths):
+    """
+    The pseudo input base path several exports are converted under. It only
+    names their combined attachment index (see merge_attachment_indexes), so
+    it never has to exist.
+    """
+    return os.pathsep.join(os.path.abspath(str(path)) for path in export_paths)
+
+def open_export(export_path, load_args=()):
+    """
+    Return a re-iterable ConversationSource, with stubs, for one export: an
+    export ZIP (read zip-native) or an extracted export folder.
+
+    Raises:
+        FileNotFoundError: export_path is neither
+    """
+    export_path = Path(export_path)
+    if export_path.is_file() and is_zip_file(export_path):
+        return converter.ConversationSource(converter.iter_zip_conversations, export_path, *load_args,
+                                            stubs=partial(zip_stubs, export_path))
+    if export_path.is_dir() and is_extracted_directory(export_path):
+        files = sorted(glob.glob(str(export_path / 'conversations*.json')))
+        return converter.ConversationSource(converter.iter_conversations, files, *load_args,
+                                            stubs=partial(shard_stubs, files))
+    raise FileNotFoundError(f"{export_path} is not an export ZIP or an extracted export folder")
+
+def merge_attachment_indexes(export_paths, persist=False):
+    """
+    Index the attachments of several exports as one, so every file id resolves
+    to whichever export contains it (the last one listed, if several do — a
+    file id always names the same file). The index is registered under
+    merged_base_path(export_paths), which is returned.
+
+    Args:
+        persist: Reuse/write the index file of each extracted export folder
+    """
+    merged = {}
+    for export_path in export_paths:
+        merged.update(get_attachment_index(export_path, persist=persist))
+    base_path = merged_base_path(export_paths)
+    register_attachment_index(base_path, merged)
+    return base_path
+
+class MergedExports:
+    """
+    Re-iterable stream of the conversations in several exports, each one once.
+
+    A conversation found in more than one export (or more than once in one) is
+    kept only in its newest version: the one with the latest update_time, or
+    the later export on a tie. Conversations without an id can't be matched
+    and are all kept. Iterating yields the kept conversations export by export,
+    each export in its own order.
+
+    The versions are chosen from the stubs of every export (see
+    shard_index.shard_stubs), which are read without decoding the exports;
+    the stubs of the kept conversations also plan the output (see stubs()),
+    so every kept conversation is decoded once, while converting.
+    """
+
+    def __init__(self, export_paths, load_args=()):
+        self.export_paths = [Path(path) for path in export_paths]
+        self.sources = [open_export(path, load_args) for path in self.export_paths]
+        self.total = 0
+        self._keep, self._stubs = self._select()
+        self.kept = len(self._stubs)
+
+    def _select(self):
+        newest = {}  # conversation_id -> (update_time, export, position)
+        keep = [set() for _ in self.sources]
+        export_stubs = [source.stubs() for source in self.sources]
+        for export, stubs in enumerate(export_stubs):
+            for position, entry in enumerate(stubs):
+                self.total += 1
+                key = conversation_key(entry)
+                if key is None:
+                    keep[export].add(position)
+                    continue
+                update_time = converter.normalize_timestamp(key[1])
+                if update_time is None:
+                    update_time = float('-inf')
+                current = newest.get(key[0])
+                if current is None or update_time >= current[0]:
+                    newest[key[0]] = (update_time, export, position)
+        for _, export, position in newest.values():
+            keep[export].add(position)
+        kept_stubs = [stub for export, stubs in enumerate(export_stubs)
+                      for position, stub in enumerate(stubs) if position in keep[export]]
+        return keep, kept_stubs
+
+    def stubs(self):
+        """The stubs of the kept conversations, in the order iterating yields them."""
+        return self._stubs
+
+    @property
+    def duplicates(self):
+        """How many older copies were dropped."""
+        return self.total - self.kept
+
+    def __iter__(self):
+        for source, keep in zip(self.sources, self._keep):
+            if not keep:
+                continue
+            for position, entry in enumerate(source):
+                if position in keep:
+                    yield entry
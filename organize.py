@@ -122,6 +122,10 @@ def get_asset_path(output_base, file_type, config):
         # All assets in single folder
         return output_base / 'Assets'
 
+def get_blob_store_path(output_base):
+    """Folder of the content store that dedupe_assets keeps one copy of each asset in."""
+    return Path(output_base) / 'Assets' / '.blobs'
+
 def get_relative_asset_path(conversation_path, asset_path):
     """
     Get relative path from conversation markdown file to asset.
@@ -140,25 +144,43 @@ def get_relative_asset_path(conversation_path, asset_path):
     rel = os.path.relpath(asset_path, conversation_path.parent)
     return rel.replace('\\', '/')
 
-def create_organization_summary(conversations, config, output_base):
+def create_organization_summary(conversations, config, output_base, get_file_name=None):
     """
     Create a summary of how conversations will be organized.
 
-    Returns dict with statistics.
+    With get_file_name (conversation -> "name.md"), this is also the output plan:
+    every conversation's file path is decided here, before anything is rendered.
+    File names shared by several conversations (including names differing only
+    in case, which collide on Windows/macOS) are resolved deterministically:
+    the earliest-created conversation keeps the name, the others get their
+    short conversation id appended (then a counter, should that be taken too).
+
+    Returns dict with statistics, plus when get_file_name is given:
+        'paths': output Path per input conversation, in input order
+                 (None for entries that are not conversations)
+        'collisions': list of (planned Path, resolved Path) for renamed files
     """
     output_base = Path(output_base)
     mode = config.get('organization_mode', 'flat')
 
     summary = {
-        'total': len(conversations),
+        'total': 0,
         'starred': 0,
         'archived': 0,
         'regular': 0,
         'mode': mode,
-        'folders': set()
+        'folders': set(),
+        'folder_sizes': {},
     }
+    paths = []
+    claims = {}
+
+    for index, conv in enumerate(conversations):
+        if not isinstance(conv, dict):
+            paths.append(None)
+            continue
+        summary['total'] += 1
 
-    for conv in conversations:
         # Count categories
         if conv.get('is_starred'):
             summary['starred'] += 1
@@ -169,12 +191,51 @@ def create_organization_summary(conversations, config, output_base):
 
         # Track folders that will be created
         conv_path = get_conversation_path(conv, config, output_base)
-        summary['folders'].add(str(conv_path))
+        folder = str(conv_path)
+        summary['folders'].add(folder)
+        summary['folder_sizes'][folder] = summary['folder_sizes'].get(folder, 0) + 1
+
+        if get_file_name is not None:
+            file_path = conv_path / get_file_name(conv)
+            paths.append(file_path)
+            conversation_id = conv.get('conversation_id') or conv.get('id') or ''
+            rank = (_sortable_time(conv.get('create_time')), conversation_id, index)
+            claims.setdefault(str(file_path).casefold(), []).append((rank, index, conversation_id))
 
     summary['folder_count'] = len(summary['folders'])
 
+    if get_file_name is not None:
+        summary['paths'] = paths
+        summary['collisions'] = _resolve_collisions(paths, claims)
+
     return summary
 
+def _sortable_time(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _resolve_collisions(paths, claims):
+    """Rename all but the earliest claimant of each shared path in place; return the renames."""
+    taken = set(claims)
+    collisions = []
+    for key in sorted(k for k, group in claims.items() if len(group) > 1):
+        group = sorted(claims[key])
+        for rank, index, conversation_id in group[1:]:
+            planned = paths[index]
+            stem = planned.stem
+            suffix = f"_{conversation_id[:8]}" if conversation_id else ""
+            candidate = planned.with_name(f"{stem}{suffix}{planned.suffix}")
+            counter = 2
+            while str(candidate).casefold() in taken:
+                candidate = planned.with_name(f"{stem}{suffix}_{counter}{planned.suffix}")
+                counter += 1
+            taken.add(str(candidate).casefold())
+            paths[index] = candidate
+            collisions.append((planned, candidate))
+    return collisions
+
 if __name__ == "__main__":
     # Test the organization logic
     test_config = {
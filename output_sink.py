@@ -0,0 +1,324 @@
+import io
+import os
+import shutil
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from assets import is_archive_member, place_asset
+
+ARCHIVE_FORMATS = ('zip', 'tar', 'tar.gz')
+
+# Images and audio are already compressed; deflating them again only costs CPU
+_STORED_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.wav', '.mp3', '.m4a', '.ogg', '.webm'}
+
+def archive_format(target, fmt='auto'):
+    """
+    Resolve the archive format for an output_archive target: fmt itself, or
+    guessed from the file extension ("zip" for stdout and unknown extensions).
+
+    Raises:
+        ValueError: fmt is not "auto" or one of ARCHIVE_FORMATS
+    """
+    fmt = (fmt or 'auto').lower()
+    if fmt != 'auto':
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"unknown archive format {fmt!r} (choose from {', '.join(ARCHIVE_FORMATS)})")
+        return fmt
+    name = str(target).lower()
+    if name.endswith(('.tar.gz', '.tgz')):
+        return 'tar.gz'
+    if name.endswith('.tar'):
+        return 'tar'
+    return 'zip'
+
+def _source_size(src_path):
+    if is_archive_member(src_path):
+        return src_path.size()
+    return os.path.getsize(src_path)
+
+def _open_source(src_path):
+    return src_path.open() if is_archive_member(src_path) else open(src_path, 'rb')
+
+def _open_tmp(tmp_path):
+    try:
+        return open(tmp_path, 'wb')
+    except FileNotFoundError:
+        # Folders are created up front by the output plan; this covers unplanned paths
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        return open(tmp_path, 'wb')
+
+class DirectorySink:
+    """
+    The default sink: notes and assets are ordinary files under the output folder.
+    Stateless, so every worker process can use its own.
+    """
+    is_archive = False
+
+    def write_note(self, file_path, data):
+        """
+        Write a note's bytes. A file that already holds exactly these bytes is
+        left untouched, mtime included, so sync tools only see notes that really
+        changed. Otherwise the file is written under a temporary name and renamed
+        into place, so an interrupted run never leaves a truncated note behind.
+
+        Returns: True if the file was (re)written
+        """
+        file_path = Path(file_path)
+        try:
+            # Sizes differ for almost every changed note, so most files are never read back
+            if file_path.stat().st_size == len(data):
+                with open(file_path, 'rb') as f:
+                    if f.read() == data:
+                        return False
+        except OSError:
+            pass
+
+        tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        try:
+            with _open_tmp(tmp_path) as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return True
+
+    def write_note_chunks(self, file_path, chunks):
+        """
+        write_note for a note given as an iterable of byte chunks, so a huge note
+        is never held in memory whole. The chunks go to the temporary file while
+        being compared with the existing file; if that already holds exactly
+        these bytes, the temporary file is dropped and the note left untouched.
+
+        Returns: True if the file was (re)written
+        """
+        file_path = Path(file_path)
+        tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        try:
+            try:
+                existing = open(file_path, 'rb')
+            except OSError:
+                existing = None
+            try:
+                with _open_tmp(tmp_path) as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                        if existing is not None and existing.read(len(chunk)) != chunk:
+                            existing.close()
+                            existing = None
+                identical = existing is not None and not existing.read(1)
+            finally:
+                if existing is not None:
+                    existing.close()
+            if identical:
+                return False
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return True
+
+    def add_asset(self, src_path, target_path, strategy='copy', dedupe=None):
+        """Place an attachment (see assets.place_asset). Returns False if the source is missing."""
+        return place_asset(src_path, target_path, strategy, dedupe)
+
+    def add_asset_bytes(self, target_path, data):
+        """Store downloaded asset bytes at target_path (atomically)."""
+        target_path = Path(target_path)
+        tmp_path = target_path.with_name(f".{target_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target_path)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+class DeferredSink:
+    """
+    Records the assets placed while conversations render, so they can be
+    reported with each conversation (see chatgpt_json_to_markdown.iter_rendered)
+    or handed back from a worker process, which cannot write to the parent's
+    archive stream. With a target sink every asset is also placed there right
+    away; without one nothing is written and the recorded assets can be
+    replayed into the real sink later (see replay()).
+    """
+
+    def __init__(self, target=None):
+        self.target = target
+        # Without a target there is no output tree to look at, as with an archive
+        self.is_archive = target.is_archive if target is not None else True
+        self._items = []
+
+    def add_asset(self, src_path, target_path, strategy='copy', dedupe=None):
+        if self.target is not None:
+            placed = self.target.add_asset(src_path, target_path, strategy, dedupe)
+        else:
+            placed = src_path.exists() if is_archive_member(src_path) else os.path.exists(src_path)
+        if placed:
+            self._items.append((src_path, target_path, False))
+        return placed
+
+    def add_asset_bytes(self, target_path, data):
+        if self.target is not None:
+            self.target.add_asset_bytes(target_path, data)
+        self._items.append((data, target_path, True))
+
+    def take(self):
+        """Return the assets recorded since the last call and forget them."""
+        items, self._items = self._items, []
+        return items
+
+def replay(sink, items):
+    """Add assets recorded by a DeferredSink to sink, in the order they were placed."""
+    for source, target_path, is_bytes in items:
+        if is_bytes:
+            sink.add_asset_bytes(target_path, source)
+        else:
+            sink.add_asset(source, target_path)
+
+class _ArchiveSink:
+    """
+    Base for sinks that stream the whole output layout into a single archive.
+    Member names are paths relative to root, so relative asset links in the
+    notes resolve exactly as they would in the output folder. Each member is
+    streamed in, so memory stays bounded by the largest note, not the archive.
+
+    A target file is written under a temporary name and renamed into place by
+    close(); "-" streams to standard output.
+    """
+    is_archive = True
+
+    def __init__(self, target, root):
+        self.root = Path(root)
+        self.target = target
+        self._names = set()
+        self._mtime = time.time()
+        if target == '-':
+            self._tmp_path = None
+            self._file = sys.__stdout__.buffer
+        else:
+            target = Path(target)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            self._file = open(self._tmp_path, 'wb')
+
+    def _arcname(self, path):
+        name = os.path.relpath(path, self.root).replace('\\', '/')
+        if name in self._names:
+            return None
+        self._names.add(name)
+        return name
+
+    def write_note(self, file_path, data):
+        name = self._arcname(file_path)
+        if name is not None:
+            self._add_bytes(name, data, compress=True)
+        return True
+
+    def write_note_chunks(self, file_path, chunks):
+        # Members are added with their size known up front, so the note is assembled here
+        return self.write_note(file_path, b"".join(chunks))
+
+    def add_asset(self, src_path, target_path, strategy='copy', dedupe=None):
+        """Stream an attachment into the archive once. Returns False if the source is missing."""
+        rel = os.path.relpath(target_path, self.root).replace('\\', '/')
+        if rel in self._names:
+            return True
+        try:
+            size = _source_size(src_path)
+        except (OSError, KeyError):
+            return False
+        self._names.add(rel)
+        with _open_source(src_path) as src:
+            self._add_stream(rel, src, size, compress=Path(rel).suffix.lower() not in _STORED_SUFFIXES)
+        return True
+
+    def add_asset_bytes(self, target_path, data):
+        name = self._arcname(target_path)
+        if name is not None:
+            self._add_bytes(name, data, compress=Path(name).suffix.lower() not in _STORED_SUFFIXES)
+
+    def close(self):
+        self._finish()
+        if self._tmp_path is None:
+            self._file.flush()
+            return
+        self._file.close()
+        os.replace(self._tmp_path, self.target)
+
+    def abort(self):
+        """Drop a partially written archive file (standard output can't be taken back)."""
+        if self._tmp_path is None:
+            return
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+class ZipSink(_ArchiveSink):
+    """Writes a ZIP archive; works on unseekable streams such as a pipe."""
+
+    def __init__(self, target, root):
+        super().__init__(target, root)
+        self._zip = zipfile.ZipFile(self._file, 'w')
+        self._date_time = time.localtime(self._mtime)[:6]
+
+    def _info(self, name, compress):
+        info = zipfile.ZipInfo(name, date_time=self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        return info
+
+    def _add_bytes(self, name, data, compress):
+        self._zip.writestr(self._info(name, compress), data)
+
+    def _add_stream(self, name, src, size, compress):
+        info = self._info(name, compress)
+        info.file_size = size
+        with self._zip.open(info, 'w') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+    def _finish(self):
+        self._zip.close()
+
+class TarSink(_ArchiveSink):
+    """Writes a tar (optionally gzip-compressed) archive in streaming mode."""
+
+    def __init__(self, target, root, compression=''):
+        import tarfile
+
+        super().__init__(target, root)
+        self._tar = tarfile.open(fileobj=self._file, mode=f"w|{compression}")
+
+    def _info(self, name, size):
+        info = self._tar.tarinfo(name)
+        info.size = size
+        info.mtime = int(self._mtime)
+        info.mode = 0o644
+        return info
+
+    def _add_bytes(self, name, data, compress):
+        self._tar.addfile(self._info(name, len(data)), io.BytesIO(data))
+
+    def _add_stream(self, name, src, size, compress):
+        self._tar.addfile(self._info(name, size), src)
+
+    def _finish(self):
+        self._tar.close()
+
+def open_output_sink(output_base, archive=None, fmt='auto'):
+    """
+    Return the sink for a run: a DirectorySink writing under output_base, or,
+    when archive is set (a file path or "-" for standard output), an archive
+    sink laying out the same tree inside one ZIP or tar stream.
+    """
+    if not archive:
+        return DirectorySink()
+    fmt = archive_format(archive, fmt)
+    if fmt == 'zip':
+        return ZipSink(archive, output_base)
+    return TarSink(archive, output_base, 'gz' if fmt == 'tar.gz' else '')
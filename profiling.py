@@ -0,0 +1,245 @@
+import contextlib
+import heapq
+import json
+import sys
+import time
+
+PROFILE_VERSION = 1
+
+STAGES = ('load', 'plan', 'traverse', 'content', 'assets', 'downloads', 'render', 'write', 'other')
+
+# Converter functions timed per stage. Time is exclusive: a stage never includes
+# time spent in another stage it calls into (content -> assets, for example).
+STAGE_FUNCTIONS = {
+    'plan': ('plan_output',),
+    'traverse': ('_traverse_mapping',),
+    'content': ('_get_message_content',),
+    'assets': ('get_attachment_index', 'find_attachment_file', 'copy_attachment'),
+    'downloads': ('_download_web_image', '_resolve_web_image_downloads', '_close_downloader'),
+    'write': ('_write_markdown',),
+}
+# Generators whose iteration is JSON decoding
+LOAD_FUNCTIONS = ('iter_conversations', 'iter_zip_conversations')
+
+# Original functions of instrumented modules, so instrumenting twice (e.g. in a
+# forked worker that inherited the parent's wrappers) never stacks wrappers.
+_originals = {}
+
+def _peak_rss_mb(children=False):
+    """Peak resident set size in MB, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+class Profiler:
+    """
+    Per-stage wall-time accumulator, counters and per-conversation timings.
+
+    Only functions wrapped by instrument() are measured, so a run without
+    --profile pays nothing for any of this.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.counters = {}
+        # (seconds, conversation_id, title, messages, assets)
+        self.conversations = []
+        self._child_time = []
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        self._child_time.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._child_time.pop()
+            self.seconds[stage] += elapsed - children
+            self.calls[stage] += 1
+            if self._child_time:
+                self._child_time[-1] += elapsed
+
+    def wrap(self, stage, func, after=None):
+        """Time calls to func under stage; after(result) may update counters."""
+        def timed(*args, **kwargs):
+            with self.measure(stage):
+                result = func(*args, **kwargs)
+            if after is not None:
+                after(result)
+            return result
+        return timed
+
+    def wrap_iterator(self, stage, func):
+        """Time each step of the iterator returned by func under stage."""
+        def timed(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                with self.measure(stage):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                self.count('conversations_loaded')
+                yield item
+        return timed
+
+    def wrap_conversation(self, func):
+        """Time whole conversations (inclusive) and remember their message/asset counts."""
+        def timed(entry, *args, **kwargs):
+            assets_before = self.counters.get('attachments_placed', 0) + self.counters.get('web_images', 0)
+            start = time.perf_counter()
+            with self.measure('render'):
+                result = func(entry, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+            if isinstance(entry, dict):
+                mapping = entry.get('mapping') or {}
+                messages = sum(1 for node in mapping.values() if isinstance(node, dict) and node.get('message'))
+                assets = self.counters.get('attachments_placed', 0) + self.counters.get('web_images', 0) - assets_before
+                self.conversations.append((
+                    elapsed,
+                    entry.get('conversation_id') or entry.get('id') or '',
+                    entry.get('title') or '',
+                    messages,
+                    assets,
+                ))
+                self.count('conversations_rendered')
+                self.count('messages', messages)
+            return result
+        return timed
+
+    def snapshot(self):
+        """Return everything measured so far and start over (used to ship worker timings)."""
+        data = {
+            'seconds': self.seconds,
+            'calls': self.calls,
+            'counters': self.counters,
+            'conversations': self.conversations,
+        }
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.counters = {}
+        self.conversations = []
+        return data
+
+    def merge(self, data):
+        """Add a snapshot taken in another process."""
+        for stage, seconds in data['seconds'].items():
+            self.seconds[stage] += seconds
+        for stage, calls in data['calls'].items():
+            self.calls[stage] += calls
+        for name, n in data['counters'].items():
+            self.count(name, n)
+        self.conversations.extend(data['conversations'])
+
+    def report(self, wall_seconds, top=10, workers=1):
+        """
+        Build the machine-readable report.
+
+        With workers > 1, stage times are summed across processes and can add
+        up to more than wall_seconds; 'other' is then left at zero.
+        """
+        seconds = dict(self.seconds)
+        if workers <= 1:
+            seconds['other'] = max(0.0, wall_seconds - sum(seconds.values()))
+        slowest = heapq.nlargest(top, self.conversations)
+        return {
+            'version': PROFILE_VERSION,
+            'wall_seconds': round(wall_seconds, 4),
+            'workers': workers,
+            'stages': {stage: round(seconds[stage], 6) for stage in STAGES},
+            'calls': {stage: self.calls[stage] for stage in STAGES if stage != 'other'},
+            'counters': dict(sorted(self.counters.items())),
+            'peak_rss_mb': _peak_rss_mb(),
+            'peak_worker_rss_mb': _peak_rss_mb(children=True) if workers > 1 else None,
+            'slowest_conversations': [
+                {'seconds': round(s, 6), 'conversation_id': cid, 'title': title,
+                 'messages': messages, 'assets': assets}
+                for s, cid, title, messages, assets in slowest
+            ],
+        }
+
+def instrument(module, profiler):
+    """
+    Route the converter's hot paths in module through profiler.
+    Calls resolve module globals at call time, so patching the module is enough.
+    """
+    def patch(name, make):
+        key = (module.__name__, name)
+        original = _originals.setdefault(key, getattr(module, name))
+        setattr(module, name, make(original))
+
+    def after_lookup(result):
+        profiler.count('attachment_lookups')
+        if not result[0]:
+            profiler.count('attachments_missing')
+
+    def after_copy(result):
+        if result:
+            profiler.count('attachments_placed')
+
+    def after_web_image(result):
+        if result:
+            profiler.count('web_images')
+
+    def after_write(result):
+        written, size = result
+        kind = 'written' if written else 'identical'
+        profiler.count(f'files_{kind}')
+        profiler.count(f'bytes_{kind}', size)
+
+    counters = {
+        'find_attachment_file': after_lookup,
+        'copy_attachment': after_copy,
+        '_download_web_image': after_web_image,
+        '_write_markdown': after_write,
+    }
+    for stage, names in STAGE_FUNCTIONS.items():
+        for name in names:
+            patch(name, lambda f, stage=stage, name=name: profiler.wrap(stage, f, counters.get(name)))
+    for name in LOAD_FUNCTIONS:
+        patch(name, lambda f: profiler.wrap_iterator('load', f))
+    patch('_render_conversation', profiler.wrap_conversation)
+
+def print_report(report):
+    """Print a stage breakdown table, counters and the slowest conversations."""
+    stages = report['stages']
+    total = sum(stages.values()) or 1.0
+    print()
+    print("⏱️  Profile")
+    if report['workers'] > 1:
+        print(f"   (stage times summed over {report['workers']} worker processes)")
+    print(f"   {'stage':<10} {'seconds':>9} {'share':>7} {'calls':>9}")
+    for stage in STAGES:
+        calls = report['calls'].get(stage, '')
+        print(f"   {stage:<10} {stages[stage]:>9.3f} {stages[stage] / total:>6.1%} {calls:>9}")
+    print(f"   {'wall':<10} {report['wall_seconds']:>9.3f}")
+
+    counters = report['counters']
+    if counters:
+        print()
+        for name, value in counters.items():
+            print(f"   {name.replace('_', ' '):<24} {value:>12,}")
+    if report['peak_rss_mb'] is not None:
+        workers = f" (largest worker {report['peak_worker_rss_mb']} MB)" if report['peak_worker_rss_mb'] else ""
+        print(f"   {'peak rss':<24} {report['peak_rss_mb']:>9} MB{workers}")
+
+    if report['slowest_conversations']:
+        print()
+        print(f"   Slowest {len(report['slowest_conversations'])} conversations:")
+        for conv in report['slowest_conversations']:
+            title = conv['title'] if len(conv['title']) <= 40 else conv['title'][:39] + '…'
+            print(f"   {conv['seconds'] * 1000:>9.1f} ms  {conv['messages']:>5} msgs  "
+                  f"{conv['assets']:>4} assets  {title}  [{conv['conversation_id'][:8]}]")
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
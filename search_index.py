@@ -0,0 +1,192 @@
+import os
+from pathlib import Path
+
+try:
+    import sqlite3
+    _sqlite_available = True
+except ImportError:
+    _sqlite_available = False
+
+SEARCH_INDEX_FILENAME = 'search_index.sqlite'
+SEARCH_INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    category TEXT,
+    create_time REAL,
+    update_time REAL,
+    path TEXT,
+    message_count INTEGER,
+    config_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT,
+    create_time REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+def fts5_available():
+    """True if this Python's SQLite was built with the FTS5 extension."""
+    if not _sqlite_available:
+        return False
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+class SearchIndex:
+    """
+    SQLite full-text index of the converted conversations, kept next to the
+    markdown and updated in place: each run only rewrites the rows of
+    conversations that changed, and everything is committed in one transaction
+    when the index is closed.
+
+    - conversations: id, title, category, create/update time, output path (relative)
+    - messages / messages_fts: the text of every rendered message with its role,
+      searchable with FTS5 queries (see search())
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / SEARCH_INDEX_FILENAME
+        self.updated = 0
+        self.removed = 0
+        self._conn = sqlite3.connect(self.path)
+        version = self._version()
+        if version is not None and version != SEARCH_INDEX_VERSION:
+            # Written by an incompatible version, or unreadable — start over
+            self._conn.close()
+            self.path.unlink()
+            self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("INSERT OR REPLACE INTO info VALUES ('version', ?)", (str(SEARCH_INDEX_VERSION),))
+        # id -> (update_time, config_hash, path) of every indexed conversation
+        self._records = {
+            row[0]: row[1:]
+            for row in self._conn.execute("SELECT id, update_time, config_hash, path FROM conversations")
+        }
+
+    def _version(self):
+        try:
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+        except sqlite3.OperationalError:
+            return None  # new, empty database
+        except sqlite3.DatabaseError:
+            return -1  # not a database (e.g. truncated) — rebuild it
+        return int(row[0]) if row else None
+
+    def is_current(self, conversation_id, update_time, fingerprint):
+        """True if the conversation is indexed from the same update_time and rendering config."""
+        record = self._records.get(conversation_id)
+        return record is not None and record[0] == update_time and record[1] == fingerprint
+
+    def update(self, conversation_id, record, file_path, fingerprint):
+        """
+        Index a freshly rendered conversation, replacing its previous rows.
+        record is the search record returned by the renderer: title, category,
+        create_time, update_time and messages as (role, create_time, text).
+        Unchanged conversations (same update_time, config and path) are left alone.
+        """
+        rel_path = os.path.relpath(file_path, self.output_dir).replace('\\', '/')
+        update_time = record['update_time']
+        if self._records.get(conversation_id) == (update_time, fingerprint, rel_path):
+            return
+        self._delete(conversation_id)
+        self._conn.execute(
+            "INSERT INTO conversations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (conversation_id, record['title'], record['category'], record['create_time'],
+             update_time, rel_path, len(record['messages']), fingerprint),
+        )
+        self._conn.executemany(
+            "INSERT INTO messages (conversation_id, position, role, create_time, text) VALUES (?, ?, ?, ?, ?)",
+            [(conversation_id, position, role, create_time, text)
+             for position, (role, create_time, text) in enumerate(record['messages'])],
+        )
+        self._records[conversation_id] = (update_time, fingerprint, rel_path)
+        self.updated += 1
+
+    def remove_missing(self, seen_ids):
+        """Drop conversations that are no longer in the export. Returns how many were removed."""
+        missing = [cid for cid in self._records if cid not in seen_ids]
+        for conversation_id in missing:
+            self._delete(conversation_id)
+            del self._records[conversation_id]
+        self.removed += len(missing)
+        return len(missing)
+
+    def _delete(self, conversation_id):
+        if conversation_id in self._records:
+            self._conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def search(output_dir, query, limit=20):
+    """
+    Run an FTS5 query (e.g. 'sqlite AND "full text"', 'pyth*') against the
+    index in output_dir.
+
+    Returns:
+        list of dicts (title, path, category, role, create_time, snippet), best match first
+    """
+    conn = sqlite3.connect(Path(output_dir) / SEARCH_INDEX_FILENAME)
+    try:
+        rows = conn.execute(
+            """
+            SELECT c.title, c.path, c.category, m.role, m.create_time,
+                   snippet(messages_fts, 0, '[', ']', '…', 12)
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE messages_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (query, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    keys = ('title', 'path', 'category', 'role', 'create_time', 'snippet')
+    return [dict(zip(keys, row)) for row in rows]
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python search_index.py <markdown_directory> <query> [limit]")
+        sys.exit(1)
+
+    output_dir = sys.argv[1].strip('"')
+    if not (Path(output_dir) / SEARCH_INDEX_FILENAME).is_file():
+        print(f"❌ No {SEARCH_INDEX_FILENAME} in {output_dir} — convert with \"search_index\": true first")
+        sys.exit(1)
+    try:
+        results = search(output_dir, sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 20)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Invalid search query: {e}")
+        sys.exit(1)
+    for result in results:
+        print(f"🔎 {result['title']}  ({result['role']})")
+        print(f"   {' '.join(result['snippet'].split())}")
+        print(f"   {result['path']}")
+    print(f"{len(results)} result(s)")
@@ -3,7 +3,6 @@ import json
 import os
 import sys
 from pathlib import Path
-from extract_zip import extract_chatgpt_zip, is_zip_file, is_extracted_directory
 
 # Fix Windows console encoding for emojis
 if sys.platform == 'win32':
@@ -80,7 +79,16 @@ def get_user_input(prompt, default=None, valid_options=None):
         return user_input
 
 def get_input_path():
-    """Get and validate input path (ZIP or directory)"""
+    """
+    Get and validate input path (ZIP or directory).
+
+    Returns:
+        (input_path, input_mode) — input_mode is 'zip' when converting straight
+        from the ZIP, otherwise 'directory'
+    """
+    # Imported here so the wizard loads zipfile only once it asks for the export
+    from extract_zip import extract_chatgpt_zip, find_zip_conversations, is_zip_file, is_extracted_directory
+
     print("\n📦 ChatGPT Export Location")
     print("   You can provide:")
     print("   - Path to the ZIP file you downloaded from ChatGPT")
@@ -98,17 +106,36 @@ def get_input_path():
 
         if is_zip_file(path):
             print(f"\n   ✅ Found ZIP file: {path.name}")
+            print("   The converter can read the ZIP directly — no extraction, and only")
+            print("   the images/audio your conversations use are copied out of it.")
+            extract = get_user_input(
+                "   Extract the ZIP first instead? (Y/N)",
+                default="N",
+                valid_options=['Y', 'N', 'YES', 'NO']
+            ).upper()
+
+            if extract in ['N', 'NO']:
+                try:
+                    import zipfile
+
+                    with zipfile.ZipFile(path) as zip_ref:
+                        find_zip_conversations(zip_ref)
+                except Exception as e:
+                    print(f"   ❌ Error reading ZIP: {e}")
+                    continue
+                return str(path.resolve()), 'zip'
+
             print(f"   📦 Extracting...")
             try:
                 extracted_path = extract_chatgpt_zip(path)
-                return str(extracted_path)
+                return str(extracted_path), 'directory'
             except Exception as e:
                 print(f"   ❌ Error extracting ZIP: {e}")
                 continue
 
         elif is_extracted_directory(path):
             print(f"\n   ✅ Found ChatGPT export folder: {path.name}")
-            return str(path)
+            return str(path), 'directory'
 
         else:
             print(f"   ❌ Invalid path. Could not find:")
@@ -129,8 +156,8 @@ def run_setup():
     print()
 
     # 2. Input path (ZIP or directory)
-    config['input_path'] = get_input_path()
-    config['input_mode'] = 'directory'
+    config['input_path'], config['input_mode'] = get_input_path()
+    config['input_paths'] = []
 
     # 3. Output directory
     print("\n📂 Output Location")
@@ -163,6 +190,8 @@ def run_setup():
     config['regular_folder'] = 'Regular'
     config['date_folder_format'] = 'YYYY/MM-Month'
     config['separate_assets_by_type'] = True
+    config['asset_placement'] = 'copy'
+    config['dedupe_assets'] = False
 
     # 5. Obsidian formatting
     print()
@@ -195,6 +224,24 @@ def run_setup():
     config['image_group_callout_type'] = 'image_group'
     config['image_group_callout_state'] = 'static'
     config['download_web_images'] = False
+    config['cache_attachment_index'] = False
+    config['cache_conversation_index'] = False
+    config['json_backend'] = 'auto'
+    config['json_max_document_mb'] = 32
+    config['workers'] = 1
+    config['incremental'] = False
+    config['prune_deleted'] = False
+    config['output_archive'] = ''
+    config['output_archive_format'] = 'auto'
+    config['search_index'] = False
+    config['filter_ids'] = []
+    config['filter_categories'] = []
+    config['filter_created_after'] = ''
+    config['filter_created_before'] = ''
+    config['filter_updated_after'] = ''
+    config['filter_updated_before'] = ''
+    config['filter_title'] = ''
+    config['filter_min_messages'] = 0
     config['timestamp_tag'] = 'sub'
     config['timestamp_position'] = 'header'
 
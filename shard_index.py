@@ -0,0 +1,269 @@
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from json_backend import get_decoder, is_available
+
+SHARD_INDEX_FILENAME = '.conversation_index.json'
+SHARD_INDEX_VERSION = 1
+
+# Top-level fields kept for every conversation: enough to plan its output path
+# (see organize.create_organization_summary) and to filter it (see conversation_filter)
+STUB_KEYS = ('conversation_id', 'id', 'title', 'create_time', 'update_time', 'is_starred', 'is_archived')
+_STUB_KEY_BYTES = {f'"{key}"'.encode(): key for key in STUB_KEYS}
+
+# Everything up to and including the next bracket that is not inside a string.
+# Strings are consumed whole, so a bracket in message text never counts.
+_STRUCTURE = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*[\[\]{}]', re.DOTALL)
+
+# A string, and when it is an object key, the scalar value that follows it
+_FIELD = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"(\s*:\s*("[^"\\]*(?:\\.[^"\\]*)*"|[^\s,"\[\]{}]+))?', re.DOTALL)
+
+# What comes before the first element of the top-level array, and between elements
+_ARRAY_START = re.compile(rb'\s*\[\s*')
+_SEPARATOR = re.compile(rb'\s*,?\s*')
+
+_OPEN = frozenset(b'[{')
+
+# Conversation files inside a ZIP up to this size are scanned in memory
+_IN_MEMORY_SCAN_BYTES = 64 * 1024 * 1024
+
+def _read_fields(text, stub):
+    """Add the STUB_KEYS scalars found in text (the top level of one conversation) to stub."""
+    for m in _FIELD.finditer(text):
+        if m.group(2) is None:
+            continue
+        key = _STUB_KEY_BYTES.get(text[m.start():m.start(1)])
+        if key is None:
+            continue
+        try:
+            stub[key] = json.loads(m.group(2))
+        except ValueError:
+            pass
+
+def _stub_schema():
+    """msgspec type decoding only the STUB_KEYS of a conversation (everything else is skipped)."""
+    from typing import Any, TypedDict
+
+    return TypedDict('_Stub', {key: Any for key in STUB_KEYS}, total=False)
+
+def _scan_msgspec(mm):
+    """
+    scan_shard with msgspec: the array is split into raw elements without
+    decoding them, and each element's offset follows from the lengths of the
+    ones before it. Returns None if the file is not an array msgspec accepts.
+    """
+    import msgspec
+    from typing import List
+
+    try:
+        raws = msgspec.json.Decoder(List[msgspec.Raw]).decode(mm)
+    except msgspec.DecodeError:
+        return None
+    decode_stub = msgspec.json.Decoder(_stub_schema()).decode
+    entries = []
+    pos = _ARRAY_START.match(mm, 0).end()
+    raw = None
+    try:
+        for raw in raws:
+            length = len(raw)
+            if mm[pos] == ord('{'):
+                stub = {key: value for key, value in decode_stub(raw).items()
+                        if not isinstance(value, (dict, list))}
+                entries.append((pos, length, stub))
+            pos = _SEPARATOR.match(mm, pos + length).end()
+    finally:
+        # The raw elements point into the mapping, which can't be closed while they exist
+        del raws, raw
+    return entries
+
+def _scan_structure(mm):
+    """scan_shard in pure Python, following the brackets of the document with _STRUCTURE."""
+    entries = []
+    depth = 0
+    # Conversations sit inside the top-level array, or are the document itself
+    entry_depth = None
+    start = 0
+    stub = None
+    pos = 0
+    for m in _STRUCTURE.finditer(mm):
+        bracket = mm[m.end() - 1]
+        if stub is not None and depth == entry_depth:
+            _read_fields(mm[pos:m.end() - 1], stub)
+        pos = m.end()
+        if bracket in _OPEN:
+            depth += 1
+            if entry_depth is None:
+                entry_depth = depth + 1 if bracket == ord('[') else depth
+            if depth == entry_depth and bracket == ord('{'):
+                start = m.end() - 1
+                stub = {}
+        else:
+            if depth == entry_depth and stub is not None:
+                entries.append((start, m.end() - start, stub))
+                stub = None
+            depth -= 1
+    return entries
+
+def _scan_buffer(buf):
+    entries = _scan_msgspec(buf) if is_available('msgspec') else None
+    if entries is None:
+        entries = _scan_structure(buf)
+    return entries
+
+def scan_shard(path):
+    """
+    Find every conversation in a conversations*.json file without decoding it.
+
+    The file is memory-mapped and only its structure is followed: with msgspec
+    installed the array is split into its raw elements, otherwise brackets
+    outside strings are counted to find where each conversation object starts
+    and ends. Only the STUB_KEYS scalars of each conversation are decoded.
+
+    Returns:
+        list of (byte offset, byte length, stub dict) per conversation, in file order
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan_buffer(mm)
+
+def _scan_zip_member(zip_ref, name):
+    """scan_shard for a conversations*.json inside an export ZIP."""
+    if zip_ref.getinfo(name).file_size <= _IN_MEMORY_SCAN_BYTES:
+        data = zip_ref.read(name)
+        return _scan_buffer(data) if data else []
+    # Too big to hold: unpack it to a temporary file and map that instead
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'conversations.json')
+        with zip_ref.open(name) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return scan_shard(path)
+
+def shard_stubs(files, persist=False):
+    """
+    The stub (STUB_KEYS fields) of every conversation in conversations*.json
+    files, in export order: enough to plan the output without decoding the
+    export (see chatgpt_json_to_markdown.plan_output). With persist, the index
+    saved next to the files is reused and kept up to date (see get_shard_index).
+    """
+    if not files:
+        return []
+    index = get_shard_index(Path(files[0]).parent, files, persist=persist)
+    return [entry[3] for entry in index['conversations']]
+
+def zip_stubs(zip_path):
+    """shard_stubs for the conversation files inside an export ZIP."""
+    import zipfile
+    from extract_zip import find_zip_conversations
+
+    stubs = []
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        _, members = find_zip_conversations(zip_ref)
+        for name in members:
+            stubs.extend(stub for _, _, stub in _scan_zip_member(zip_ref, name))
+    return stubs
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def build_shard_index(files):
+    """
+    Scan conversations*.json files into an index.
+
+    Returns:
+        dict with 'shards' (file name, size, mtime_ns) and 'conversations':
+        [shard number, byte offset, byte length, stub] in export order
+    """
+    shards = []
+    conversations = []
+    for number, path in enumerate(files):
+        shards.append([os.path.basename(path)] + _signature(path))
+        for offset, length, stub in scan_shard(path):
+            conversations.append([number, offset, length, stub])
+    return {'version': SHARD_INDEX_VERSION, 'shards': shards, 'conversations': conversations}
+
+def load_shard_index(base_path, files):
+    """Load the index saved in base_path, or None if missing or any shard changed since."""
+    try:
+        with open(Path(base_path) / SHARD_INDEX_FILENAME, 'rb') as f:
+            data = f.read()
+        # The index of a large export is itself several MB; decode it with the fastest backend
+        decoder = get_decoder(typed=False)
+        index = decoder.decode(data) if decoder is not None else json.loads(data)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get('version') != SHARD_INDEX_VERSION:
+        return None
+    try:
+        current = [[os.path.basename(path)] + _signature(path) for path in files]
+    except OSError:
+        return None
+    if index.get('shards') != current:
+        return None
+    return index
+
+def save_shard_index(base_path, index):
+    """Save the index next to the shards. Returns False if the folder is read-only."""
+    try:
+        with open(Path(base_path) / SHARD_INDEX_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+    except OSError:
+        return False
+    return True
+
+def get_shard_index(base_path, files, persist=False):
+    """
+    Return the index of files (conversations*.json in base_path).
+
+    Args:
+        persist: Reuse the index saved in base_path while no shard has changed,
+            and save it there whenever it is rebuilt
+    """
+    index = load_shard_index(base_path, files) if persist else None
+    if index is None:
+        index = build_shard_index(files)
+        if persist:
+            save_shard_index(base_path, index)
+    return index
+
+def read_conversation(path, offset, length, decoder=None):
+    """
+    Decode the single conversation stored at offset in a shard, with decoder
+    (a json_backend.JsonDecoder made with conversation=True) or the standard library.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return decoder.decode(data) if decoder is not None else json.loads(data)
+
+def iter_indexed_conversations(base_path, index, positions, decoder=None):
+    """Yield the conversations at positions in index['conversations'], read straight from their shards."""
+    shards = index['shards']
+    for position in positions:
+        shard, offset, length, _ = index['conversations'][position]
+        yield read_conversation(Path(base_path) / shards[shard][0], offset, length, decoder)
+
+if __name__ == "__main__":
+    import glob
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python shard_index.py <export_directory>")
+        sys.exit(1)
+
+    export_dir = sys.argv[1].strip('"')
+    files = sorted(glob.glob(os.path.join(export_dir, 'conversations*.json')))
+    start = time.perf_counter()
+    index = build_shard_index(files)
+    save_shard_index(export_dir, index)
+    print(f"📇 Indexed {len(index['conversations'])} conversations in {len(files)} files "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"   Saved to: {Path(export_dir) / SHARD_INDEX_FILENAME}")
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import zipfile
+from pathlib import Path
+
+# Fixed vocabulary keeps generated text realistic-looking but reproducible
+_WORDS = (
+    "the a to of and in is for on that with as this it be are from or by at "
+    "function value return data file error result model python request using "
+    "example config output input message list string number class object test "
+    "performance memory process thread export markdown convert image audio "
+    "größe café naïve 数据 résumé"
+).split()
+
+_BASE_TIME = 1672531200  # 2023-01-01
+
+def _sentence(rng, min_words, max_words):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+def _paragraphs(rng, words):
+    """Roughly `words` words of prose, with the occasional code block and CRLF line ending."""
+    out = []
+    remaining = words
+    while remaining > 0:
+        n = min(remaining, rng.randint(15, 60))
+        out.append(_sentence(rng, n, n))
+        remaining -= n
+        if rng.random() < 0.1:
+            out.append("```python\ndef f(x):\n    return x * 2\n```")
+    sep = "\r\n\r\n" if rng.random() < 0.05 else "\n\n"
+    return sep.join(out)
+
+class _ExportWriter:
+    """Writes conversations to conversations.json or conversations-NNN.json shards."""
+
+    def __init__(self, root, layout, shard_size):
+        self.root = root
+        self.layout = layout
+        self.shard_size = max(1, shard_size)
+        self.files = []
+        self.bytes = 0
+        self._file = None
+        self._count = 0
+
+    def _open_next(self):
+        if self.layout == 'legacy':
+            name = 'conversations.json'
+        else:
+            name = f'conversations-{len(self.files):03d}.json'
+        path = self.root / name
+        self.files.append(path)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[')
+        self._count = 0
+
+    def _close_current(self):
+        if self._file is not None:
+            self._file.write(']')
+            self._file.close()
+            self.bytes += self.files[-1].stat().st_size
+            self._file = None
+
+    def write(self, conversation):
+        if self._file is None or (self.layout != 'legacy' and self._count >= self.shard_size):
+            self._close_current()
+            self._open_next()
+        if self._count:
+            self._file.write(', ')
+        json.dump(conversation, self._file, ensure_ascii=False)
+        self._count += 1
+
+    def close(self):
+        if self._file is None:
+            self._open_next()
+        self._close_current()
+
+class _ConversationBuilder:
+    """Builds one conversation's mapping as a tree of linked nodes."""
+
+    def __init__(self, conversation_id, create_time):
+        self.conversation_id = conversation_id
+        self.time = create_time
+        self.mapping = {}
+        self.messages = 0
+        root_id = f"{conversation_id}-root"
+        self.mapping[root_id] = {"id": root_id, "message": None, "parent": None, "children": []}
+        self.root_id = root_id
+
+    def add(self, parent_id, role, content, metadata=None, recipient="all", author_name=None):
+        node_id = f"{self.conversation_id}-{len(self.mapping):05d}"
+        self.time += 30
+        author = {"role": role}
+        if author_name:
+            author["name"] = author_name
+        message = {
+            "id": node_id,
+            "author": author,
+            "create_time": self.time,
+            "update_time": self.time,
+            "content": content,
+            "status": "finished_successfully",
+            "recipient": recipient,
+            "metadata": metadata or {},
+        }
+        self.mapping[node_id] = {"id": node_id, "message": message, "parent": parent_id, "children": []}
+        self.mapping[parent_id]["children"].append(node_id)
+        self.messages += 1
+        return node_id
+
+def _image_group_part(rng, index):
+    """A text part with an inline image_group marker plus its content_references."""
+    query = f"query {index}"
+    images = [
+        {
+            "image_search_query": query,
+            "image_result": {
+                "title": f"Result {index}.{i}",
+                "content_url": f"https://images.example.com/{index}/{i}.jpg",
+            },
+        }
+        for i in range(rng.randint(1, 4))
+    ]
+    marker = '\ue200image_group\ue202' + json.dumps({"query": [query]}) + '\ue201'
+    return marker, {"type": "image_group", "images": images}
+
+def generate_export(output_dir, conversations=1000, messages=20, branching=0.1,
+                    reasoning=0.2, image_groups=0.05, images=0.05, audio=0.02,
+                    words=120, asset_size=32 * 1024, layout='sharded', shard_size=100,
+                    seed=0):
+    """
+    Write a synthetic ChatGPT export with the same structure as a real one.
+
+    Args:
+        output_dir: Directory to create the export in
+        conversations: Number of conversations
+        messages: Average visible messages per conversation (user + assistant)
+        branching: Chance an assistant reply was regenerated, leaving an abandoned
+            sibling branch in the mapping
+        reasoning: Chance an assistant reply carries thoughts + reasoning_recap nodes
+        image_groups: Chance an assistant reply contains an inline image_group
+        images: Chance a user message attaches an image (file on disk)
+        audio: Chance a user message is a voice message (file on disk)
+        words: Average words per message
+        asset_size: Size in bytes of each generated image/audio file
+        layout: 'sharded' (conversations-NNN.json) or 'legacy' (conversations.json)
+        shard_size: Conversations per shard in the sharded layout
+        seed: Random seed; the same arguments always produce the same export
+
+    Returns:
+        dict summarizing what was written (counts and byte sizes)
+    """
+    if layout not in ('sharded', 'legacy'):
+        raise ValueError(f"layout must be 'sharded' or 'legacy', not {layout!r}")
+
+    rng = random.Random(seed)
+    root = Path(output_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / 'user-synthetic').mkdir(exist_ok=True)
+    asset_bytes = bytes(rng.getrandbits(8) for _ in range(min(asset_size, 4096)))
+    asset_bytes = (asset_bytes * (asset_size // max(len(asset_bytes), 1) + 1))[:asset_size]
+
+    writer = _ExportWriter(root, layout, shard_size)
+    stats = {'conversations': 0, 'messages': 0, 'branches': 0, 'reasoning': 0,
+             'image_groups': 0, 'images': 0, 'audio': 0, 'asset_bytes': 0}
+
+    def write_asset(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(asset_bytes)
+        stats['asset_bytes'] += len(asset_bytes)
+
+    for c in range(conversations):
+        conversation_id = f"{c:08x}-{seed:04x}-4000-8000-{rng.getrandbits(48):012x}"
+        create_time = _BASE_TIME + c * 3600 + rng.randint(0, 3000)
+        conv = _ConversationBuilder(conversation_id, create_time)
+        parent = conv.add(conv.root_id, "system", {"content_type": "text", "parts": [""]},
+                          {"is_visually_hidden_from_conversation": True})
+
+        turns = max(1, round(rng.uniform(0.5, 1.5) * messages / 2))
+        for t in range(turns):
+            # User turn, optionally with an attachment
+            parts = [_paragraphs(rng, max(3, words // 3))]
+            roll = rng.random()
+            if roll < images:
+                file_id = f"file-{rng.getrandbits(64):016x}"
+                write_asset(root / 'user-synthetic' / f"{file_id}-upload.png")
+                parts.insert(0, {"content_type": "image_asset_pointer",
+                                 "asset_pointer": f"file-service://{file_id}"})
+                stats['images'] += 1
+            elif roll < images + audio:
+                file_id = f"file_{rng.getrandbits(128):032x}"
+                write_asset(root / conversation_id / 'audio' / f"{file_id}-voice.wav")
+                parts.insert(0, {"content_type": "audio_asset_pointer",
+                                 "asset_pointer": f"sediment://{file_id}",
+                                 "metadata": {"start": 0, "end": round(rng.uniform(1, 30), 2)}})
+                stats['audio'] += 1
+            content_type = "multimodal_text" if len(parts) > 1 else "text"
+            parent = conv.add(parent, "user", {"content_type": content_type, "parts": parts})
+
+            # Optional reasoning nodes before the reply
+            if rng.random() < reasoning:
+                thoughts = [{"summary": _sentence(rng, 2, 5), "content": _paragraphs(rng, 40)}
+                            for _ in range(rng.randint(1, 4))]
+                parent = conv.add(parent, "assistant", {"content_type": "thoughts", "thoughts": thoughts})
+                parent = conv.add(parent, "assistant", {"content_type": "reasoning_recap",
+                                                        "content": f"Thought for {rng.randint(2, 90)}s"})
+                stats['reasoning'] += 1
+
+            # A regenerated reply leaves the first attempt as a dead-end sibling
+            if rng.random() < branching:
+                conv.add(parent, "assistant", {"content_type": "text",
+                                               "parts": [_paragraphs(rng, words)]})
+                stats['branches'] += 1
+
+            reply = _paragraphs(rng, words)
+            metadata = {}
+            if rng.random() < image_groups:
+                marker, reference = _image_group_part(rng, stats['image_groups'])
+                reply = f"{reply}\n\n{marker}"
+                metadata["content_references"] = [reference]
+                stats['image_groups'] += 1
+            parent = conv.add(parent, "assistant", {"content_type": "text", "parts": [reply]}, metadata)
+
+        writer.write({
+            "title": _sentence(rng, 2, 7).rstrip('.'),
+            "create_time": create_time,
+            "update_time": conv.time,
+            "mapping": conv.mapping,
+            "conversation_id": conversation_id,
+            "id": conversation_id,
+            "is_starred": rng.random() < 0.05,
+            "is_archived": rng.random() < 0.1,
+        })
+        stats['conversations'] += 1
+        stats['messages'] += conv.messages
+
+    writer.close()
+    stats['json_files'] = len(writer.files)
+    stats['json_bytes'] = writer.bytes
+    return stats
+
+def zip_export(export_dir, zip_path):
+    """
+    Pack an export folder into a ZIP like the one ChatGPT sends, written under a
+    temporary name and renamed, so a watched inbox never sees a partial archive.
+    """
+    export_dir = Path(export_dir)
+    zip_path = Path(zip_path)
+    tmp_path = zip_path.with_name(f".{zip_path.name}.tmp")
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for path in sorted(export_dir.rglob('*')):
+            if path.is_file() and not path.name.startswith('.'):
+                zf.write(path, path.relative_to(export_dir).as_posix())
+    os.replace(tmp_path, zip_path)
+    return zip_path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic ChatGPT export for benchmarking the converter."
+    )
+    parser.add_argument('output_dir', help="directory to write the export into")
+    parser.add_argument('-n', '--conversations', type=int, default=1000)
+    parser.add_argument('-m', '--messages', type=int, default=20,
+                        help="average visible messages per conversation (default: 20)")
+    parser.add_argument('--branching', type=float, default=0.1,
+                        help="chance a reply was regenerated, leaving a side branch (default: 0.1)")
+    parser.add_argument('--reasoning', type=float, default=0.2,
+                        help="chance a reply has thoughts/reasoning_recap nodes (default: 0.2)")
+    parser.add_argument('--image-groups', type=float, default=0.05,
+                        help="chance a reply contains an image_group (default: 0.05)")
+    parser.add_argument('--images', type=float, default=0.05,
+                        help="chance a user message attaches an image file (default: 0.05)")
+    parser.add_argument('--audio', type=float, default=0.02,
+                        help="chance a user message is a voice message (default: 0.02)")
+    parser.add_argument('--words', type=int, default=120,
+                        help="average words per message (default: 120)")
+    parser.add_argument('--asset-size', type=int, default=32 * 1024,
+                        help="bytes per generated image/audio file (default: 32768)")
+    parser.add_argument('--layout', choices=['sharded', 'legacy'], default='sharded')
+    parser.add_argument('--shard-size', type=int, default=100,
+                        help="conversations per shard in the sharded layout (default: 100)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--zip', action='store_true',
+                        help="pack the export into <output_dir>.zip (and remove the folder)")
+    return parser.parse_args(argv)
+
+def export_options(args):
+    """Map parsed command-line options onto generate_export() keyword arguments."""
+    return {
+        'conversations': args.conversations,
+        'messages': args.messages,
+        'branching': args.branching,
+        'reasoning': args.reasoning,
+        'image_groups': args.image_groups,
+        'images': args.images,
+        'audio': args.audio,
+        'words': args.words,
+        'asset_size': args.asset_size,
+        'layout': args.layout,
+        'shard_size': args.shard_size,
+        'seed': args.seed,
+    }
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = generate_export(args.output_dir, **export_options(args))
+    print(f"🧪 Generated {stats['conversations']} conversations with {stats['messages']} messages")
+    print(f"   {stats['json_files']} JSON file(s), {stats['json_bytes'] / 1e6:.1f} MB; "
+          f"{stats['images'] + stats['audio']} assets, {stats['asset_bytes'] / 1e6:.1f} MB")
+    if args.zip:
+        zip_path = zip_export(args.output_dir, Path(args.output_dir).with_suffix('.zip'))
+        shutil.rmtree(args.output_dir)
+        print(f"   Saved to: {zip_path}")
+    else:
+        print(f"   Saved to: {args.output_dir}")
@@ -0,0 +1,16 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The converter is a set of top-level modules rather than a package
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def config():
+    """The documented defaults from config.json.example."""
+    with open(os.path.join(ROOT, 'config.json.example'), encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,80 @@
+import errno
+import os
+
+import pytest
+
+import assets
+import chatgpt_json_to_markdown as converter
+from assets import place_asset
+from synthetic_export import generate_export
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    assets.reset()
+    yield
+    assets.reset()
+
+def _source(tmp_path, name, data=b'same bytes'):
+    path = tmp_path / 'export' / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+def test_identical_content_is_shared_across_runs(tmp_path):
+    store = tmp_path / 'out' / 'Assets' / '.blobs'
+    first = tmp_path / 'out' / 'Assets' / 'Images' / 'file-a.png'
+    second = tmp_path / 'out' / 'Assets' / 'Images' / 'file-b.png'
+
+    assert place_asset(_source(tmp_path, 'file-a.png'), first, 'copy', store)
+    # A new run (or another worker process) only has the store on disk to go by
+    assets.reset()
+    assert place_asset(_source(tmp_path, 'file-b.png'), second, 'copy', store)
+
+    assert os.path.samefile(first, second)
+    assert [blob.stat().st_ino for blob in store.iterdir()] == [first.stat().st_ino]
+    assert not os.path.samefile(first, tmp_path / 'export' / 'file-a.png')
+
+def _failing_link(error):
+    link = os.link
+
+    def fail_for_blobs(src, dst):
+        if '.blobs' in str(src):
+            raise OSError(error, os.strerror(error))
+        return link(src, dst)
+    return fail_for_blobs
+
+@pytest.mark.parametrize('error, disables_hardlinks', [
+    (errno.ENOENT, False),
+    (errno.EXDEV, True),
+    (errno.EPERM, True),
+])
+def test_only_filesystem_errors_disable_hardlinks(tmp_path, monkeypatch, error, disables_hardlinks):
+    store = tmp_path / 'out' / 'Assets' / '.blobs'
+    first = tmp_path / 'out' / 'Assets' / 'file-a.png'
+    second = tmp_path / 'out' / 'Assets' / 'file-b.png'
+    place_asset(_source(tmp_path, 'file-a.png'), first, 'copy', store)
+    monkeypatch.setattr(assets.os, 'link', _failing_link(error))
+
+    assert place_asset(_source(tmp_path, 'file-b.png'), second, 'copy', store)
+
+    assert second.read_bytes() == b'same bytes'
+    assert ('hardlink' in assets._unsupported) == disables_hardlinks
+
+def test_each_run_checks_its_assets_again(tmp_path, config):
+    export_dir = tmp_path / 'export'
+    generate_export(export_dir, conversations=3, messages=4, images=1.0, asset_size=64)
+    files = sorted(export_dir.glob('conversations*.json'))
+    output_dir = tmp_path / 'out'
+    config['dedupe_assets'] = True
+
+    def convert():
+        data = converter.ConversationSource(converter.iter_conversations, files)
+        converter.process_conversations(data, output_dir, config, export_dir, workers=1)
+
+    convert()
+    images = sorted((output_dir / 'Assets' / 'Images').iterdir())
+    assert images
+    images[0].unlink()
+    # Same process, as in watch mode: the deleted asset is placed again
+    convert()
+    assert images[0].is_file()
@@ -0,0 +1,66 @@
+import glob
+
+import pytest
+
+from attachment_index import attachment_file_type, build_attachment_index, build_zip_attachment_index
+
+FILES = [
+    'file-root-a.png',
+    'dalle-generations/file-root-b.webp',
+    'dalle-generations/file-dalle.webp',
+    'user-abc/file-root-a.txt',
+    'user-abc/file-user',
+    'user-abc/file-other.pdf',
+    'conv-1/audio/file-user-x.wav',
+    'conv-1/audio/file-audio-1.wav',
+    'deep/conv-2/audio/file-audio-2.wav',
+    '.hidden/file-hidden-1.png',
+    'notes/file-nowhere-1.png',
+]
+
+IDS = ['file-root', 'file-root-a', 'file-root-b', 'file-dalle', 'file-user', 'file-other',
+       'file-audio-1', 'file-audio-2', 'file-hidden', 'file-nowhere', 'file-missing']
+
+def _glob_lookup(file_id, base):
+    """The per-attachment glob scan the index replaced (ids here match at most one file per pattern)."""
+    base = str(base).replace('\\', '/')
+    for pattern in (f"{base}/{file_id}-*", f"{base}/dalle-generations/{file_id}-*",
+                    f"{base}/user-*/{file_id}*", f"{base}/**/audio/{file_id}-*"):
+        matches = glob.glob(pattern, recursive=True)
+        if matches:
+            return matches[0].replace('\\', '/'), attachment_file_type(matches[0])
+    return None, None
+
+@pytest.fixture
+def export(tmp_path):
+    for rel_path in FILES:
+        path = tmp_path / 'export' / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    return tmp_path / 'export'
+
+def test_index_matches_glob_precedence(export):
+    index, _ = build_attachment_index(export)
+
+    for file_id in IDS:
+        path, file_type = index.get(file_id, (None, None))
+        if path is not None:
+            path = path.replace('\\', '/')
+        assert (path, file_type) == _glob_lookup(file_id, export), file_id
+
+def test_zip_index_matches_directory_index(export, tmp_path):
+    import zipfile
+
+    zip_path = tmp_path / 'export.zip'
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        zf.writestr('export/conversations.json', '[]')
+        for rel_path in FILES:
+            zf.writestr('export/' + rel_path, b'x')
+
+    index, _ = build_attachment_index(export)
+    zip_index = build_zip_attachment_index(zip_path)
+
+    assert set(zip_index) == set(index)
+    for file_id, (member, file_type) in zip_index.items():
+        assert index[file_id][1] == file_type
+        assert index[file_id][0].replace('\\', '/').endswith(member.name[len('export'):])
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+import chatgpt_json_to_markdown as converter
+
+QUERIES = ['cats', 'dogs', 'red fox', 'fox', None, '']
+
+def _refs(rng, count, unhashable=False):
+    refs = []
+    for _ in range(count):
+        images = [{'image_search_query': rng.choice(QUERIES), 'url': f'https://example.com/{rng.random()}'}
+                  for _ in range(rng.randint(0, 3))]
+        if unhashable and rng.random() < 0.2:
+            images.append({'image_search_query': [rng.choice(QUERIES)]})
+        ref = {'type': 'image_group', 'images': images}
+        if rng.random() < 0.1:
+            del ref['images']
+        refs.append(ref)
+    return refs
+
+@pytest.mark.parametrize('unhashable', [False, True])
+def test_find_matches_the_linear_scan(unhashable):
+    rng = random.Random(22)
+    for _ in range(300):
+        refs = _refs(rng, rng.randint(1, 8), unhashable)
+        groups = converter._ImageGroups(refs)
+        for _ in range(10):
+            queries = [rng.choice(QUERIES + ['absent']) for _ in range(rng.randint(0, 4))]
+            if unhashable and rng.random() < 0.2:
+                queries.append([rng.choice(QUERIES)])
+            assert groups.find(queries) is converter._find_content_reference_for_queries(queries, refs)
+
+def test_build_keeps_only_image_groups():
+    refs = [{'type': 'webpage'}, {'type': 'image_group', 'images': [{'image_search_query': 'cats'}]}]
+
+    groups = converter._ImageGroups.build(refs)
+
+    assert groups.refs == refs[1:]
+    assert groups.find(['cats']) is refs[1]
+    assert converter._ImageGroups.build([{'type': 'webpage'}]) is None
+    assert converter._ImageGroups.build([]) is None
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+from benchmark import IMPORT_BUDGET_MS, LAZY_MODULES
+from conftest import ROOT
+
+def _run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+
+def test_converter_imports_no_lazy_modules():
+    code = ("import sys; before = set(sys.modules); import chatgpt_json_to_markdown; "
+            f"print(' '.join(m for m in {LAZY_MODULES!r} if m in set(sys.modules) - before))")
+    result = _run(code)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []
+
+def test_converter_import_time_is_within_budget():
+    result = _run(f"import sys, benchmark; sys.exit(0 if benchmark.check_import_time({IMPORT_BUDGET_MS}) else 1)")
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,80 @@
+import json
+
+import chatgpt_json_to_markdown as converter
+from json_backend import available_backends, get_decoder
+
+def _node(node_id, parent, children, role=None, text=None, **message_fields):
+    node = {'id': node_id, 'parent': parent, 'children': children, 'message': None}
+    if role is not None:
+        node['message'] = dict({
+            'id': node_id,
+            'author': {'role': role},
+            'content': {'content_type': 'text', 'parts': [text]},
+            'recipient': 'all',
+        }, **message_fields)
+    return node
+
+def _branching_export():
+    """
+    Two conversations whose current branch is only found through fields the
+    msgspec schema has to keep: a regenerated answer's update_time, and the
+    paragen_variant_choice a user made between two answers.
+    """
+    regenerated = {
+        'root': _node('root', None, ['q']),
+        'q': _node('q', 'root', ['old', 'new'], 'user', 'Question', create_time=100),
+        'old': _node('old', 'q', [], 'assistant', 'First answer', create_time=200),
+        'new': _node('new', 'q', [], 'assistant', 'Regenerated answer', create_time=150, update_time=300),
+    }
+    chosen = {
+        'root': _node('root', None, ['q']),
+        'q': _node('q', 'root', ['a', 'b'], 'user', 'Pick one', create_time=100,
+                   metadata={'paragen_variant_choice': 'a'}),
+        'a': _node('a', 'q', [], 'assistant', 'Chosen answer', create_time=200),
+        'b': _node('b', 'q', [], 'assistant', 'Other answer', create_time=200),
+    }
+    return [
+        {'title': 'Regenerated', 'conversation_id': 'c1', 'create_time': 100, 'update_time': 300,
+         'mapping': regenerated},
+        {'title': 'Chosen', 'conversation_id': 'c2', 'create_time': 100, 'update_time': 200,
+         'mapping': chosen},
+    ]
+
+def _render(path, tmp_path, config, backend):
+    decoder = None if backend == 'json' else get_decoder(backend)
+    conversations = list(converter.iter_conversations([path], decoder, 1 << 20))
+    rendered = converter.iter_rendered(conversations, config, tmp_path, tmp_path / 'out')
+    return {result.path: result.text for result in rendered}
+
+def test_every_backend_renders_the_same_branch(tmp_path, config):
+    path = tmp_path / 'conversations.json'
+    path.write_text(json.dumps(_branching_export()), encoding='utf-8')
+
+    outputs = {backend: _render(path, tmp_path, config, backend) for backend in available_backends()}
+
+    expected = outputs['json']
+    text = ''.join(expected.values())
+    assert 'Regenerated answer' in text and 'First answer' not in text
+    assert 'Chosen answer' in text and 'Other answer' not in text
+    for backend, output in outputs.items():
+        assert output == expected, backend
+
+
+class _CountingDecoder:
+    def __init__(self):
+        self.calls = 0
+
+    def decode(self, data):
+        self.calls += 1
+        return json.loads(data)
+
+def test_files_over_the_document_limit_are_streamed(tmp_path):
+    path = tmp_path / 'conversations.json'
+    path.write_text(json.dumps(_branching_export()), encoding='utf-8')
+    decoder = _CountingDecoder()
+
+    streamed = list(converter.iter_conversations([path], decoder, path.stat().st_size - 1))
+    assert decoder.calls == 0
+    whole = list(converter.iter_conversations([path], decoder, path.stat().st_size))
+    assert decoder.calls == 1
+    assert streamed == whole == _branching_export()
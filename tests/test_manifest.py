@@ -0,0 +1,51 @@
+import json
+
+import chatgpt_json_to_markdown as converter
+from synthetic_export import generate_export
+
+def _load(export_dir):
+    conversations = []
+    for path in sorted(export_dir.glob('conversations*.json')):
+        conversations.extend(json.loads(path.read_text(encoding='utf-8')))
+    return conversations
+
+def test_manifest_skips_until_the_conversation_or_config_changes(tmp_path, config):
+    generate_export(tmp_path / 'export', conversations=6, messages=4, shard_size=3)
+    conversations = _load(tmp_path / 'export')
+    output_dir = tmp_path / 'out'
+    config.update(incremental=True)
+
+    def run():
+        return converter.process_conversations(conversations, output_dir, config, tmp_path / 'export', workers=1)
+
+    assert run()['written'] == 6
+
+    stats = run()
+    assert (stats['written'], stats['unchanged']) == (0, 6)
+
+    # Settings that do not change the markdown keep the manifest valid
+    config['workers'] = 4
+    assert run()['unchanged'] == 6
+
+    conversations[0]['update_time'] += 60
+    stats = run()
+    assert (stats['written'], stats['unchanged']) == (1, 5)
+
+    config['assistant_name'] = 'Assistant'
+    stats = run()
+    assert (stats['written'], stats['unchanged']) == (6, 0)
+    assert all('Assistant' in path.read_text(encoding='utf-8') for path in output_dir.rglob('*.md'))
+
+def test_deleted_output_is_rendered_again(tmp_path, config):
+    generate_export(tmp_path / 'export', conversations=3, messages=4, shard_size=3)
+    conversations = _load(tmp_path / 'export')
+    output_dir = tmp_path / 'out'
+    config.update(incremental=True)
+
+    converter.process_conversations(conversations, output_dir, config, tmp_path / 'export', workers=1)
+    victim = sorted(output_dir.rglob('*.md'))[0]
+    victim.unlink()
+
+    stats = converter.process_conversations(conversations, output_dir, config, tmp_path / 'export', workers=1)
+    assert (stats['written'], stats['unchanged']) == (1, 2)
+    assert victim.is_file()
@@ -0,0 +1,71 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from manifest import MANIFEST_FILENAME
+from output_sink import DirectorySink
+from synthetic_export import generate_export
+
+def _age(path):
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return path.stat().st_mtime_ns
+
+def test_identical_note_keeps_its_mtime(tmp_path):
+    sink = DirectorySink()
+    note = tmp_path / 'note.md'
+    assert sink.write_note(note, b'# Title\n\nbody\n')
+    mtime = _age(note)
+
+    assert not sink.write_note(note, b'# Title\n\nbody\n')
+    assert not sink.write_note_chunks(note, [b'# Title\n', b'\nbody\n'])
+    assert note.stat().st_mtime_ns == mtime
+
+def test_changed_note_is_replaced(tmp_path):
+    sink = DirectorySink()
+    note = tmp_path / 'note.md'
+    sink.write_note(note, b'# Title\n\nbody\n')
+    mtime = _age(note)
+
+    # Same size, different bytes
+    assert sink.write_note(note, b'# Title\n\nBODY\n')
+    assert note.read_bytes() == b'# Title\n\nBODY\n'
+    assert note.stat().st_mtime_ns != mtime
+
+    # A chunked note that is a prefix of the existing file still replaces it
+    assert sink.write_note_chunks(note, [b'# Title\n'])
+    assert note.read_bytes() == b'# Title\n'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['note.md']
+
+def _tree(root):
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in root.rglob('*') if path.is_file()}
+
+def _convert(export_dir, output_dir, config, **overrides):
+    import chatgpt_json_to_markdown as converter
+
+    files = sorted(export_dir.glob('conversations*.json'))
+    source = converter.ConversationSource(converter.iter_conversations, files)
+    converter.process_conversations(source, output_dir, dict(config, **overrides), export_dir, workers=1)
+
+@pytest.mark.parametrize('archive_name', ['out.zip', 'out.tar', 'out.tar.gz'])
+def test_archive_holds_the_directory_output(tmp_path, config, archive_name):
+    generate_export(tmp_path / 'export', conversations=6, messages=6, images=0.5, audio=0.3,
+                    asset_size=256, shard_size=3)
+    _convert(tmp_path / 'export', tmp_path / 'dir', config)
+    archive = tmp_path / archive_name
+    _convert(tmp_path / 'export', tmp_path / 'arc', config, output_archive=str(archive))
+
+    if archive_name.endswith('.zip'):
+        with zipfile.ZipFile(archive) as zf:
+            members = {name: zf.read(name) for name in zf.namelist() if not name.endswith('/')}
+    else:
+        with tarfile.open(archive) as tf:
+            members = {m.name: tf.extractfile(m).read() for m in tf.getmembers() if m.isfile()}
+
+    expected = _tree(tmp_path / 'dir')
+    expected.pop(MANIFEST_FILENAME, None)
+    members.pop(MANIFEST_FILENAME, None)
+    assert any(name.startswith('Assets/') for name in expected)
+    assert members == expected
@@ -0,0 +1,48 @@
+from functools import partial
+
+import pytest
+
+import chatgpt_json_to_markdown as converter
+from shard_index import shard_stubs, zip_stubs
+from synthetic_export import generate_export, zip_export
+
+@pytest.fixture
+def export(tmp_path):
+    export_dir = tmp_path / 'export'
+    generate_export(export_dir, conversations=12, messages=4, shard_size=5)
+    return export_dir
+
+def _files(export_dir):
+    return sorted(export_dir.glob('conversations*.json'))
+
+def test_stubs_plan_the_same_output(tmp_path, config, export):
+    files = _files(export)
+    source = converter.ConversationSource(converter.iter_conversations, files, stubs=partial(shard_stubs, files))
+    decoded = list(converter.iter_conversations(files))
+
+    planned = converter.plan_output(source, config, tmp_path / 'out')
+    expected = converter.plan_output(decoded, config, tmp_path / 'out')
+
+    assert planned['paths'] == expected['paths']
+    assert planned['collisions'] == expected['collisions']
+    zip_path = zip_export(export, tmp_path / 'export.zip')
+    assert zip_stubs(zip_path) == shard_stubs(files)
+
+def test_conversion_decodes_the_export_once(tmp_path, config, export):
+    files = _files(export)
+    opened = []
+
+    def counting(paths):
+        opened.append(paths)
+        return converter.iter_conversations(paths)
+
+    source = converter.ConversationSource(counting, files, stubs=partial(shard_stubs, files))
+    stats = converter.process_conversations(source, tmp_path / 'out', config, export, workers=1)
+
+    assert stats['written'] == 12
+    assert len(opened) == 1
+
+def test_one_shot_iterators_are_refused(tmp_path, config, export):
+    conversations = converter.iter_conversations(_files(export))
+    with pytest.raises(TypeError):
+        converter.process_conversations(conversations, tmp_path / 'out', config, export, workers=1)
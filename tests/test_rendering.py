@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+import chatgpt_json_to_markdown as converter
+
+def _render(conversations, config, tmp_path):
+    return list(converter.iter_rendered(conversations, config, tmp_path, tmp_path / 'out'))
+
+def test_system_message_without_content_is_skipped(tmp_path, config):
+    mapping = {
+        'root': {'id': 'root', 'parent': None, 'children': ['sys'], 'message': None},
+        'sys': {'id': 'sys', 'parent': 'root', 'children': ['q'], 'message': {
+            'id': 'sys', 'author': {'role': 'system'}, 'content': None, 'metadata': None}},
+        'q': {'id': 'q', 'parent': 'sys', 'children': ['a'], 'message': {
+            'id': 'q', 'author': {'role': 'user'}, 'create_time': 100,
+            'content': {'content_type': 'text', 'parts': ['Hello']}}},
+        'a': {'id': 'a', 'parent': 'q', 'children': [], 'message': {
+            'id': 'a', 'author': {'role': 'assistant'}, 'create_time': 101,
+            'content': {'content_type': 'text', 'parts': ['Hi there']}}},
+    }
+    conversation = {'title': 'Null system content', 'conversation_id': 'c1',
+                    'create_time': 100, 'update_time': 101, 'mapping': mapping}
+
+    [result] = _render([conversation], config, tmp_path)
+
+    assert 'Hello' in result.text
+    assert 'Hi there' in result.text
+
+def test_iter_rendered_without_a_sink_leaves_the_output_dir_alone(tmp_path, config):
+    from synthetic_export import generate_export
+
+    export_dir = tmp_path / 'export'
+    generate_export(export_dir, conversations=5, messages=6, images=0.5, audio=0.3,
+                    asset_size=256, shard_size=5)
+    [shard] = export_dir.glob('conversations*.json')
+    conversations = json.loads(shard.read_text(encoding='utf-8'))
+    config['line_endings'] = 'lf'
+
+    results = list(converter.iter_rendered(conversations, config, export_dir, tmp_path / 'out'))
+
+    assert not (tmp_path / 'out').exists()
+    assert any(result.assets for result in results)
+    for result in results:
+        for _, source in result.assets:
+            assert os.path.isfile(source)
+
+    # Writing the results reproduces what the command line writes
+    converter.process_conversations(conversations, tmp_path / 'out', config, export_dir, workers=1)
+    for result in results:
+        assert (tmp_path / 'out' / result.path).read_bytes() == result.text.encode('utf-8')
+        for rel_path, _ in result.assets:
+            assert (tmp_path / 'out' / rel_path).is_file()
+
+LONG_TEXT = "".join(f"line {i} " + "x" * (i % 23) + ("\r\n" if i % 7 == 0 else "\n") for i in range(400)) + "tail"
+
+@pytest.mark.parametrize('start', [0, 5, 200])
+@pytest.mark.parametrize('quote', [False, True])
+def test_iter_chunks_joins_back_to_the_whole_text(monkeypatch, start, quote):
+    monkeypatch.setattr(converter, '_RENDER_CHUNK_CHARS', 64)
+    expected = LONG_TEXT[start:]
+    if quote:
+        expected = expected.replace("\n", "\n> ")
+
+    chunks = list(converter._iter_chunks(LONG_TEXT, start, quote))
+
+    assert len(chunks) > 1
+    assert all(chunk.endswith('\n> ' if quote else '\n') for chunk in chunks[:-1])
+    assert "".join(chunks) == expected
+
+@pytest.mark.parametrize('callout', ['', 'quote'])
+def test_chunked_render_and_write_match_the_unchunked_note(tmp_path, config, monkeypatch, callout):
+    config.update(prompt_callout_type=callout, response_callout_type=callout, line_endings='crlf')
+    mapping = {
+        'root': {'id': 'root', 'parent': None, 'children': ['q'], 'message': None},
+        'q': {'id': 'q', 'parent': 'root', 'children': ['a'], 'message': {
+            'id': 'q', 'author': {'role': 'user'}, 'create_time': 100,
+            'content': {'content_type': 'text', 'parts': [LONG_TEXT]}}},
+        'a': {'id': 'a', 'parent': 'q', 'children': [], 'message': {
+            'id': 'a', 'author': {'role': 'assistant'}, 'create_time': 101,
+            'content': {'content_type': 'text', 'parts': ["Short answer"]}}},
+    }
+    conversation = {'title': 'Long paste', 'conversation_id': 'c1',
+                    'create_time': 100, 'update_time': 101, 'mapping': mapping}
+
+    [whole] = _render([conversation], config, tmp_path)
+    converter._write_markdown(tmp_path / 'whole.md', whole.chunks, config)
+
+    monkeypatch.setattr(converter, '_RENDER_CHUNK_CHARS', 64)
+    [chunked] = _render([conversation], config, tmp_path)
+    converter._write_markdown(tmp_path / 'chunked.md', chunked.chunks, config)
+
+    assert len(chunked.chunks) > len(whole.chunks)
+    assert chunked.text == whole.text
+    assert (tmp_path / 'chunked.md').read_bytes() == (tmp_path / 'whole.md').read_bytes()
@@ -0,0 +1,42 @@
+import pytest
+
+import chatgpt_json_to_markdown as converter
+from search_index import fts5_available, search
+
+pytestmark = pytest.mark.skipif(not fts5_available(), reason="SQLite was built without FTS5")
+
+def _conversation(conversation_id, title, question, answer, update_time=101):
+    mapping = {
+        'root': {'id': 'root', 'parent': None, 'children': ['q'], 'message': None},
+        'q': {'id': 'q', 'parent': 'root', 'children': ['a'], 'message': {
+            'id': 'q', 'author': {'role': 'user'}, 'create_time': 100,
+            'content': {'content_type': 'text', 'parts': [question]}}},
+        'a': {'id': 'a', 'parent': 'q', 'children': [], 'message': {
+            'id': 'a', 'author': {'role': 'assistant'}, 'create_time': 101,
+            'content': {'content_type': 'text', 'parts': [answer]}}},
+    }
+    return {'title': title, 'conversation_id': conversation_id,
+            'create_time': 100, 'update_time': update_time, 'mapping': mapping}
+
+def test_query_finds_the_conversation_that_mentions_it(tmp_path, config):
+    config.update(search_index=True)
+    output_dir = tmp_path / 'out'
+    conversations = [
+        _conversation('c1', 'Sourdough', 'How long should dough rise?', 'Let the levain ferment overnight.'),
+        _conversation('c2', 'Indexes', 'What is a covering index?', 'It answers a query from the btree alone.'),
+    ]
+    converter.process_conversations(conversations, output_dir, config, tmp_path, workers=1)
+
+    [hit] = search(output_dir, 'levain')
+    assert (hit['title'], hit['role']) == ('Sourdough', 'assistant')
+    assert (output_dir / hit['path']).is_file()
+    assert [r['title'] for r in search(output_dir, 'covering')] == ['Indexes']
+
+    # An updated conversation replaces its rows instead of adding to them
+    conversations[0] = _conversation('c1', 'Sourdough', 'How long should dough rise?',
+                                     'Use a poolish instead.', update_time=200)
+    converter.process_conversations(conversations, output_dir, config, tmp_path, workers=1)
+
+    assert search(output_dir, 'levain') == []
+    assert [r['title'] for r in search(output_dir, 'poolish')] == ['Sourdough']
+    assert len(search(output_dir, 'dough')) == 1
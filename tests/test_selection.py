@@ -0,0 +1,73 @@
+import json
+
+import chatgpt_json_to_markdown as converter
+from shard_index import SHARD_INDEX_FILENAME
+
+def _conversation(conversation_id, title):
+    mapping = {
+        'root': {'id': 'root', 'parent': None, 'children': ['q'], 'message': None},
+        'q': {'id': 'q', 'parent': 'root', 'children': [], 'message': {
+            'id': 'q', 'author': {'role': 'user'}, 'create_time': 100,
+            'content': {'content_type': 'text', 'parts': [f'About {title}']}}},
+    }
+    return {'title': title, 'conversation_id': conversation_id,
+            'create_time': 100, 'update_time': 100, 'mapping': mapping}
+
+def _setup(tmp_path, monkeypatch, config, conversations, **settings):
+    export_dir = tmp_path / 'export'
+    export_dir.mkdir(exist_ok=True)
+    (export_dir / 'conversations.json').write_text(json.dumps(conversations), encoding='utf-8')
+    config.update(input_mode='directory', input_path=str(export_dir),
+                  output_directory=str(tmp_path / 'out'), **settings)
+    (tmp_path / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    return export_dir
+
+def _notes(tmp_path):
+    return sorted(path.name for path in (tmp_path / 'out').rglob('*.md'))
+
+def test_only_never_prunes(tmp_path, monkeypatch, config):
+    conversations = [_conversation(f'conv{i}-id', f'Topic {i}') for i in range(3)]
+    _setup(tmp_path, monkeypatch, config, conversations)
+    converter.main([])
+    before = _notes(tmp_path)
+    assert len(before) == 3
+
+    # conv2 is gone from the export, so a pruning run would delete its note
+    _setup(tmp_path, monkeypatch, config, conversations[:2])
+    converter.main(['--only', 'conv0', '--prune'])
+
+    assert _notes(tmp_path) == before
+
+def test_conversation_index_is_cached_only_when_enabled(tmp_path, monkeypatch, config):
+    conversations = [_conversation(f'conv{i}-id', f'Topic {i}') for i in range(3)]
+    export_dir = _setup(tmp_path, monkeypatch, config, conversations)
+    converter.main(['--only', 'conv1'])
+    assert not (export_dir / SHARD_INDEX_FILENAME).exists()
+
+    _setup(tmp_path, monkeypatch, config, conversations, cache_conversation_index=True)
+    converter.main(['--only', 'conv1'])
+    assert (export_dir / SHARD_INDEX_FILENAME).exists()
+
+def test_selected_conversations_are_decoded_with_the_configured_backend(tmp_path, monkeypatch, config):
+    import shard_index
+    from conversation_filter import ConversationFilter
+    from json_backend import available_backends
+
+    conversations = [_conversation(f'conv{i}-id', f'Topic {i}') for i in range(3)]
+    export_dir = _setup(tmp_path, monkeypatch, config, conversations, filter_ids=['conv1'])
+    decoders = []
+    read = shard_index.read_conversation
+    monkeypatch.setattr(shard_index, 'read_conversation',
+                        lambda *args: decoders.append(args[3]) or read(*args))
+
+    for backend in available_backends():
+        config['json_backend'] = backend
+        decoders.clear()
+        selected, output_plan = converter.select_conversations(
+            None, ConversationFilter(config), config, tmp_path / 'out', [export_dir / 'conversations.json'])
+
+        assert list(selected) == [conversations[1]]
+        [decoder] = decoders
+        assert (decoder.backend if decoder is not None else 'json') == backend
+        assert decoder is None or decoder.fallbacks == 0
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+def test_importing_setup_does_not_load_zipfile():
+    # Only what importing setup adds: site hooks may load zipfile at startup
+    code = ("import sys; before = set(sys.modules); import setup; "
+            "print(sorted({'zipfile', 'extract_zip'} & (set(sys.modules) - before)))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
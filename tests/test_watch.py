@@ -0,0 +1,26 @@
+from synthetic_export import generate_export, zip_export
+from watch import STATE_FILENAME, watch_inbox
+
+def test_watch_converts_each_export_once(tmp_path, config):
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    output_dir = tmp_path / 'out'
+    config.update(output_directory=str(output_dir), incremental=True)
+    generate_export(tmp_path / 'export', conversations=5, messages=4, shard_size=2)
+    zip_export(tmp_path / 'export', inbox / 'export-1.zip')
+
+    converted = watch_inbox(inbox, config, poll_interval=0.05, settle=0.05,
+                            use_inotify=False, max_exports=1, idle_timeout=10)
+
+    [(name, stats)] = converted
+    assert name == 'export-1.zip'
+    assert stats['written'] == 5
+    notes = sorted(output_dir.rglob('*.md'))
+    assert len(notes) == 5
+    assert (inbox / STATE_FILENAME).is_file()
+
+    # A restarted watcher remembers the export and leaves the notes alone
+    mtimes = [path.stat().st_mtime_ns for path in notes]
+    assert watch_inbox(inbox, config, poll_interval=0.05, settle=0.05,
+                       use_inotify=False, idle_timeout=0.3) == []
+    assert [path.stat().st_mtime_ns for path in notes] == mtimes
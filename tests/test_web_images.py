@@ -0,0 +1,173 @@
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import chatgpt_json_to_markdown as converter
+from downloader import DownloadBudgetExceeded, ImageDownloader
+from search_index import SEARCH_INDEX_FILENAME, fts5_available
+
+requires_requests = pytest.mark.skipif(not converter._requests_available, reason="requests is not installed")
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 16
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    delay = 0
+    # Status codes answered before the image, one per request
+    statuses = []
+    lock = threading.Lock()
+    requests = 0
+    active = 0
+    most_active = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            cls.active += 1
+            cls.most_active = max(cls.most_active, cls.active)
+            status = cls.statuses.pop(0) if cls.statuses else 200
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.active -= 1
+        try:
+            if status != 200:
+                self.send_error(status)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(PNG)))
+            self.end_headers()
+            self.wfile.write(PNG)
+        except OSError:
+            pass  # the client gave up waiting
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def image_server():
+    _ImageHandler.delay = 0
+    _ImageHandler.statuses = []
+    _ImageHandler.requests = 0
+    _ImageHandler.most_active = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def _conversation(conversation_id, url):
+    marker = '\ue200image_group\ue202{"query": ["a cat"]}\ue201'
+    reference = {'type': 'image_group', 'images': [
+        {'image_search_query': 'a cat', 'image_result': {'title': 'A cat', 'content_url': url}}]}
+    mapping = {
+        'root': {'id': 'root', 'parent': None, 'children': ['q'], 'message': None},
+        'q': {'id': 'q', 'parent': 'root', 'children': ['a'], 'message': {
+            'id': 'q', 'author': {'role': 'user'}, 'create_time': 100,
+            'content': {'content_type': 'text', 'parts': ['Show me a cat']}}},
+        'a': {'id': 'a', 'parent': 'q', 'children': [], 'message': {
+            'id': 'a', 'author': {'role': 'assistant'}, 'create_time': 101,
+            'content': {'content_type': 'text', 'parts': [f'Here is one: {marker}']},
+            'metadata': {'content_references': [reference]}}},
+    }
+    return {'title': f'Cat {conversation_id}', 'conversation_id': conversation_id,
+            'create_time': 100, 'update_time': 101, 'mapping': mapping}
+
+@requires_requests
+@pytest.mark.skipif(not fts5_available(), reason="SQLite has no FTS5")
+def test_search_index_gets_downloaded_image_paths(tmp_path, config, image_server):
+    config.update(download_web_images=True, search_index=True)
+    output_dir = tmp_path / 'out'
+    conversations = [_conversation(f'conv{i}', f"{image_server}/cat{i}.png") for i in range(3)]
+
+    converter.process_conversations(conversations, output_dir, config, tmp_path, workers=1)
+
+    conn = sqlite3.connect(output_dir / SEARCH_INDEX_FILENAME)
+    texts = [text for (text,) in conn.execute("SELECT text FROM messages WHERE role = 'assistant'")]
+    conn.close()
+    assert len(texts) == 3
+    for text in texts:
+        assert '\x00' not in text
+        assert '.png)' in text
+    notes = [path.read_text(encoding='utf-8') for path in output_dir.rglob('*.md')]
+    assert len(notes) == 3 and all('.png)' in note and '\x00' not in note for note in notes)
+
+@requires_requests
+def test_downloads_overlap_across_conversations(tmp_path, config, image_server):
+    # One image per conversation: they only download at the same time if a
+    # conversation can render while the previous one's image is still in flight
+    _ImageHandler.delay = 0.3
+    config.update(download_web_images=True)
+    conversations = [_conversation(f'conv{i}', f"{image_server}/cat{i}.png") for i in range(4)]
+
+    rendered = list(converter.iter_rendered(conversations, config, tmp_path, tmp_path / 'out'))
+
+    assert _ImageHandler.most_active > 1
+    assert [result.key[0] for result in rendered] == [f'conv{i}' for i in range(4)]
+    for i, result in enumerate(rendered):
+        assert [path for path, _ in result.assets] == [f'Assets/Images/conv{i}_00_A_cat.png']
+        assert f'Assets/Images/conv{i}_00_A_cat.png)' in result.text
+
+@requires_requests
+def test_transient_errors_are_retried(image_server):
+    _ImageHandler.statuses = [503]
+    downloader = ImageDownloader(retries=2, backoff=0.01)
+    try:
+        assert downloader.submit(f"{image_server}/cat.png").result() == (PNG, 'image/png')
+    finally:
+        downloader.close()
+    assert _ImageHandler.requests == 2
+
+@requires_requests
+def test_downloads_per_host_are_limited(image_server):
+    _ImageHandler.delay = 0.1
+    downloader = ImageDownloader(max_workers=8, per_host=2)
+    try:
+        futures = [downloader.submit(f"{image_server}/cat{i}.png") for i in range(8)]
+        assert all(future.result()[0] == PNG for future in futures)
+    finally:
+        downloader.close()
+    assert _ImageHandler.most_active == 2
+
+def _render_one(tmp_path, config, url):
+    [result] = converter.iter_rendered([_conversation('conv0', url)], config, tmp_path, tmp_path / 'out')
+    return result
+
+@requires_requests
+def test_rate_limited_image_keeps_its_remote_url(tmp_path, config, image_server):
+    _ImageHandler.statuses = [429] * 10
+    config.update(download_web_images=True, download_retries=1)
+    url = f"{image_server}/cat.png"
+
+    result = _render_one(tmp_path, config, url)
+
+    assert _ImageHandler.requests == 2
+    assert f"]({url})" in result.text
+    assert result.assets == []
+
+@requires_requests
+def test_download_budget_is_enforced(image_server):
+    _ImageHandler.delay = 1.0
+    downloader = ImageDownloader(retries=3, backoff=0.01, budget=0.3)
+    try:
+        with pytest.raises(DownloadBudgetExceeded):
+            downloader.submit(f"{image_server}/cat.png").result()
+    finally:
+        downloader.close()
+
+@requires_requests
+def test_image_over_budget_keeps_its_remote_url(tmp_path, config, image_server):
+    _ImageHandler.delay = 1.0
+    config.update(download_web_images=True, download_budget=0.3)
+    url = f"{image_server}/cat.png"
+
+    start = time.monotonic()
+    result = _render_one(tmp_path, config, url)
+
+    assert time.monotonic() - start < 1.0
+    assert f"]({url})" in result.text
+    assert result.assets == []
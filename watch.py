@@ -0,0 +1,192 @@
+import json
+import os
+import select
+import sys
+import time
+import zipfile
+from functools import partial
+from pathlib import Path
+
+import chatgpt_json_to_markdown as converter
+from attachment_index import clear_attachment_indexes, get_attachment_index
+from extract_zip import close_open_archives
+from manifest import load_manifest
+from shard_index import zip_stubs
+
+STATE_FILENAME = '.watch_state.json'
+
+# inotify event masks (linux/inotify.h): a file finished writing, or was moved in
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+
+def _open_inotify(directory):
+    """
+    Return an inotify file descriptor reporting files written or moved into
+    directory, or None where inotify is unavailable (non-Linux, no libc).
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(str(directory)), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def _wait(inotify_fd, timeout):
+    """Sleep until the inbox changes (inotify) or timeout seconds pass (None = no limit)."""
+    if inotify_fd is None:
+        time.sleep(timeout)
+        return
+    ready, _, _ = select.select([inotify_fd], [], [], timeout)
+    if ready:
+        # The events only wake us up; the inbox is rescanned either way
+        os.read(inotify_fd, 64 * 1024)
+
+def _load_state(inbox):
+    try:
+        with open(Path(inbox) / STATE_FILENAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(inbox, state):
+    state_path = Path(inbox) / STATE_FILENAME
+    tmp_path = state_path.with_name(state_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, state_path)
+
+def convert_export(zip_path, config, load_args=(), manifest=None):
+    """
+    Convert one export ZIP in place (zip-native, nothing is extracted) into
+    config['output_directory'].
+
+    Returns:
+        dict with the process_conversations counts plus 'seconds',
+        'conversations' and 'zip_bytes'
+    """
+    config = dict(config, input_mode='zip', input_path=str(zip_path))
+    start = time.perf_counter()
+    try:
+        get_attachment_index(zip_path)
+        data = converter.ConversationSource(converter.iter_zip_conversations, zip_path, *load_args,
+                                            stubs=partial(zip_stubs, zip_path))
+        stats = converter.process_conversations(
+            data, config['output_directory'], config, str(zip_path), manifest=manifest
+        )
+    finally:
+        # A later export may reuse this file name, so nothing about it may be cached
+        clear_attachment_indexes()
+        close_open_archives()
+    stats['seconds'] = time.perf_counter() - start
+    stats['conversations'] = stats['written'] + stats['identical'] + stats['unchanged']
+    stats['zip_bytes'] = os.path.getsize(zip_path)
+    return stats
+
+def _report(name, stats):
+    seconds = max(stats['seconds'], 1e-9)
+    rendered = stats['written'] + stats['identical']
+    print(f"📥 {name}: {stats['conversations']:,} conversations ({rendered:,} rendered, "
+          f"{stats['unchanged']:,} unchanged) in {stats['seconds']:.1f}s — "
+          f"{stats['conversations'] / seconds:,.0f} conv/s, {stats['zip_bytes'] / 1e6 / seconds:.1f} MB/s")
+    if stats['pruned']:
+        print(f"   🧹 Removed {stats['pruned']} conversations no longer in the export")
+
+def watch_inbox(inbox, config, load_args=(), poll_interval=2.0, settle=1.0,
+                use_inotify=True, max_exports=None, idle_timeout=None):
+    """
+    Convert every export ZIP that appears in inbox, oldest first, until
+    interrupted.
+
+    Between exports the interpreter, the JSON decoder and the run manifest stay
+    loaded, so each export only pays for reading its own ZIP, and with
+    incremental mode only for conversations that changed since the previous one.
+    A ZIP is converted once its size and mtime have stopped changing for
+    `settle` seconds (polling) or after it was closed/moved in (inotify) and is
+    a complete archive. Converted exports are remembered in inbox/.watch_state.json
+    by size and mtime, so a restart does not convert them again.
+
+    Args:
+        max_exports: Stop after converting this many exports (for scripts and tests)
+        idle_timeout: Stop after this many seconds without a new export
+
+    Returns:
+        list of (file name, stats) for every export converted
+    """
+    inbox = Path(inbox)
+    inbox.mkdir(parents=True, exist_ok=True)
+    state = _load_state(inbox)
+    manifest = load_manifest(config['output_directory'])
+    inotify_fd = _open_inotify(inbox) if use_inotify else None
+    print(f"👀 Watching {inbox} for export ZIPs ({'inotify' if inotify_fd is not None else f'polling every {poll_interval}s'})")
+    print("   Press Ctrl+C to stop.")
+
+    # name -> (size, mtime_ns) when first seen, until it has settled
+    unsettled = {}
+    converted = []
+    last_activity = time.monotonic()
+    try:
+        while True:
+            candidates = []
+            for path in inbox.glob('*.zip'):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                candidates.append((st.st_mtime_ns, path, [st.st_size, st.st_mtime_ns]))
+
+            for _, path, signature in sorted(candidates):
+                name = path.name
+                if state.get(name, {}).get('signature') == signature:
+                    continue
+                if unsettled.get(name) != signature:
+                    unsettled[name] = signature
+                    continue
+                del unsettled[name]
+                if not zipfile.is_zipfile(path):
+                    print(f"❌ {name}: not a ZIP archive, skipping")
+                    state[name] = {'signature': signature, 'error': 'not a ZIP archive'}
+                    _save_state(inbox, state)
+                    continue
+
+                print()
+                try:
+                    stats = convert_export(path, config, load_args, manifest)
+                except (FileNotFoundError, zipfile.BadZipFile, ValueError) as e:
+                    print(f"❌ {name}: {e}")
+                    state[name] = {'signature': signature, 'error': str(e)}
+                else:
+                    _report(name, stats)
+                    state[name] = {'signature': signature, 'converted': time.time(),
+                                   'conversations': stats['conversations'], 'seconds': round(stats['seconds'], 3)}
+                    converted.append((name, stats))
+                _save_state(inbox, state)
+                last_activity = time.monotonic()
+                if max_exports is not None and len(converted) >= max_exports:
+                    return converted
+
+            if idle_timeout is not None and time.monotonic() - last_activity >= idle_timeout:
+                return converted
+            if unsettled:
+                timeout = settle if inotify_fd is not None else min(settle, poll_interval)
+            else:
+                timeout = None if inotify_fd is not None else poll_interval
+            if idle_timeout is not None:
+                remaining = max(0.0, idle_timeout - (time.monotonic() - last_activity))
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            _wait(inotify_fd, timeout)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
+        return converted
+    finally:
+        if inotify_fd is not None:
+            os.close(inotify_fd)